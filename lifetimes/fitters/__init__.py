@@ -9,18 +9,289 @@ import pandas as pd
 from textwrap import dedent
 from scipy.optimize import minimize
 from autograd import value_and_grad, hessian
-from ..utils import _save_obj_without_attr, ConvergenceError
+from autograd import numpy as anp
+from autograd.scipy.special import gammaln
+from ..utils import _save_obj_without_attr, ConvergenceError, RFMData
+
+
+# names accepted by the ``solver`` argument of the fitters, and the
+# ``scipy.optimize.minimize`` methods they map to.
+_SOLVERS = {
+    "bfgs": "BFGS",
+    "lbfgsb": "L-BFGS-B",
+    "trust-exact": "trust-exact",
+    "newton": "Newton-CG",
+    "nelder-mead": "Nelder-Mead",
+}
+_HESSIAN_METHODS = ("trust-exact", "Newton-CG")
+_BOUNDED_METHODS = ("L-BFGS-B", "Nelder-Mead")
+
+
+def _solver_methods(solver, has_hessian=True, bounded=False):
+    """
+    Translate the ``solver`` argument of ``fit`` into ``scipy.optimize.minimize`` methods.
+
+    Parameters
+    ----------
+    solver: str or None
+        one of 'bfgs', 'lbfgsb', 'trust-exact', 'newton', 'nelder-mead' or
+        'auto'. None keeps scipy's default (BFGS, or L-BFGS-B with bounds).
+        'auto' is a cascade ordered by how the solvers fared on large data:
+        BFGS (L-BFGS-B with bounds) first, then trust-exact when the model
+        provides the Hessian, and Nelder-Mead only when they all fail.
+        trust-exact needs the fewest iterations, but each one evaluates the
+        Hessian, which made it slower than BFGS on 1e7 customers.
+    has_hessian: bool, optional
+        whether the model provides the Hessian of its likelihood.
+    bounded: bool, optional
+        whether the parameters are bounded.
+
+    Returns
+    -------
+    list
+        the methods to try, in order.
+    """
+
+    if solver is None:
+        return [None]
+    if solver == "auto":
+        if bounded:
+            cascade = ["lbfgsb", "nelder-mead"]
+        elif has_hessian:
+            cascade = ["bfgs", "trust-exact", "nelder-mead"]
+        else:
+            cascade = ["bfgs", "nelder-mead"]
+        return [_SOLVERS[name] for name in cascade]
+    if solver not in _SOLVERS:
+        raise ValueError(
+            "solver must be one of %s, 'stochastic' or 'auto', got %r."
+            % (", ".join(repr(name) for name in _SOLVERS), solver)
+        )
+
+    method = _SOLVERS[solver]
+    if method in _HESSIAN_METHODS and not has_hessian:
+        raise ValueError(
+            "The %r solver needs the Hessian of the likelihood, which this model does not provide." % solver
+        )
+    if bounded and method not in _BOUNDED_METHODS:
+        raise ValueError("The %r solver does not support bounds, use 'lbfgsb' or 'nelder-mead'." % solver)
+    return [method]
+
+
+# largest frequency served by a lookup table, to bound its size
+_MAX_LOOKUP_FREQUENCY = 2 ** 20
+
+
+def _integer_frequencies(freq):
+    """
+    The frequencies as an int array if they are small non-negative integers, else None.
+    """
+
+    freq = np.asarray(freq)
+    if freq.size == 0:
+        return None
+    if freq.dtype.kind not in "iu":
+        if freq.dtype.kind != "f" or np.any(freq != np.floor(freq)):
+            return None
+    if freq.min() < 0 or freq.max() > _MAX_LOOKUP_FREQUENCY:
+        return None
+    return freq.astype(int)
+
+
+def _log_rising_factorial(a, n):
+    """
+    Compute ``gammaln(a + n) - gammaln(a)`` with a lookup table over the frequencies ``n``.
+
+    For integer ``n`` this is the sum of ``log(a + k)`` for ``k < n``: the
+    cumulative sums are computed once up to ``max(n)`` and gathered by index,
+    so the number of log evaluations scales with the largest frequency
+    instead of the number of customers. Works with autograd through ``a``.
+    Falls back to ``gammaln`` when ``n`` is not made of small non-negative integers.
+
+    Parameters
+    ----------
+    a: float
+        a (possibly autograd traced) positive scalar.
+    n: array_like
+        the frequencies.
+
+    Returns
+    -------
+    array_like
+        same shape as ``n``.
+    """
+
+    n_int = _integer_frequencies(n)
+    if n_int is None:
+        return gammaln(a + n) - gammaln(a)
+    table = anp.concatenate([anp.zeros(1), anp.cumsum(anp.log(a + anp.arange(n_int.max())))])
+    return table[n_int]
+
+
+def _frequency_weights(freq, weights):
+    """
+    Collapse per-customer weights onto the distinct frequencies.
+
+    A weighted sum of a function of the frequency only, ``sum(weights * f(freq))``,
+    equals ``sum(freq_weights * f(freq_values))``, which needs ``f`` at the
+    distinct frequencies only.
+
+    Returns
+    -------
+    tuple
+        ``(freq_values, freq_weights)``: ``arange(max(freq) + 1)`` and the total
+        weight at each frequency, or ``freq`` and ``weights`` unchanged when the
+        frequencies are not small non-negative integers.
+    """
+
+    table = _FrequencyTable(freq, weights)
+    return table.values, table.weights
+
+
+class _FrequencyTable(object):
+    """
+    The distinct frequencies of a dataset, built once per fit.
+
+    ``values`` and ``weights`` are the ``_frequency_weights`` of the data and
+    ``inverse`` the position of each customer's frequency in ``values`` (None
+    when the frequencies are not small non-negative integers, in which case
+    ``values`` are the frequencies themselves). The likelihoods take it as
+    their optional last argument and evaluate the terms that only depend on
+    the frequency at ``values``, then sum them with ``weights`` or ``gather``
+    them back per customer, so that an evaluation does not rescan the
+    frequencies of every customer. Without it they build their own.
+    """
+
+    def __init__(self, freq, weights):
+        self.inverse = _integer_frequencies(freq)
+        if self.inverse is None:
+            self.values, self.weights = freq, weights
+        else:
+            self.weights = np.bincount(
+                self.inverse.ravel(), weights=np.broadcast_to(weights, self.inverse.shape).ravel()
+            )
+            self.values = np.arange(self.weights.size, dtype=float)
+
+    def gather(self, terms):
+        """The ``terms`` evaluated at ``values``, per customer."""
+        return terms if self.inverse is None else terms[self.inverse]
+
+
+def _minibatch_adam(
+    objective,
+    x0,
+    args,
+    batch_size=10000,
+    epochs=10,
+    learning_rate=0.1,
+    seed=None,
+    bounds=None,
+    disp=False
+):
+    """
+    Minimize a weighted likelihood over shuffled minibatches of customers with Adam.
+
+    Parameters
+    ----------
+    objective: callable
+        ``objective(x, *args)`` returning the value and the gradient. It is
+        evaluated on minibatches, so it should be normalised by the weights,
+        as the fitters' ``_negative_log_likelihood`` are.
+    x0: array_like
+        starting point.
+    args: tuple
+        the arguments of ``objective``. Those with one row per customer (same
+        length as the first one) are sliced into minibatches, the others are
+        passed as they are, except a ``_FrequencyTable`` of the full data,
+        which is replaced by None for the objective to build its own.
+    batch_size: int, optional
+        number of customers per minibatch.
+    epochs: int, optional
+        number of passes over the customers.
+    learning_rate: float, optional
+        initial step size, decayed as ``1 / sqrt(epoch + 1)``.
+    seed: int, optional
+        seed of the shuffling.
+    bounds: sequence, optional
+        ``(min, max)`` pairs, None for no bound, to clip ``x`` to.
+    disp: bool, optional
+        print the mean objective of each epoch.
+
+    Returns
+    -------
+    array
+        the last iterate.
+    """
+
+    args = tuple(
+        None if isinstance(arg, _FrequencyTable) else np.asarray(arg) if np.ndim(arg) else arg for arg in args
+    )
+    n_customers = args[0].shape[0]
+    per_customer = [np.ndim(arg) > 0 and arg.shape[0] == n_customers for arg in args]
+    if bounds is not None:
+        lower = np.array([-np.inf if low is None else low for low, _ in bounds])
+        upper = np.array([np.inf if high is None else high for _, high in bounds])
+
+    rng = np.random.RandomState(seed)
+    x = np.array(x0, dtype=float)
+    first_moment = np.zeros_like(x)
+    second_moment = np.zeros_like(x)
+    beta_1, beta_2, epsilon = 0.9, 0.999, 1e-8
+    step = 0
+    for epoch in range(epochs):
+        step_size = learning_rate / np.sqrt(epoch + 1)
+        order = rng.permutation(n_customers)
+        values = []
+        for start in range(0, n_customers, batch_size):
+            batch = order[start : start + batch_size]
+            value, gradient = objective(
+                x, *(arg[batch] if sliced else arg for arg, sliced in zip(args, per_customer))
+            )
+            values.append(value)
+
+            step += 1
+            first_moment = beta_1 * first_moment + (1 - beta_1) * gradient
+            second_moment = beta_2 * second_moment + (1 - beta_2) * gradient ** 2
+            x = x - step_size * (first_moment / (1 - beta_1 ** step)) / (
+                np.sqrt(second_moment / (1 - beta_2 ** step)) + epsilon
+            )
+            if bounds is not None:
+                x = np.clip(x, lower, upper)
+        if disp:
+            print("Epoch {}: mean minibatch objective {:.6f}".format(epoch + 1, np.mean(values)))
+    return x
 
 
 class BaseFitter(object):
     """Base class for fitters."""
 
+    @property
+    def data(self):
+        """
+        The data the model was fitted on.
+
+        The fitters keep the ``RFMData`` they were fitted on, which shares the
+        caller's arrays (or the mapped columns of an ``RFMStore``), and only
+        build its DataFrame when ``data`` is first accessed.
+        """
+        try:
+            data = self.__dict__["data"]
+        except KeyError:
+            raise AttributeError("data")
+        return data.frame if isinstance(data, RFMData) else data
+
+    @data.setter
+    def data(self, data):
+        self.__dict__["data"] = data
+
     def __repr__(self):
         """Representation of fitter."""
         classname = self.__class__.__name__
         try:
-            subj_str = " fitted with {:d} subjects,".format(self.data.shape[0])
-        except AttributeError:
+            data = self.__dict__["data"]
+            n_subjects = len(data) if isinstance(data, RFMData) else data.shape[0]
+            subj_str = " fitted with {:d} subjects,".format(n_subjects)
+        except (KeyError, AttributeError):
             subj_str = ""
 
         try:
@@ -36,6 +307,53 @@ class BaseFitter(object):
             raise ValueError("Model has not been fit yet. Please call the .fit" " method first.")
         return [self.params_[x] for x in args]
 
+    def _warm_start_params(self, warm_start, initial_params, names, scaled=()):
+        """
+        Starting point of a fit from a previous fit.
+
+        Parameters
+        ----------
+        warm_start: fitter, Series, dict or array_like
+            a fitted model, or its ``params_`` (array_like in the order of ``names``).
+        initial_params: array_like or None
+            the ``initial_params`` argument of ``fit``, which must not be set too.
+        names: list
+            the names of the parameters.
+        scaled: list, optional
+            the parameters in time units, multiplied by ``self._scale`` as the
+            optimizer works on scaled recency and age.
+
+        Returns
+        -------
+        tuple
+            the parameters, ordered as ``names``, and the inverse of the
+            previous ``_hessian_`` when it is available and positive definite,
+            else None.
+        """
+
+        if initial_params is not None:
+            raise ValueError("warm_start and initial_params should not be both set.")
+
+        params = getattr(warm_start, "params_", warm_start)
+        if isinstance(params, (pd.Series, dict)):
+            params = [params[name] for name in names]
+        params = np.array(params, dtype=float)
+        if params.shape != (len(names),):
+            raise ValueError("warm_start should provide the %d parameters %s." % (len(names), ", ".join(names)))
+        for name in scaled:
+            params[names.index(name)] *= self._scale
+
+        hess_inv0 = None
+        hessian_ = getattr(warm_start, "_hessian_", None)
+        if hessian_ is not None:
+            try:
+                np.linalg.cholesky(hessian_)
+                hess_inv0 = np.linalg.inv(hessian_)
+                hess_inv0 = (hess_inv0 + hess_inv0.T) / 2
+            except np.linalg.LinAlgError:
+                pass
+        return params, hess_inv0
+
     def save_model(self, path, save_data=True, save_generate_data_method=True, values_to_save=None):
         """
         Save model with dill package.
@@ -54,6 +372,9 @@ class BaseFitter(object):
             will be extended to attr_list length like [None] * len(attr_list)
 
         """
+        if save_data and "data" in self.__dict__:
+            # the model is saved with the DataFrame, not the RFMData (and its mapped store)
+            self.data = self.data
         attr_list = ["data" * (not save_data), "generate_new_data" * (not save_generate_data_method)]
         _save_obj_without_attr(self, attr_list, path, values_to_save=values_to_save)
 
@@ -70,10 +391,15 @@ class BaseFitter(object):
         with open(path, "rb") as in_file:
             self.__dict__.update(dill.load(in_file).__dict__)
 
+    def _data_weights(self):
+        """The weights of the data, without building the DataFrame of an ``RFMData``."""
+        data = self.__dict__["data"]
+        return data.weights if isinstance(data, RFMData) else data["weights"]
+
     def _compute_variance_matrix(self):
         params_ = self.params_
         return pd.DataFrame(
-            (params_ ** 2).values * np.linalg.inv(self._hessian_) / self.data["weights"].sum(),
+            (params_ ** 2).values * np.linalg.inv(self._hessian_) / self._data_weights().sum(),
             columns=params_.index,
             index=params_.index,
         )
@@ -91,26 +417,62 @@ class BaseFitter(object):
             index=self.params_.index,
         )
 
-    def _fit(self, minimizing_function_args, initial_params, params_size, disp, tol=1e-7, bounds=None, **kwargs):
+    def _fit(
+        self,
+        minimizing_function_args,
+        initial_params,
+        params_size,
+        disp,
+        tol=1e-7,
+        bounds=None,
+        solver=None,
+        hess_inv0=None,
+        **kwargs
+    ):
+        if solver == "stochastic":
+            return self._fit_stochastic(
+                minimizing_function_args, initial_params, params_size, disp, tol, bounds, hess_inv0, **kwargs
+            )
+
         # set options for minimize, if specified in kwargs will be overwritten
         minimize_options = {}
         minimize_options["disp"] = disp
         minimize_options.update(kwargs)
 
+        objective, hessian_function = self._objective_and_hessian()
         current_init_params = 0.1 * np.ones(params_size) if initial_params is None else initial_params
-        output = minimize(
-            value_and_grad(self._negative_log_likelihood),
-            jac=True,
-            method=None,
-            tol=tol,
-            x0=current_init_params,
-            args=minimizing_function_args,
-            options=minimize_options,
-            bounds=bounds,
-        )
-        if output.success:
-            hessian_ = hessian(self._negative_log_likelihood)(output.x, *minimizing_function_args)
-            return output.x, output.fun, hessian_
+        for method in _solver_methods(solver, bounded=bounds is not None):
+            options = minimize_options
+            if hess_inv0 is not None and method in (None, "BFGS") and bounds is None:
+                # warm start: BFGS starts from the curvature of the previous fit
+                options = dict(minimize_options, hess_inv0=hess_inv0)
+            if method == "Nelder-Mead":
+                output = minimize(
+                    self._negative_log_likelihood,
+                    method=method,
+                    tol=tol,
+                    x0=current_init_params,
+                    args=minimizing_function_args,
+                    options=options,
+                    bounds=bounds,
+                )
+            else:
+                output = minimize(
+                    objective,
+                    jac=True,
+                    hess=hessian_function if method in _HESSIAN_METHODS else None,
+                    method=method,
+                    tol=tol,
+                    x0=current_init_params,
+                    args=minimizing_function_args,
+                    options=options,
+                    bounds=bounds,
+                )
+            if output.success and np.isfinite(output.fun):
+                return output.x, output.fun, hessian_function(output.x, *minimizing_function_args)
+            if np.all(np.isfinite(output.x)) and np.isfinite(output.fun):
+                # the next solver in the cascade starts from where this one stopped
+                current_init_params = output.x
         print(output)
         raise ConvergenceError(
             dedent(
@@ -120,6 +482,63 @@ class BaseFitter(object):
             )
         )
 
+    def _objective_and_hessian(self):
+        """
+        The value-and-gradient and the Hessian functions of ``_negative_log_likelihood``.
+
+        Fitters with a closed form gradient and Hessian expose them through
+        ``_negative_log_likelihood_and_derivatives``, otherwise use autograd.
+        """
+
+        derivatives = getattr(self, "_negative_log_likelihood_and_derivatives", None)
+        if derivatives is None:
+            return value_and_grad(self._negative_log_likelihood), hessian(self._negative_log_likelihood)
+        return derivatives, lambda x, *args: derivatives(x, *args, hessian=True)[2]
+
+    def _fit_stochastic(
+        self,
+        minimizing_function_args,
+        initial_params,
+        params_size,
+        disp,
+        tol=1e-7,
+        bounds=None,
+        hess_inv0=None,
+        refine=True,
+        **kwargs
+    ):
+        """
+        Minibatch fit, for customer bases too large for a full pass per optimizer step.
+
+        Runs ``_minibatch_adam`` on the log-parameters, then, if ``refine``,
+        finishes with full-batch steps so that ``params_`` and ``_hessian_`` are
+        those of the full-data optimum. ``refine`` is True for the 'auto'
+        cascade, or the name of a solver. ``kwargs`` are the options of
+        ``_minibatch_adam``: batch_size, epochs, learning_rate and seed.
+        """
+
+        objective, hessian_function = self._objective_and_hessian()
+        current_init_params = 0.1 * np.ones(params_size) if initial_params is None else initial_params
+        log_params = _minibatch_adam(
+            objective, current_init_params, minimizing_function_args, bounds=bounds, disp=disp, **kwargs
+        )
+        if refine:
+            return self._fit(
+                minimizing_function_args,
+                log_params,
+                params_size,
+                disp,
+                tol,
+                bounds,
+                solver="auto" if refine is True else refine,
+                hess_inv0=hess_inv0,
+            )
+        return (
+            log_params,
+            objective(log_params, *minimizing_function_args)[0],
+            hessian_function(log_params, *minimizing_function_args),
+        )
+
     @property
     def summary(self):
         """
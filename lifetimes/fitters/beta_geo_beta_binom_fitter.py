@@ -105,6 +105,8 @@ class BetaGeoBetaBinomFitter(BaseFitter):
         verbose=False,
         tol=1e-7,
         index=None,
+        solver=None,
+        warm_start=None,
         **kwargs
     ):
         """
@@ -134,6 +136,19 @@ class BetaGeoBetaBinomFitter(BaseFitter):
             Tolerance for termination of the function minimization process.
         index: array_like, optional
             Index for resulted DataFrame which is accessible via self.data
+        solver: str, optional
+            Optimizer: 'bfgs', 'lbfgsb', 'trust-exact' or 'newton' (both use
+            the exact Hessian), 'nelder-mead', or 'auto' to try BFGS, then
+            trust-exact, and fall back to Nelder-Mead only on failure.
+            Defaults to scipy's BFGS.
+            'stochastic' fits on shuffled minibatches of customers with Adam,
+            for very large customer bases: its options batch_size, epochs,
+            learning_rate, seed and refine (the full-batch solver to finish
+            with, True for 'auto', False for none) are passed as kwargs.
+        warm_start: fitter, Series, dict or array_like, optional
+            A fitted model (or its ``params_``) to start from, e.g. yesterday's
+            fit when refitting a customer base that barely changed. Its
+            ``_hessian_`` also seeds the inverse Hessian of BFGS.
         kwargs:
             Key word arguments to pass to the scipy.optimize.minimize
             function as options dict
@@ -155,8 +170,22 @@ class BetaGeoBetaBinomFitter(BaseFitter):
 
         _check_inputs(frequency, recency, n_periods)
 
+        hess_inv0 = None
+        if warm_start is not None:
+            initial_params, hess_inv0 = self._warm_start_params(
+                warm_start, initial_params, ["alpha", "beta", "gamma", "delta"]
+            )
+            initial_params = np.log(initial_params)
+
         log_params_, self._negative_log_likelihood_, self._hessian_ = self._fit(
-            (frequency, recency, n_periods, weights, self.penalizer_coef), initial_params, 4, verbose, tol, **kwargs
+            (frequency, recency, n_periods, weights, self.penalizer_coef),
+            initial_params,
+            4,
+            verbose,
+            tol,
+            solver=solver,
+            hess_inv0=hess_inv0,
+            **kwargs
         )
         self.params_ = pd.Series(np.exp(log_params_), index=["alpha", "beta", "gamma", "delta"])
 
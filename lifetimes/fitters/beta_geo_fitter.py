@@ -9,9 +9,9 @@ import pandas as pd
 import autograd.numpy as np
 from autograd.scipy.special import gammaln, beta, gamma
 from scipy.special import hyp2f1
-from scipy.special import expit
-from . import BaseFitter
-from ..utils import _scale_time, _check_inputs
+from scipy.special import expit, digamma, polygamma
+from . import BaseFitter, _log_rising_factorial, _FrequencyTable
+from ..utils import _as_rfm_data, _unpack_rfm_data
 from ..generate_data import beta_geometric_nbd_model
 
 
@@ -70,13 +70,15 @@ class BetaGeoFitter(BaseFitter):
     def fit(
         self, 
         frequency, 
-        recency, 
-        T, 
+        recency=None, 
+        T=None, 
         weights=None, 
         initial_params=None, 
         verbose=False, 
         tol=1e-7, 
         index=None, 
+        solver=None,
+        warm_start=None,
         **kwargs
     ):
         """
@@ -84,9 +86,10 @@ class BetaGeoFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: array_like
+        frequency: array_like, RFMData or RFMStore
             the frequency vector of customers' purchases
-            (denoted x in literature).
+            (denoted x in literature), or an ``RFMData`` or ``RFMStore``
+            to read frequency, recency, T (and weights) from.
         recency: array_like
             the recency vector of customers' purchases
             (denoted t_x in literature).
@@ -110,6 +113,19 @@ class BetaGeoFitter(BaseFitter):
             tolerance for termination of the function minimization process.
         index: array_like, optional
             index for resulted DataFrame which is accessible via self.data
+        solver: str, optional
+            optimizer: 'bfgs', 'lbfgsb', 'trust-exact' or 'newton' (both use
+            the exact Hessian), 'nelder-mead', or 'auto' to try BFGS, then
+            trust-exact, and fall back to Nelder-Mead only on failure.
+            Defaults to scipy's BFGS.
+            'stochastic' fits on shuffled minibatches of customers with Adam,
+            for very large customer bases: its options batch_size, epochs,
+            learning_rate, seed and refine (the full-batch solver to finish
+            with, True for 'auto', False for none) are passed as kwargs.
+        warm_start: fitter, Series, dict or array_like, optional
+            a fitted model (or its ``params_``) to start from, e.g. yesterday's
+            fit when refitting a customer base that barely changed. Its
+            ``_hessian_`` also seeds the inverse Hessian of BFGS.
         kwargs:
             key word arguments to pass to the scipy.optimize.minimize
             function as options dict
@@ -120,33 +136,40 @@ class BetaGeoFitter(BaseFitter):
             with additional properties like ``params_`` and methods like ``predict``
         """
 
-        frequency = np.asarray(frequency).astype(int)
-        recency = np.asarray(recency)
-        T = np.asarray(T)
-        _check_inputs(frequency, recency, T)
+        data = _as_rfm_data(frequency, recency, T, weights, index).validate()
+        T = data.T
 
-        if weights is None:
-            weights = np.ones_like(recency, dtype=int)
-        else:
-            weights = np.asarray(weights)
+        self._scale = data.scale
 
-        self._scale = _scale_time(T)
-        scaled_recency = recency * self._scale
-        scaled_T = T * self._scale
+        hess_inv0 = None
+        if warm_start is not None:
+            initial_params, hess_inv0 = self._warm_start_params(
+                warm_start, initial_params, ["r", "alpha", "a", "b"], scaled=["alpha"]
+            )
+            initial_params = np.log(initial_params)
 
         log_params_, self._negative_log_likelihood_, self._hessian_ = self._fit(
-            (frequency, scaled_recency, scaled_T, weights, self.penalizer_coef),
+            (
+                data.frequency,
+                data.scaled_recency,
+                data.scaled_T,
+                data.weights,
+                self.penalizer_coef,
+                _FrequencyTable(data.frequency, data.weights),
+            ),
             initial_params,
             4,
             verbose,
             tol,
+            solver=solver,
+            hess_inv0=hess_inv0,
             **kwargs
         )
 
         self.params_ = pd.Series(np.exp(log_params_), index=["r", "alpha", "a", "b"])
         self.params_["alpha"] /= self._scale
 
-        self.data = pd.DataFrame({"frequency": frequency, "recency": recency, "T": T, "weights": weights}, index=index)
+        self.data = data
 
         self.generate_new_data = lambda size=1: beta_geometric_nbd_model(
             T, *self._unload_params("r", "alpha", "a", "b"), size=size
@@ -167,11 +190,14 @@ class BetaGeoFitter(BaseFitter):
         rec, 
         T, 
         weights, 
-        penalizer_coef
+        penalizer_coef,
+        freq_table=None
     ):
         """
         The following method for calculatating the *log-likelihood* uses the method
         specified in section 7 of [2]_. More information can also be found in [3]_.
+        The gammaln differences, which only depend on the frequency, are looked
+        up at the distinct frequencies of ``freq_table`` (a ``_FrequencyTable``).
 
         References
         ----------
@@ -186,8 +212,13 @@ class BetaGeoFitter(BaseFitter):
         params = np.exp(log_params)
         r, alpha, a, b = params
 
-        A_1 = gammaln(r + freq) - gammaln(r) + r * np.log(alpha)
-        A_2 = gammaln(a + b) + gammaln(b + freq) - gammaln(b) - gammaln(a + b + freq)
+        if freq_table is None:
+            freq_table = _FrequencyTable(freq, weights)
+        x = freq_table.values
+
+        # gammaln differences at the distinct frequencies, by lookup
+        A_1 = freq_table.gather(_log_rising_factorial(r, x)) + r * np.log(alpha)
+        A_2 = freq_table.gather(_log_rising_factorial(b, x) - _log_rising_factorial(a + b, x))
         A_3 = -(r + freq) * np.log(alpha + T)
         A_4 = np.log(a) - np.log(b + np.maximum(freq, 1) - 1) - (r + freq) * np.log(rec + alpha)
 
@@ -196,12 +227,33 @@ class BetaGeoFitter(BaseFitter):
 
         return -ll.sum() / weights.sum() + penalizer_term
 
+    @staticmethod
+    def _negative_log_likelihood_and_derivatives(
+        log_params,
+        freq,
+        rec,
+        T,
+        weights,
+        penalizer_coef,
+        freq_table=None,
+        hessian=False
+    ):
+        """
+        Closed form value, gradient and (optionally) Hessian of ``_negative_log_likelihood``.
+
+        See ``_bg_nbd_negative_log_likelihood_and_derivatives``.
+        """
+
+        return _bg_nbd_negative_log_likelihood_and_derivatives(
+            log_params, freq, rec, T, weights, penalizer_coef, 0, hessian, freq_table
+        )
+
     def conditional_expected_number_of_purchases_up_to_time(
         self, 
         t, 
         frequency, 
-        recency, 
-        T
+        recency=None, 
+        T=None
     ):
         """
         Conditional expected number of purchases up to time.
@@ -216,8 +268,8 @@ class BetaGeoFitter(BaseFitter):
         ----------
         t: array_like
             times to calculate the expectation for.
-        frequency: array_like
-            historical frequency of customer.
+        frequency: array_like, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: array_like
             historical recency of customer.
         T: array_like
@@ -234,6 +286,7 @@ class BetaGeoFitter(BaseFitter):
         Pareto/NBD Model," Marketing Science, 24 (2), 275-84.
         """
 
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         x = frequency
         r, alpha, a, b = self._unload_params("r", "alpha", "a", "b")
 
@@ -258,8 +311,8 @@ class BetaGeoFitter(BaseFitter):
     def conditional_probability_alive(
         self, 
         frequency, 
-        recency, 
-        T
+        recency=None, 
+        T=None
     ):
         """
         Compute conditional probability alive.
@@ -271,8 +324,8 @@ class BetaGeoFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: array or scalar
-            historical frequency of customer.
+        frequency: array or scalar, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: array or scalar
             historical recency of customer.
         T: array or scalar
@@ -284,6 +337,7 @@ class BetaGeoFitter(BaseFitter):
             value representing a probability
         """
 
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         r, alpha, a, b = self._unload_params("r", "alpha", "a", "b")
 
         log_div = (r + frequency) * np.log((alpha + T) / (alpha + recency)) + np.log(
@@ -409,4 +463,135 @@ class BetaGeoFitter(BaseFitter):
         else:
             second_term = 0
 
-        return first_term + second_term
\ No newline at end of file
+        return first_term + second_term
+
+
+def _bg_nbd_negative_log_likelihood_and_derivatives(
+    log_params,
+    freq,
+    rec,
+    T,
+    weights,
+    penalizer_coef,
+    shift=0,
+    hessian=False,
+    freq_table=None
+):
+    """
+    Analytic negative log-likelihood of the BG/NBD family and its derivatives.
+
+    Both the BG/NBD and the MBG/NBD likelihoods can be written as
+
+        A_1 + A_2 + log(exp(A_3) + exp(A_4))
+
+    where ``shift`` is 0 for the BG/NBD (in which case ``A_4`` only applies
+    to repeat customers) and 1 for the MBG/NBD, which also allows dropping
+    out before the first repeat purchase. Derivatives are taken with respect
+    to ``log_params``, the parameterisation used by the optimizer, using
+    digamma and trigamma functions instead of automatic differentiation.
+
+    Parameters
+    ----------
+    log_params: array_like
+        log of the parameters ``r, alpha, a, b``.
+    freq, rec, T, weights: array_like
+        the (scaled) RFM data and the customer weights.
+    penalizer_coef: float
+        coefficient of the l2 penalty on the parameters.
+    shift: int, optional
+        0 for the BG/NBD model, 1 for the MBG/NBD model.
+    hessian: bool, optional
+        also return the Hessian.
+    freq_table: _FrequencyTable, optional
+        the distinct frequencies of ``freq`` and their total weights, built
+        from ``freq`` and ``weights`` when not given.
+
+    Returns
+    -------
+    tuple
+        ``(value, gradient)``, or ``(value, gradient, hessian)``.
+    """
+
+    params = np.exp(np.asarray(log_params, dtype=float))
+    r, alpha, a, b = params
+    x = np.asarray(freq, dtype=float)
+    rec = np.asarray(rec, dtype=float)
+    T = np.asarray(T, dtype=float)
+    weights = np.asarray(weights, dtype=float)
+    # the terms that only depend on the frequency are summed over its distinct values
+    if freq_table is None:
+        freq_table = _FrequencyTable(x, weights)
+    total_weight = weights.sum()
+    weights = weights / total_weight
+    x_values, x_weights = freq_table.values, freq_table.weights / total_weight
+
+    # denominator of the second exponential term, b + x - 1 (BG) or b + x (MBG)
+    d = b + np.maximum(x + shift, 1) - 1
+    log_alpha_T = np.log(alpha + T)
+    log_alpha_rec = np.log(alpha + rec)
+
+    A_1 = gammaln(r + x_values) - gammaln(r) + r * np.log(alpha)
+    A_2 = gammaln(a + b) + gammaln(b + x_values + shift) - gammaln(b) - gammaln(a + b + x_values + shift)
+    A_3 = -(r + x) * log_alpha_T
+    A_4 = np.where(x + shift > 0, np.log(a) - np.log(d) - (r + x) * log_alpha_rec, -np.inf)
+    L = np.logaddexp(A_3, A_4)
+    value = -(x_weights * (A_1 + A_2)).sum() - (weights * L).sum() + penalizer_coef * (params ** 2).sum()
+
+    # posterior weights of the two terms inside the last logarithm
+    w_4 = np.exp(A_4 - L)
+    w_3 = 1 - w_4
+
+    psi_ab = digamma(a + b)
+    psi_abx = (x_weights * digamma(a + b + x_values + shift)).sum()
+    grad_ll = np.array(
+        [
+            (x_weights * digamma(r + x_values)).sum()
+            - (weights * (w_3 * log_alpha_T + w_4 * log_alpha_rec)).sum()
+            - digamma(r)
+            + np.log(alpha),
+            r / alpha - (weights * (r + x) * (w_3 / (alpha + T) + w_4 / (alpha + rec))).sum(),
+            psi_ab - psi_abx + (weights * w_4).sum() / a,
+            psi_ab
+            - digamma(b)
+            - psi_abx
+            + (x_weights * digamma(b + x_values + shift)).sum()
+            - (weights * w_4 / d).sum(),
+        ]
+    )
+    # gradient with respect to the natural parameters, then to their logs
+    grad_natural = -grad_ll + 2 * penalizer_coef * params
+    gradient = params * grad_natural
+    if not hessian:
+        return value, gradient
+
+    trigamma_ab = polygamma(1, a + b)
+    trigamma_abx = (x_weights * polygamma(1, a + b + x_values + shift)).sum()
+    hess_ll = np.zeros((4, 4))
+    hess_ll[0, 0] = (x_weights * polygamma(1, r + x_values)).sum() - polygamma(1, r)
+    hess_ll[0, 1] = 1 / alpha - (weights * (w_3 / (alpha + T) + w_4 / (alpha + rec))).sum()
+    hess_ll[1, 1] = -r / alpha ** 2 + (weights * (r + x) * (w_3 / (alpha + T) ** 2 + w_4 / (alpha + rec) ** 2)).sum()
+    hess_ll[2, 2] = trigamma_ab - trigamma_abx - (weights * w_4).sum() / a ** 2
+    hess_ll[2, 3] = trigamma_ab - trigamma_abx
+    hess_ll[3, 3] = (
+        trigamma_ab
+        - polygamma(1, b)
+        - trigamma_abx
+        + (x_weights * polygamma(1, b + x_values + shift)).sum()
+        + (weights * w_4 / d ** 2).sum()
+    )
+    hess_ll = np.triu(hess_ll) + np.triu(hess_ll, 1).T
+
+    # mixing term: w_3 * w_4 * (dA_4 - dA_3)(dA_4 - dA_3)^T
+    delta = np.stack(
+        [
+            log_alpha_T - log_alpha_rec,
+            (r + x) * (1 / (alpha + T) - 1 / (alpha + rec)),
+            np.broadcast_to(1 / a, x.shape),
+            -1 / d,
+        ]
+    )
+    hess_ll = hess_ll + np.dot(delta * (weights * w_3 * w_4), delta.T)
+
+    hess_natural = -hess_ll + 2 * penalizer_coef * np.eye(4)
+    hessian_ = np.outer(params, params) * hess_natural + np.diag(gradient)
+    return value, gradient, hessian_
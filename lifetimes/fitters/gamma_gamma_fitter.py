@@ -7,12 +7,11 @@ import warnings
 
 import pandas as pd
 from autograd import numpy as np
-from pandas import DataFrame
 from autograd.scipy.special import gammaln
 
 
 from . import BaseFitter
-from ..utils import _check_inputs, _customer_lifetime_value
+from ..utils import _as_rfm_data, _customer_lifetime_value, RFMData
 
 
 class GammaGammaFitter(BaseFitter):
@@ -130,8 +129,9 @@ class GammaGammaFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: array_like, optional
-            a vector containing the customers' frequencies.
+        frequency: array_like or RFMData, optional
+            a vector containing the customers' frequencies, or an ``RFMData``
+            to read the frequencies and monetary values from.
             Defaults to the whole set of frequencies used for fitting the model.
         monetary_value: array_like, optional
             a vector containing the customers' monetary values.
@@ -144,6 +144,8 @@ class GammaGammaFitter(BaseFitter):
             The conditional expectation of the average profit per transaction
         """
 
+        if isinstance(frequency, RFMData):
+            frequency, monetary_value = frequency.frequency, frequency.monetary_value
         if monetary_value is None:
             monetary_value = self.data["monetary_value"]
         if frequency is None:
@@ -160,13 +162,15 @@ class GammaGammaFitter(BaseFitter):
     def fit(
         self,
         frequency,
-        monetary_value,
+        monetary_value=None,
         weights=None,
         initial_params=None,
         verbose=False,
         tol=1e-7,
         index=None,
         q_constraint=False,
+        solver=None,
+        warm_start=None,
         **kwargs
     ):
         """
@@ -174,9 +178,10 @@ class GammaGammaFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: array_like
+        frequency: array_like, RFMData or RFMStore
             the frequency vector of customers' purchases
-            (denoted x in literature).
+            (denoted x in literature), or an ``RFMData`` or ``RFMStore``
+            to read frequency, monetary_value (and weights) from.
         monetary_value: array_like
             the monetary value vector of customer's purchases
             (denoted m in literature).
@@ -201,6 +206,19 @@ class GammaGammaFitter(BaseFitter):
         q_constraint: bool, optional
             when q < 1, population mean will result in a negative value
             leading to negative CLV outputs. If True, we penalize negative values of q to avoid this issue.
+        solver: str, optional
+            optimizer: 'bfgs', 'lbfgsb', 'trust-exact' or 'newton' (both use
+            the exact Hessian), 'nelder-mead', or 'auto' to try BFGS, then
+            trust-exact, and fall back to Nelder-Mead only on failure.
+            Defaults to scipy's BFGS (L-BFGS-B with ``q_constraint``).
+            'stochastic' fits on shuffled minibatches of customers with Adam,
+            for very large customer bases: its options batch_size, epochs,
+            learning_rate, seed and refine (the full-batch solver to finish
+            with, True for 'auto', False for none) are passed as kwargs.
+        warm_start: fitter, Series, dict or array_like, optional
+            a fitted model (or its ``params_``) to start from, e.g. yesterday's
+            fit when refitting a customer base that barely changed. Its
+            ``_hessian_`` also seeds the inverse Hessian of BFGS.
         kwargs:
             key word arguments to pass to the scipy.optimize.minimize
             function as options dict
@@ -211,29 +229,27 @@ class GammaGammaFitter(BaseFitter):
             fitted and with parameters estimated
         """
 
-        _check_inputs(frequency, monetary_value=monetary_value)
+        data = _as_rfm_data(frequency, weights=weights, index=index, monetary_value=monetary_value)
+        data.validate(monetary_value=True)
 
-        frequency = np.asarray(frequency).astype(float)
-        monetary_value = np.asarray(monetary_value).astype(float)
-
-        if weights is None:
-            weights = np.ones_like(frequency, dtype=int)
-        else:
-            weights = np.asarray(weights)
+        hess_inv0 = None
+        if warm_start is not None:
+            initial_params, hess_inv0 = self._warm_start_params(warm_start, initial_params, ["p", "q", "v"])
+            initial_params = np.log(initial_params)
 
         log_params, self._negative_log_likelihood_, self._hessian_ = self._fit(
-            (frequency, monetary_value, weights, self.penalizer_coef),
+            (data.frequency, data.monetary_value, data.weights, self.penalizer_coef),
             initial_params,
             3,
             verbose,
             tol=tol,
             bounds=((None, None), (0, None), (None, None)) if q_constraint else None,
+            solver=solver,
+            hess_inv0=hess_inv0,
             **kwargs
         )
 
-        self.data = DataFrame(
-            {"monetary_value": monetary_value, "frequency": frequency, "weights": weights}, index=index
-        )
+        self.data = data
 
         self.params_ = pd.Series(np.exp(log_params), index=["p", "q", "v"])
 
@@ -247,9 +263,9 @@ class GammaGammaFitter(BaseFitter):
         self, 
         transaction_prediction_model, 
         frequency, 
-        recency, 
-        T, 
-        monetary_value, 
+        recency=None, 
+        T=None, 
+        monetary_value=None, 
         time=12, 
         discount_rate=0.01, 
         freq="D"
@@ -265,9 +281,10 @@ class GammaGammaFitter(BaseFitter):
         transaction_prediction_model: model
             the model to predict future transactions, literature uses
             pareto/ndb models but we can also use a different model like beta-geo models
-        frequency: array_like
+        frequency: array_like or RFMData
             the frequency vector of customers' purchases
-            (denoted x in literature).
+            (denoted x in literature), or an ``RFMData`` to read
+            frequency, recency, T and monetary_value from.
         recency: the recency vector of customers' purchases
                  (denoted t_x in literature).
         T: array_like
@@ -289,6 +306,11 @@ class GammaGammaFitter(BaseFitter):
             lifetime values as values
         """
 
+        if isinstance(frequency, RFMData):
+            data = frequency
+            frequency = pd.Series(data.frequency, index=data.index)
+            recency, T, monetary_value = data.recency, data.T, data.monetary_value
+
         # use the Gamma-Gamma estimates for the monetary_values
         adjusted_monetary_value = self.conditional_expected_average_profit(frequency, monetary_value)
 
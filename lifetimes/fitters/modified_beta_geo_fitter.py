@@ -9,7 +9,10 @@ from autograd.scipy.special import gammaln, beta, gamma
 from scipy.special import hyp2f1
 
 from lifetimes import BetaGeoFitter
+from lifetimes.fitters import _log_rising_factorial, _FrequencyTable
+from lifetimes.fitters.beta_geo_fitter import _bg_nbd_negative_log_likelihood_and_derivatives
 from lifetimes.generate_data import modified_beta_geometric_nbd_model
+from lifetimes.utils import _as_rfm_data, _unpack_rfm_data
 
 
 class ModifiedBetaGeoFitter(BetaGeoFitter):
@@ -56,16 +59,28 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
         super(ModifiedBetaGeoFitter, self).__init__(penalizer_coef)
 
     def fit(
-        self, frequency, recency, T, weights=None, initial_params=None, verbose=False, tol=1e-7, index=None, **kwargs
+        self,
+        frequency,
+        recency=None,
+        T=None,
+        weights=None,
+        initial_params=None,
+        verbose=False,
+        tol=1e-7,
+        index=None,
+        solver=None,
+        warm_start=None,
+        **kwargs
     ):
         """
         Fit the data to the MBG/NBD model.
 
         Parameters
         ----------
-        frequency: array_like
+        frequency: array_like, RFMData or RFMStore
             the frequency vector of customers' purchases
-            (denoted x in literature).
+            (denoted x in literature), or an ``RFMData`` or ``RFMStore``
+            to read frequency, recency, T (and weights) from.
         recency: array_like
             the recency vector of customers' purchases
             (denoted t_x in literature).
@@ -87,6 +102,19 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
             tolerance for termination of the function minimization process.
         index: array_like, optional
             index for resulted DataFrame which is accessible via self.data
+        solver: str, optional
+            optimizer: 'bfgs', 'lbfgsb', 'trust-exact' or 'newton' (both use
+            the exact Hessian), 'nelder-mead', or 'auto' to try BFGS, then
+            trust-exact, and fall back to Nelder-Mead only on failure.
+            Defaults to scipy's BFGS.
+            'stochastic' fits on shuffled minibatches of customers with Adam,
+            for very large customer bases: its options batch_size, epochs,
+            learning_rate, seed and refine (the full-batch solver to finish
+            with, True for 'auto', False for none) are passed as kwargs.
+        warm_start: fitter, Series, dict or array_like, optional
+            a fitted model (or its ``params_``) to start from, e.g. yesterday's
+            fit when refitting a customer base that barely changed. Its
+            ``_hessian_`` also seeds the inverse Hessian of BFGS.
         kwargs:
             key word arguments to pass to the scipy.optimize.minimize
             function as options dict
@@ -97,14 +125,21 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
             With additional properties and methods like ``params_`` and ``predict``
 
         """
+        data = _as_rfm_data(frequency, recency, T, weights, index)
         # although the parent method is called, this class's
         # _negative_log_likelihood is referenced
         super(ModifiedBetaGeoFitter, self).fit(
-            frequency, recency, T, weights, initial_params, verbose, tol, index=index, **kwargs
+            data,
+            initial_params=initial_params,
+            verbose=verbose,
+            tol=tol,
+            solver=solver,
+            warm_start=warm_start,
+            **kwargs
         )
         # this needs to be reassigned from the parent method
         self.generate_new_data = lambda size=1: modified_beta_geometric_nbd_model(
-            T, *self._unload_params("r", "alpha", "a", "b"), size=size
+            data.T, *self._unload_params("r", "alpha", "a", "b"), size=size
         )
 
         self.variance_matrix_ = self._compute_variance_matrix()
@@ -113,20 +148,33 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
         return self
 
     @staticmethod
-    def _negative_log_likelihood(log_params, freq, rec, T, weights, penalizer_coef):
+    def _negative_log_likelihood(log_params, freq, rec, T, weights, penalizer_coef, freq_table=None):
         warnings.simplefilter(action="ignore", category=FutureWarning)
 
         params = np.exp(log_params)
         r, alpha, a, b = params
 
-        A_1 = gammaln(r + freq) - gammaln(r) + r * log(alpha)
-        A_2 = gammaln(a + b) + gammaln(b + freq + 1) - gammaln(b) - gammaln(a + b + freq + 1)
+        if freq_table is None:
+            freq_table = _FrequencyTable(freq, weights)
+        x = freq_table.values
+
+        # gammaln differences at the distinct frequencies, by lookup
+        A_1 = freq_table.gather(_log_rising_factorial(r, x)) + r * log(alpha)
+        A_2 = freq_table.gather(_log_rising_factorial(b, x + 1) - _log_rising_factorial(a + b, x + 1))
         A_3 = -(r + freq) * log(alpha + T)
         A_4 = log(a) - log(b + freq) + (r + freq) * (log(alpha + T) - log(alpha + rec))
 
         penalizer_term = penalizer_coef * sum(params ** 2)
         return -(weights * (A_1 + A_2 + A_3 + logaddexp(A_4, 0))).sum() / weights.sum() + penalizer_term
 
+    @staticmethod
+    def _negative_log_likelihood_and_derivatives(
+        log_params, freq, rec, T, weights, penalizer_coef, freq_table=None, hessian=False
+    ):
+        return _bg_nbd_negative_log_likelihood_and_derivatives(
+            log_params, freq, rec, T, weights, penalizer_coef, 1, hessian, freq_table
+        )
+
     def expected_number_of_purchases_up_to_time(self, t):
         """
         Return expected number of repeat purchases up to time t.
@@ -148,7 +196,7 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
         hyp = hyp2f1(r, b + 1, a + b, t / (alpha + t))
         return b / (a - 1) * (1 - hyp * (alpha / (alpha + t)) ** r)
 
-    def conditional_expected_number_of_purchases_up_to_time(self, t, frequency, recency, T):
+    def conditional_expected_number_of_purchases_up_to_time(self, t, frequency, recency=None, T=None):
         """
         Conditional expected number of repeat purchases up to time t.
 
@@ -161,8 +209,8 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
         ----------
         t: array_like
             times to calculate the expectation for.
-        frequency: array_like
-            historical frequency of customer.
+        frequency: array_like, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: array_like
             historical recency of customer.
         T: array_like
@@ -173,6 +221,7 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
         array_like
 
         """
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         x = frequency
         r, alpha, a, b = self._unload_params("r", "alpha", "a", "b")
 
@@ -185,7 +234,7 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
 
         return numerator / denominator
 
-    def conditional_probability_alive(self, frequency, recency, T):
+    def conditional_probability_alive(self, frequency, recency=None, T=None):
         """
         Conditional probability alive.
 
@@ -196,8 +245,8 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
 
         Parameters
         ----------
-        frequency: array or float
-            historical frequency of customer.
+        frequency: array or float, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: array or float
             historical recency of customer.
         T: array or float
@@ -209,6 +258,7 @@ class ModifiedBetaGeoFitter(BetaGeoFitter):
             value representing probability of being alive
 
         """
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         r, alpha, a, b = self._unload_params("r", "alpha", "a", "b")
         return np.atleast_1d(1.0 / (1 + (a / (b + frequency)) * ((alpha + T) / (alpha + recency)) ** (r + frequency)))
 
@@ -7,13 +7,12 @@ from __future__ import division
 import pandas as pd
 import numpy as np
 from numpy import log, exp, logaddexp, asarray, any as npany
-from pandas import DataFrame
 from scipy.special import gammaln, hyp2f1, betaln
 from scipy.special import logsumexp
 from scipy.optimize import minimize
 
-from lifetimes.fitters import BaseFitter
-from lifetimes.utils import _check_inputs, _scale_time
+from lifetimes.fitters import BaseFitter, _solver_methods, _log_rising_factorial, _minibatch_adam, _FrequencyTable
+from lifetimes.utils import _as_rfm_data, _unpack_rfm_data
 from lifetimes.generate_data import pareto_nbd_model
 
 
@@ -55,8 +54,8 @@ class ParetoNBDFitter(BaseFitter):
     def fit(
         self,
         frequency,
-        recency,
-        T,
+        recency=None,
+        T=None,
         weights=None,
         iterative_fitting=1,
         initial_params=None,
@@ -65,6 +64,8 @@ class ParetoNBDFitter(BaseFitter):
         index=None,
         fit_method="Nelder-Mead",
         maxiter=2000,
+        solver=None,
+        warm_start=None,
         **kwargs
     ):
         """
@@ -72,9 +73,10 @@ class ParetoNBDFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: array_like
+        frequency: array_like, RFMData or RFMStore
             the frequency vector of customers' purchases
-            (denoted x in literature).
+            (denoted x in literature), or an ``RFMData`` or ``RFMStore``
+            to read frequency, recency, T (and weights) from.
         recency: array_like
             the recency vector of customers' purchases
             (denoted t_x in literature).
@@ -105,6 +107,19 @@ class ParetoNBDFitter(BaseFitter):
         maxiter : int, optional
             max iterations for optimizer in scipy.optimize.minimize will be
             overwritten if set in kwargs.
+        solver: str, optional
+            optimizer: 'bfgs', 'lbfgsb', 'nelder-mead', or 'auto' to try BFGS
+            first and fall back to Nelder-Mead only on failure. Gradients are
+            approximated by finite differences; the exact Hessian solvers are
+            not available for this model. Overrides ``fit_method`` when set.
+            'stochastic' fits on shuffled minibatches of customers with Adam,
+            for very large customer bases: its options batch_size, epochs,
+            learning_rate, seed and refine (the full-batch solver to finish
+            with, True for 'lbfgsb', False for none) are passed as kwargs.
+        warm_start: fitter, Series, dict or array_like, optional
+            a fitted model (or its ``params_``) to start from, e.g. yesterday's
+            fit when refitting a customer base that barely changed. Cannot be
+            combined with ``iterative_fitting``.
         kwargs:
             key word arguments to pass to the scipy.optimize.minimize
             function as options dict
@@ -115,23 +130,18 @@ class ParetoNBDFitter(BaseFitter):
             with additional properties like ``params_`` and methods like ``predict``
         """
 
-        frequency = asarray(frequency).astype(int)
-        recency = asarray(recency)
-        T = asarray(T)
-
-        if weights is None:
-            weights = np.ones(recency.shape[0], dtype=np.int64)
-        else:
-            weights = asarray(weights)
+        data = _as_rfm_data(frequency, recency, T, weights, index).validate()
+        T = data.T
 
-        _check_inputs(frequency, recency, T)
+        self._scale = data.scale
 
-        self._scale = _scale_time(T)
-        scaled_recency = recency * self._scale
-        scaled_T = T * self._scale
+        if warm_start is not None:
+            initial_params, _ = self._warm_start_params(
+                warm_start, initial_params, ["r", "alpha", "s", "beta"], scaled=["alpha", "beta"]
+            )
 
         params, self._negative_log_likelihood_ = self._fit(
-            (frequency, scaled_recency, scaled_T, weights, self.penalizer_coef),
+            (data.frequency, data.scaled_recency, data.scaled_T, data.weights, self.penalizer_coef),
             iterative_fitting,
             initial_params,
             4,
@@ -139,6 +149,7 @@ class ParetoNBDFitter(BaseFitter):
             tol,
             fit_method,
             maxiter,
+            solver,
             **kwargs
         )
         self._hessian_ = None
@@ -146,7 +157,7 @@ class ParetoNBDFitter(BaseFitter):
         self.params_["alpha"] /= self._scale
         self.params_["beta"] /= self._scale
 
-        self.data = DataFrame({"frequency": frequency, "recency": recency, "T": T, "weights": weights}, index=index)
+        self.data = data
         self.generate_new_data = lambda size=1: pareto_nbd_model(
             T, *self._unload_params("r", "alpha", "s", "beta"), size=size
         )
@@ -198,11 +209,16 @@ class ParetoNBDFitter(BaseFitter):
         params, 
         freq, 
         rec, 
-        T
+        T,
+        rising_factorial=True
     ):
         """
         Implements equation (18) from:
         http://brucehardie.com/notes/009/pareto_nbd_derivations_2005-11-05.pdf
+
+        ``rising_factorial=False`` leaves out ``gammaln(r + x) - gammaln(r)``,
+        which only depends on the frequency, for the likelihood to sum it over
+        the distinct frequencies.
         """
 
         r, alpha, s, beta = params
@@ -210,7 +226,10 @@ class ParetoNBDFitter(BaseFitter):
 
         r_s_x = r + s + x
 
-        A_1 = gammaln(r + x) - gammaln(r) + r * log(alpha) + s * log(beta)
+        A_1 = r * log(alpha) + s * log(beta)
+        if rising_factorial:
+            # gammaln(r + x) - gammaln(r) over the integer frequencies, by lookup
+            A_1 = A_1 + _log_rising_factorial(r, x)
         log_A_0 = ParetoNBDFitter._log_A_0(params, x, rec, T)
 
         A_2 = logaddexp(-(r + x) * log(alpha + T) - s * log(beta + T), log(s) + log_A_0 - log(r_s_x))
@@ -224,17 +243,24 @@ class ParetoNBDFitter(BaseFitter):
         rec, 
         T, 
         weights, 
-        penalizer_coef
+        penalizer_coef,
+        freq_table=None
     ):
         """
         Sums the conditional log-likelihood from the ``_conditional_log_likelihood`` function
-        and applies a ``penalizer_coef``.
+        and applies a ``penalizer_coef``. ``gammaln(r + x) - gammaln(r)`` is looked
+        up at the distinct frequencies of ``freq_table`` (a ``_FrequencyTable``).
         """
 
         if npany(asarray(params) <= 0.0):
             return np.inf
 
-        conditional_log_likelihood = ParetoNBDFitter._conditional_log_likelihood(params, freq, rec, T)
+        if freq_table is None:
+            freq_table = _FrequencyTable(freq, weights)
+
+        conditional_log_likelihood = ParetoNBDFitter._conditional_log_likelihood(
+            params, freq, rec, T, rising_factorial=False
+        ) + freq_table.gather(_log_rising_factorial(params[0], freq_table.values))
         penalizer_term = penalizer_coef * sum(np.asarray(params) ** 2)
 
         return -(weights * conditional_log_likelihood).sum() / weights.mean() + penalizer_term
@@ -243,8 +269,8 @@ class ParetoNBDFitter(BaseFitter):
         self, 
         t, 
         frequency, 
-        recency, 
-        T
+        recency=None, 
+        T=None
     ):
         """
         Conditional expected number of purchases up to time.
@@ -260,8 +286,8 @@ class ParetoNBDFitter(BaseFitter):
         ----------
         t: array_like
             times to calculate the expectation for.
-        frequency: array_like
-            historical frequency of customer.
+        frequency: array_like, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: array_like
             historical recency of customer.
         T: array_like
@@ -272,6 +298,7 @@ class ParetoNBDFitter(BaseFitter):
         array_like
         """
 
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         x, t_x = frequency, recency
         params = self._unload_params("r", "alpha", "s", "beta")
         r, alpha, s, beta = params
@@ -288,8 +315,8 @@ class ParetoNBDFitter(BaseFitter):
     def conditional_probability_alive(
         self, 
         frequency, 
-        recency, 
-        T
+        recency=None, 
+        T=None
     ):
         """
         Conditional probability alive.
@@ -302,8 +329,8 @@ class ParetoNBDFitter(BaseFitter):
 
         Parameters
         ----------
-        frequency: float
-            historical frequency of customer.
+        frequency: float, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: float
             historical recency of customer.
         T: float
@@ -316,6 +343,7 @@ class ParetoNBDFitter(BaseFitter):
 
         """
 
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         x, t_x = frequency, recency
         r, alpha, s, beta = self._unload_params("r", "alpha", "s", "beta")
         A_0 = self._log_A_0([r, alpha, s, beta], x, t_x, T)
@@ -390,8 +418,8 @@ class ParetoNBDFitter(BaseFitter):
         n, 
         t, 
         frequency, 
-        recency, 
-        T
+        recency=None, 
+        T=None
     ):
         """
         Return conditional probability of n purchases up to time t.
@@ -408,8 +436,8 @@ class ParetoNBDFitter(BaseFitter):
             number of purchases.
         t: a scalar
             time up to which probability should be calculated.
-        frequency: float
-            historical frequency of customer.
+        frequency: float, RFMData or RFMStore
+            historical frequency of customer, or an ``RFMData`` or ``RFMStore``.
         recency: float
             historical recency of customer.
         T: float
@@ -423,6 +451,7 @@ class ParetoNBDFitter(BaseFitter):
         if t <= 0:
             return 0
 
+        frequency, recency, T = _unpack_rfm_data(frequency, recency, T)
         x, t_x = frequency, recency
         params = self._unload_params("r", "alpha", "s", "beta")
         r, alpha, s, beta = params
@@ -492,6 +521,7 @@ class ParetoNBDFitter(BaseFitter):
         tol=1e-6,
         fit_method="Nelder-Mead",
         maxiter=2000,
+        solver=None,
         **kwargs
     ):
         """
@@ -511,28 +541,65 @@ class ParetoNBDFitter(BaseFitter):
                 "iterative_fitting and initial_params should not be both set, as no improvement could be made."
             )
 
+        if solver == "stochastic":
+            # Adam over minibatches of customers in log-parameter space, then
+            # optionally refine on the full data from there.
+            if iterative_fitting > 1:
+                raise ValueError("iterative_fitting cannot be used with the 'stochastic' solver.")
+            refine = kwargs.pop("refine", True)
+            log_params = _minibatch_adam(
+                _pareto_nbd_minibatch_objective,
+                np.zeros(params_size) if initial_params is None else np.log(initial_params),
+                tuple(minimizing_function_args) + (len(minimizing_function_args[0]),),
+                disp=disp,
+                **kwargs
+            )
+            params = np.exp(log_params)
+            if not refine:
+                return params, self._negative_log_likelihood(params, *minimizing_function_args)
+            # with finite difference gradients, BFGS tends to stop on precision loss near
+            # the optimum, and the 'auto' cascade then drops to Nelder-Mead: use L-BFGS-B
+            initial_params, solver, kwargs = params, "lbfgsb" if refine is True else refine, {}
+
+        # the distinct frequencies are found once, not in every likelihood evaluation
+        freq, weights = minimizing_function_args[0], minimizing_function_args[3]
+        minimizing_function_args = tuple(minimizing_function_args) + (_FrequencyTable(freq, weights),)
+
         # set options for minimize, if specified in kwargs will be overwritten
         minimize_options = {}
         minimize_options["disp"] = disp
         minimize_options["maxiter"] = maxiter
         minimize_options.update(kwargs)
 
+        methods = [fit_method] if solver is None else _solver_methods(solver, has_hessian=False)
+
         total_count = 0
         while total_count < iterative_fitting:
             current_init_params = (
                 np.random.normal(1.0, scale=0.05, size=params_size) if initial_params is None else initial_params
             )
-            if minimize_options["disp"]:
-                print("Optimize function with {}".format(fit_method))
-
-            output = minimize(
-                self._negative_log_likelihood,
-                method=fit_method,
-                tol=tol,
-                x0=current_init_params,
-                args=minimizing_function_args,
-                options=minimize_options,
-            )
+            for method in methods:
+                if minimize_options["disp"]:
+                    print("Optimize function with {}".format(method))
+
+                # the parameters are positive: when the solver cascade picks L-BFGS-B,
+                # bound it away from 0, where the likelihood is infinite, and leave it its
+                # own stopping rule, as it reads ``tol`` as a relative reduction of the
+                # likelihood. An explicit ``fit_method`` runs as given.
+                lbfgsb = solver is not None and method == "L-BFGS-B"
+                output = minimize(
+                    self._negative_log_likelihood,
+                    method=method,
+                    tol=None if lbfgsb else tol,
+                    x0=current_init_params,
+                    args=minimizing_function_args,
+                    options=minimize_options,
+                    bounds=[(1e-8, None)] * params_size if lbfgsb else None,
+                )
+                if output.success and np.isfinite(output.fun):
+                    break
+                if np.all(np.isfinite(output.x)) and np.isfinite(output.fun):
+                    current_init_params = output.x
             sols.append(output.x)
             ll.append(output.fun)
 
@@ -540,4 +607,43 @@ class ParetoNBDFitter(BaseFitter):
         argmin_ll, min_ll = min(enumerate(ll), key=lambda x: x[1])
         minimizing_params = sols[argmin_ll]
 
-        return minimizing_params, min_ll
\ No newline at end of file
+        return minimizing_params, min_ll
+
+
+def _pareto_nbd_minibatch_objective(
+    log_params,
+    freq,
+    rec,
+    T,
+    weights,
+    penalizer_coef,
+    n_customers
+):
+    """
+    Pareto/NBD objective of a minibatch of customers, for ``_minibatch_adam``.
+
+    The negative log-likelihood is normalised by the minibatch weights, and
+    the penalizer by the number of customers, so that it is
+    ``ParetoNBDFitter._negative_log_likelihood / n_customers`` on the full data.
+    The likelihood goes through ``hyp2f1``, which autograd cannot
+    differentiate, so the gradient with respect to ``log_params`` is a
+    forward difference.
+
+    Returns
+    -------
+    tuple
+        the value and the gradient.
+    """
+
+    def value(log_params):
+        params = np.exp(log_params)
+        conditional_log_likelihood = ParetoNBDFitter._conditional_log_likelihood(params, freq, rec, T)
+        return (
+            -(weights * conditional_log_likelihood).sum() / weights.sum()
+            + penalizer_coef * (params ** 2).sum() / n_customers
+        )
+
+    step = 1e-6
+    value_ = value(log_params)
+    gradient = np.array([(value(log_params + step * e) - value_) / step for e in np.eye(len(log_params))])
+    return value_, gradient
@@ -2,16 +2,38 @@
 """Lifetimes utils and helpers."""
 
 from __future__ import division
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
 import numpy as np
 import pandas as pd
 import dill
+from scipy import signal, sparse
 
 pd.options.mode.chained_assignment = None
 
 __all__ = [
     "calibration_and_holdout_data",
+    "calibration_and_holdout_splits",
     "summary_data_from_transaction_data",
+    "summary_data_from_transaction_data_snapshots",
+    "summary_data_from_transaction_data_parallel",
+    "summary_data_from_parquet",
+    "calibration_and_holdout_data_from_parquet",
+    "summary_sql",
+    "summary_data_from_sql",
+    "summary_data_from_transaction_chunks",
+    "RFMState",
+    "PurchaseMatrix",
+    "RFMStore",
+    "save_rfm_store",
+    "load_rfm_store",
+    "compress_rfm",
+    "RFMData",
     "calculate_alive_path",
+    "calculate_alive_paths",
     "expected_cumulative_transactions",
 ]
 
@@ -33,6 +55,9 @@ def calibration_and_holdout_data(
     freq="D",
     datetime_format=None,
     monetary_value_col=None,
+    compact_dtypes=False,
+    integer_periods=False,
+    count_col=None,
 ):
     """
     Create a summary of each customer over a calibration and holdout period.
@@ -43,8 +68,11 @@ def calibration_and_holdout_data(
 
     Parameters
     ----------
-    transactions: :obj: DataFrame
-        a Pandas DataFrame that contains the customer_id col and the datetime col.
+    transactions: :obj: DataFrame or :obj: PurchaseMatrix
+        a Pandas DataFrame that contains the customer_id col and the datetime col,
+        or a PurchaseMatrix built from one. For a PurchaseMatrix, the column
+        names and freq are the ones the matrix was built with, and the
+        calibration and holdout periods are cut on whole periods.
     customer_id_col: string
         the column in transactions DataFrame that denotes the customer_id
     datetime_col:  string
@@ -62,6 +90,19 @@ def calibration_and_holdout_data(
     monetary_value_col: string, optional
         the column in transactions that denotes the monetary value of the transaction.
         Optional, only needed for customer lifetime value estimation models.
+    compact_dtypes: bool, optional
+        Default False. If True, the frequency columns are returned as int32 and
+        the recency and T columns as float32 instead of float64.
+    integer_periods: bool, optional
+        Default False. If True, datetime_col holds integer period ids (e.g. day
+        numbers) instead of datetimes, the transactions may be pre-aggregated
+        to one row per customer and period, and calibration_period_end and
+        observation_period_end are period ids too. freq and datetime_format
+        are then ignored.
+    count_col: string, optional
+        the column in transactions that denotes the number of transactions
+        behind each row, for pre-aggregated transactions. Only used for the
+        monetary_value_holdout column, which is the mean over the transactions.
 
     Returns
     -------
@@ -71,87 +112,2039 @@ def calibration_and_holdout_data(
         monetary_value_holdout.
     """
 
-    def to_period(d):
-        return d.to_period(freq)
+    if isinstance(transactions, PurchaseMatrix):
+        # the matrix only knows the periods: they are cut on the starts of the periods instead
+        # of on the datetimes, the pairs come sorted and the matrix holds the counts
+        customer_id_col, freq = transactions.customer_id_col, transactions.freq
+        customers = transactions.customers
+        codes, periods, values, counts = transactions._customer_periods()
+        datetimes = transactions._period_datetimes(periods)
+        calibration_period_end, observation_period_end = transactions._period_datetimes(
+            [
+                transactions._ordinal(calibration_period_end, datetime_format),
+                transactions._ordinal(observation_period_end, datetime_format),
+            ]
+        )
+    else:
+        if observation_period_end is None:
+            observation_period_end = transactions[datetime_col].max()
+
+        # the ids, datetimes and periods are encoded and sorted once, the calibration and
+        # holdout statistics are then masks over the same sorted arrays
+        codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+        if integer_periods:
+            # the period ids are both the periods and the "datetimes" the periods are cut on
+            freq = None
+            periods = datetimes = _period_ordinals(transactions[datetime_col], freq)
+        else:
+            observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
+            calibration_period_end = pd.to_datetime(calibration_period_end, format=datetime_format)
+            datetimes = pd.DatetimeIndex(pd.to_datetime(transactions[datetime_col], format=datetime_format))
+            periods = _period_ordinals(datetimes, freq)
+        values = transactions[monetary_value_col].values if monetary_value_col else None
+        counts = transactions[count_col].values if count_col else None
+        codes, periods, datetimes, values, counts = _sort_customer_periods(
+            codes, periods, datetimes, values, counts
+        )
+
+    combined_data = _calibration_and_holdout_from_sorted(
+        codes, periods, datetimes, values, calibration_period_end, observation_period_end, freq, counts
+    )
+
+    combined_data.index = customers.take(combined_data.index.values)
+    combined_data.index.name = customer_id_col
+
+    if compact_dtypes:
+        combined_data = _compact_summary_dtypes(combined_data)
+
+    return combined_data
+
+
+def _sort_customer_periods(
+    codes,
+    periods,
+    *columns
+):
+    """
+    Sort transactions by customer then period, dropping the ones with a missing customer or period.
+
+    Returns
+    -------
+    tuple
+        (codes, periods, *columns) in that order, the columns that are None
+        are returned as None.
+    """
+
+    valid = np.flatnonzero((np.asarray(codes) != -1) & (periods != _NAT))
+    order = valid[np.lexsort((periods[valid], codes[valid]))]
+    return (codes[order], periods[order]) + tuple(None if column is None else column[order] for column in columns)
+
+
+def _calibration_and_holdout_from_sorted(
+    codes,
+    periods,
+    datetimes,
+    values,
+    calibration_period_end,
+    observation_period_end,
+    freq,
+    counts=None
+):
+    """
+    Calibration and holdout summary of transactions sorted by ``_sort_customer_periods``.
+
+    Parameters
+    ----------
+    codes, periods: array_like
+        integer customer codes and period ordinals.
+    datetimes: :obj: DatetimeIndex
+        the datetimes of the transactions, the calibration and holdout periods
+        are cut on these rather than on the periods. For integer periods these
+        are the periods themselves.
+    values: array_like or None
+        monetary values.
+    calibration_period_end, observation_period_end: :obj: Timestamp
+        see ``calibration_and_holdout_data``, period ids for integer periods.
+    freq: string or None
+        the frequency the periods were computed with, None for integer periods.
+    counts: array_like, optional
+        the number of transactions behind each row, for pre-aggregated transactions.
+
+    Returns
+    -------
+    :obj: DataFrame
+        the output of ``calibration_and_holdout_data``, indexed by customer code.
+    """
+
+    calibration_summary_data = _calibration_summary_from_sorted(
+        codes, periods, datetimes, values, calibration_period_end, freq
+    )
+    return _join_holdout_summary_from_sorted(
+        calibration_summary_data,
+        codes,
+        periods,
+        datetimes,
+        values,
+        calibration_period_end,
+        observation_period_end,
+        freq,
+        counts,
+    )
+
+
+def _calibration_summary_from_sorted(
+    codes,
+    periods,
+    datetimes,
+    values,
+    calibration_period_end,
+    freq
+):
+    """
+    The ``*_cal`` columns of ``_calibration_and_holdout_from_sorted``.
+    """
+
+    calibration = datetimes <= calibration_period_end
+    calibration_stats = _customer_period_stats(
+        *_collapse_sorted_customer_periods(
+            codes[calibration], periods[calibration], None if values is None else values[calibration]
+        )[:3]
+    )
+    calibration_summary_data = _summary_from_customer_period_stats(
+        calibration_stats,
+        _period_ordinals([calibration_period_end], freq)[0],
+        freq,
+        monetary_value=values is not None,
+    )
+    calibration_summary_data.columns = [c + "_cal" for c in calibration_summary_data.columns]
+    return calibration_summary_data
+
+
+def _join_holdout_summary_from_sorted(
+    calibration_summary_data,
+    codes,
+    periods,
+    datetimes,
+    values,
+    calibration_period_end,
+    observation_period_end,
+    freq,
+    counts=None
+):
+    """
+    Join the ``*_holdout`` columns of ``_calibration_and_holdout_from_sorted`` to the calibration summary.
+    """
+
+    holdout = (datetimes > calibration_period_end) & (datetimes <= observation_period_end)
+    if not holdout.any():
+        raise ValueError(
+            "There is no data available. Check the `observation_period_end` and  `calibration_period_end` and confirm that values in `transactions` occur prior to those dates."
+        )
+
+    holdout_codes = codes[holdout]
+    holdout_periods = _collapse_sorted_customer_periods(holdout_codes, periods[holdout])
+    holdout_customers, holdout_frequency = np.unique(holdout_periods[0], return_counts=True)
+    holdout_summary_data = pd.DataFrame({"frequency_holdout": holdout_frequency}, index=holdout_customers)
+    if values is not None:
+        # the holdout monetary value is the mean over the transactions, not over the periods
+        customer_starts = np.searchsorted(holdout_codes, holdout_customers)
+        if counts is None:
+            holdout_transactions = np.diff(np.append(customer_starts, holdout_codes.shape[0]))
+        else:
+            holdout_transactions = np.add.reduceat(counts[holdout], customer_starts)
+        holdout_summary_data["monetary_value_holdout"] = (
+            np.add.reduceat(values[holdout].astype(float), customer_starts) / holdout_transactions
+        )
+
+    combined_data = calibration_summary_data.join(holdout_summary_data, how="left")
+    combined_data.fillna(0, inplace=True)
+
+    calibration_period_end_ordinal, observation_period_end_ordinal = _period_ordinals(
+        [calibration_period_end, observation_period_end], freq
+    )
+    combined_data["duration_holdout"] = observation_period_end_ordinal - calibration_period_end_ordinal
+
+    return combined_data
+
+
+def calibration_and_holdout_splits(
+    transactions,
+    customer_id_col,
+    datetime_col,
+    calibration_period_ends,
+    holdout_durations,
+    freq="D",
+    datetime_format=None,
+    monetary_value_col=None,
+    compact_dtypes=False,
+):
+    """
+    Generate walk-forward calibration and holdout splits.
+
+    For every calibration_period_end and every holdout duration this yields
+    the same frame as ``calibration_and_holdout_data`` with the observation
+    period ending that many periods after the calibration period end. The
+    transactions are encoded and sorted once for all of the splits, the
+    calibration summary of a calibration_period_end is shared by all of its
+    holdout durations, and the frames are built lazily, one split at a time.
+
+    Parameters
+    ----------
+    transactions: :obj: DataFrame
+        a Pandas DataFrame that contains the customer_id col and the datetime col.
+    customer_id_col: string
+        the column in transactions DataFrame that denotes the customer_id
+    datetime_col:  string
+        the column in transactions that denotes the datetime the purchase was made.
+    calibration_period_ends: list
+        strings or datetimes of the calibration period ends, inclusive.
+    holdout_durations: int or list of int
+        the lengths of the holdout periods, in units of freq.
+    freq: string, optional
+        Default 'D' for days. Other examples: 'W' for weekly.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    monetary_value_col: string, optional
+        the column in transactions that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    compact_dtypes: bool, optional
+        Default False. If True, the frequency columns are returned as int32 and
+        the recency and T columns as float32 instead of float64.
+
+    Yields
+    ------
+    tuple
+        (calibration_period_end, observation_period_end, DataFrame), the DataFrame
+        as returned by ``calibration_and_holdout_data``. The observation_period_end
+        is the calibration_period_end moved forward by the holdout duration,
+        clipped to the last day of its period (e.g. 2015-01-31 plus one month
+        is 2015-02-28).
+    """
+
+    holdout_durations = np.atleast_1d(holdout_durations)
+
+    codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+    datetimes = pd.DatetimeIndex(pd.to_datetime(transactions[datetime_col], format=datetime_format))
+    periods = _period_ordinals(datetimes, freq)
+    values = transactions[monetary_value_col].values if monetary_value_col else None
+    codes, periods, datetimes, values = _sort_customer_periods(codes, periods, datetimes, values)
+
+    for calibration_period_end in calibration_period_ends:
+        calibration_period_end = pd.to_datetime(calibration_period_end, format=datetime_format)
+        calibration_summary_data = _calibration_summary_from_sorted(
+            codes, periods, datetimes, values, calibration_period_end, freq
+        )
+        calibration_period = pd.Period(calibration_period_end, freq)
+
+        for holdout_duration in holdout_durations:
+            # keep the offset into the period, but not past the last day of a shorter period
+            observation_period = calibration_period + int(holdout_duration)
+            observation_period_end = min(
+                observation_period.start_time + (calibration_period_end - calibration_period.start_time),
+                observation_period.end_time.normalize() + (calibration_period_end - calibration_period_end.normalize()),
+            )
+
+            combined_data = _join_holdout_summary_from_sorted(
+                calibration_summary_data,
+                codes,
+                periods,
+                datetimes,
+                values,
+                calibration_period_end,
+                observation_period_end,
+                freq,
+            )
+            combined_data.index = customers.take(combined_data.index.values)
+            combined_data.index.name = customer_id_col
+
+            if compact_dtypes:
+                combined_data = _compact_summary_dtypes(combined_data)
+
+            yield calibration_period_end, observation_period_end, combined_data
+
+
+def _find_first_transactions(
+    transactions,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    datetime_format=None,
+    observation_period_end=None,
+    freq="D",
+):
+    """
+    Return dataframe with first transactions.
+
+    This takes a DataFrame of transaction data of the form:
+        customer_id, datetime [, monetary_value]
+    and appends a column named 'repeated' to the transaction log which indicates which rows
+    are repeated transactions for that customer_id.
+
+    Parameters
+    ----------
+    transactions: :obj: DataFrame
+        a Pandas DataFrame that contains the customer_id col and the datetime col.
+    customer_id_col: string
+        the column in transactions DataFrame that denotes the customer_id
+    datetime_col:  string
+        the column in transactions that denotes the datetime the purchase was made.
+    monetary_value_col: string, optional
+        the column in transactions that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    observation_period_end: :obj: datetime
+        a string or datetime to denote the final date of the study.
+        Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    """
+
+    if observation_period_end is None:
+        observation_period_end = transactions[datetime_col].max()
+
+    if type(observation_period_end) == pd.Period:
+        observation_period_end = observation_period_end.to_timestamp()
+    elif isinstance(observation_period_end, str):
+        observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
+
+    select_columns = [customer_id_col, datetime_col]
+
+    if monetary_value_col:
+        select_columns.append(monetary_value_col)
+
+    # work on integer customer codes and period ordinals instead of sorting the frame and
+    # round-tripping the datetimes through Periods
+    codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+    periods = _period_ordinals(transactions[datetime_col], freq, datetime_format)
+    values = transactions[monetary_value_col].values if monetary_value_col else None
+
+    observed = periods <= _period_ordinals([observation_period_end], freq)[0]
+    codes, periods, values, starts = _distinct_customer_periods(
+        codes[observed], periods[observed], None if values is None else values[observed]
+    )
+
+    # the first row of each customer is their first transaction period
+    first = np.ones(codes.shape[0], dtype=bool)
+    first[1:] = codes[1:] != codes[:-1]
+
+    period_transactions = pd.DataFrame(
+        {customer_id_col: customers.take(codes), datetime_col: _period_index(periods, freq)},
+        # without monetary values each row is labelled with its first transaction in the sorted log
+        index=None if monetary_value_col else starts,
+    )
+    if monetary_value_col:
+        period_transactions[monetary_value_col] = values
+    period_transactions["first"] = first
+    select_columns.append("first")
+
+    return period_transactions[select_columns]
+
+
+def summary_data_from_transaction_data(
+    transactions,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    datetime_format=None,
+    observation_period_end=None,
+    freq="D",
+    freq_multiplier=1,
+    compact_dtypes=False,
+    monetary_stats=False,
+    integer_periods=False,
+):
+    """
+    Return summary data from transactions.
+
+    This transforms a DataFrame of transaction data of the form:
+        customer_id, datetime [, monetary_value]
+    to a DataFrame of the form:
+        customer_id, frequency, recency, T [, monetary_value]
+
+    Parameters
+    ----------
+    transactions: :obj: DataFrame or :obj: PurchaseMatrix
+        a Pandas DataFrame that contains the customer_id col and the datetime col,
+        or a PurchaseMatrix built from one. For a PurchaseMatrix, the column
+        names and freq are the ones the matrix was built with. A pyarrow
+        Table or a polars DataFrame or LazyFrame is aggregated natively by
+        pyarrow.compute or polars (multithreaded, without a conversion to
+        pandas); these support the 'D', 'W' and 'M' freqs.
+    customer_id_col: string
+        the column in transactions DataFrame that denotes the customer_id
+    datetime_col:  string
+        the column in transactions that denotes the datetime the purchase was made.
+    monetary_value_col: string, optional
+        the columns in the transactions that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    observation_period_end: datetime or :obj: Series, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
+         A Series indexed by customer id gives each customer their own end
+         (e.g. the date they were scored): only their transactions up to it
+         count and T is measured up to it. Customers that are not in the
+         Series are left out.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    freq_multiplier: int, optional
+        Default 1, could be use to get exact recency and T, i.e. with freq='W'
+        row for user id_sample=1 will be recency=30 and T=39 while data in
+        CDNOW summary are different. Exact values could be obtained with
+        freq='D' and freq_multiplier=7 which will lead to recency=30.43
+        and T=38.86
+    compact_dtypes: bool, optional
+        Default False. If True, the frequency columns are returned as int32 and
+        the recency and T columns as float32 instead of float64.
+    monetary_stats: bool, optional
+        Default False. If True (and monetary_value_col is given), also return
+        the monetary_value_variance (the sample variance of the repeat period
+        values behind monetary_value, 0 with fewer than two repeat periods),
+        first_value (the value of the first period) and total_value (the
+        total spend) columns, e.g. for Gamma-Gamma diagnostics. They come out
+        of the same pass over the sorted transactions as the other columns.
+        The number of repeat periods behind monetary_value is the frequency.
+    integer_periods: bool, optional
+        Default False. If True, datetime_col holds integer period ids (e.g. day
+        numbers) instead of datetimes, and observation_period_end is a period
+        id too. The transactions may then be pre-aggregated to one row per
+        customer and period, with the period total in monetary_value_col.
+        freq and datetime_format are ignored, recency and T are differences
+        of period ids divided by freq_multiplier.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value [, monetary_value_variance, first_value, total_value]]
+    """
+
+    if isinstance(transactions, PurchaseMatrix):
+        customer_id_col, monetary_value_col, freq = (
+            transactions.customer_id_col,
+            transactions.monetary_value_col,
+            transactions.freq,
+        )
+    elif integer_periods:
+        freq = None
+    monetary_stats = monetary_stats and bool(monetary_value_col)
+
+    if isinstance(transactions, PurchaseMatrix):
+        # the matrix holds the distinct (customer, period) pairs already
+        if isinstance(observation_period_end, pd.Series):
+            observation_period_end = _customer_period_ends(
+                observation_period_end, transactions.customers, freq, datetime_format
+            )
+        else:
+            observation_period_end = transactions._ordinal(observation_period_end, datetime_format)
+        codes, periods, values, _ = transactions._customer_periods(last=observation_period_end)
+        stats = _customer_period_stats(codes, periods, values, variance=monetary_stats)
+        if np.ndim(observation_period_end):
+            observation_period_end = observation_period_end[stats.index.values]
+        stats.index = transactions.customers.take(stats.index.values)
+    else:
+        stats, observation_period_end = _transactions_backend(transactions).customer_period_stats(
+            transactions,
+            customer_id_col,
+            datetime_col,
+            monetary_value_col=monetary_value_col,
+            datetime_format=datetime_format,
+            observation_period_end=observation_period_end,
+            freq=freq,
+            variance=monetary_stats,
+        )
+    stats.index.name = customer_id_col
+
+    summary = _summary_from_customer_period_stats(
+        stats,
+        observation_period_end,
+        freq,
+        freq_multiplier,
+        monetary_value=bool(monetary_value_col),
+        monetary_stats=monetary_stats,
+    )
+    return _compact_summary_dtypes(summary) if compact_dtypes else summary
+
+
+def _factorize_customer_ids(
+    customer_ids
+):
+    """
+    Dictionary encode customer ids.
+
+    Returns
+    -------
+    tuple
+        (codes, customers): the integer code of each id (-1 for missing ids),
+        int32 unless there are too many customers, and the distinct ids in
+        sorted order, so that the codes sort like the ids.
+    """
+
+    # factorize a typed array, not the Series, which warns for object ids;
+    # numeric ids keep their dtype and its typed hashing
+    if isinstance(customer_ids, (pd.Series, pd.Index)):
+        customer_ids = customer_ids.array
+    else:
+        customer_ids = np.asarray(customer_ids)
+        if customer_ids.dtype.kind in "OSU":
+            customer_ids = customer_ids.astype(object)
+    codes, customers = pd.factorize(customer_ids, sort=True)
+    # keep the dtype of the ids, the Index would re-infer object ids
+    customers = pd.Index(customers, dtype=object if pd.api.types.is_object_dtype(customers.dtype) else None)
+    if customers.shape[0] < np.iinfo(np.int32).max:
+        codes = codes.astype(np.int32)
+    return codes, customers
+
+
+def _compact_summary_dtypes(
+    summary
+):
+    """
+    Downcast the frequency columns of a summary to int32 and the recency and T columns to float32.
+    """
+
+    dtypes = {}
+    for column in summary.columns:
+        if column.startswith("frequency"):
+            dtypes[column] = np.int32
+        elif column.startswith("recency") or column.startswith("T"):
+            dtypes[column] = np.float32
+    return summary.astype(dtypes)
+
+
+class _TransactionBackend(object):
+    """
+    Compute engine behind ``summary_data_from_transaction_data``.
+
+    A backend aggregates a table of transactions to per customer period
+    statistics: the columns of ``_customer_period_stats``, indexed by the
+    sorted customer ids. The frequency, recency and T columns are then
+    computed from them the same way for every backend.
+    ``_transactions_backend`` picks the first backend of ``_BACKENDS`` that
+    accepts the table.
+    """
+
+    def accepts(
+        self,
+        transactions
+    ):
+        """Whether the backend can aggregate transactions."""
+        raise NotImplementedError
+
+    def customer_period_stats(
+        self,
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        observation_period_end=None,
+        freq="D",
+        variance=False
+    ):
+        """
+        Aggregate the transactions up to the end of the observation period.
+
+        The parameters are those of ``summary_data_from_transaction_data``,
+        freq is None for integer periods.
+
+        Returns
+        -------
+        tuple
+            (stats, observation_period_end), the statistics and the period
+            ordinal of the end of the observation period, or an array of the
+            ordinals of each row of the statistics for per customer ends.
+        """
+        raise NotImplementedError
+
+
+class _PandasBackend(_TransactionBackend):
+    """
+    NumPy aggregation of a pandas DataFrame, the default backend.
+    """
+
+    def accepts(
+        self,
+        transactions
+    ):
+        """Any table with pandas-like column access."""
+        return True
+
+    def customer_period_stats(
+        self,
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        observation_period_end=None,
+        freq="D",
+        variance=False
+    ):
+        """See ``_TransactionBackend.customer_period_stats``."""
+
+        codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+        periods = _period_ordinals(transactions[datetime_col], freq, datetime_format)
+        values = transactions[monetary_value_col].values if monetary_value_col else None
+
+        if isinstance(observation_period_end, pd.Series):
+            # each transaction is compared to the end of its own customer, before anything is sorted
+            observation_period_end = _customer_period_ends(observation_period_end, customers, freq, datetime_format)
+            observed = (codes != -1) & (periods <= observation_period_end[codes])
+        else:
+            if observation_period_end is None:
+                observation_period_end = transactions[datetime_col].max()
+            observation_period_end = _period_end_ordinal(observation_period_end, freq, datetime_format)
+            observed = periods <= observation_period_end
+
+        # only one pass over the (customer, period) pairs is needed for all of the statistics,
+        # the monetary value of the first period is kept aside so that it can be excluded
+        codes, periods, values, _ = _distinct_customer_periods(
+            codes[observed], periods[observed], None if values is None else values[observed]
+        )
+        stats = _customer_period_stats(codes, periods, values, variance=variance)
+        if np.ndim(observation_period_end):
+            observation_period_end = observation_period_end[stats.index.values]
+        stats.index = customers.take(stats.index.values)
+        return stats, observation_period_end
+
+
+def _customer_period_ends(
+    observation_period_ends,
+    customers,
+    freq,
+    datetime_format=None
+):
+    """
+    The period ordinal of the end of the observation period of each customer.
+
+    Parameters
+    ----------
+    observation_period_ends: :obj: Series
+        the end of the observation period of the customers, indexed by customer id.
+    customers: :obj: Index
+        the customer ids, as returned by ``_factorize_customer_ids``.
+
+    Returns
+    -------
+    array
+        the ordinal for each customer in customers, ``_NAT`` for the customers
+        without an end so that none of their periods are observed.
+    """
+
+    if not observation_period_ends.index.is_unique:
+        raise ValueError("observation_period_end has more than one end for some customers.")
+
+    ends = np.full(len(customers), _NAT, dtype=np.int64)
+    positions = customers.get_indexer(observation_period_ends.index)
+    known = positions != -1
+    ends[positions[known]] = _period_ordinals(observation_period_ends.values, freq, datetime_format)[known]
+    return ends
+
+
+def _stats_from_customer_aggregates(
+    customers,
+    first,
+    last,
+    count,
+    first_value=None,
+    total=None,
+    repeat_variance=None
+):
+    """
+    ``_customer_period_stats`` from per customer aggregates of the (customer, period) pairs.
+
+    repeat_variance, if given, is the sample variance of the values of each
+    customer's periods after the first, as computed by the engine (NaN for
+    fewer than two such periods). The engines' variance aggregations are
+    numerically stable, unlike a variance taken from the sums of the values
+    and of their squares, which cancels catastrophically for large values.
+    """
+
+    stats = pd.DataFrame(
+        {"first": np.asarray(first), "last": np.asarray(last), "count": np.asarray(count, dtype=np.int64)},
+        index=pd.Index(np.asarray(customers)),
+    )
+    if first_value is not None:
+        stats["first_value"] = np.asarray(first_value)
+        stats["total"] = np.asarray(total)
+
+    if repeat_variance is not None:
+        repeat_variance = np.asarray(repeat_variance, dtype=float)
+        repeats = stats["count"].values - 1
+        stats["repeat_variance"] = np.where(repeats > 1, np.clip(np.nan_to_num(repeat_variance), 0, None), 0)
+
+    return stats
+
+
+class _ArrowBackend(_TransactionBackend):
+    """
+    pyarrow.compute aggregation of a pyarrow Table.
+
+    The periods are computed with Arrow temporal kernels and the
+    (customer, period) pairs are collapsed and aggregated per customer with
+    Arrow's multithreaded hash group by, so only the per customer result is
+    converted.
+    """
+
+    def accepts(
+        self,
+        transactions
+    ):
+        """pyarrow Tables, pyarrow is not imported for other tables."""
+        pa = sys.modules.get("pyarrow")
+        return pa is not None and isinstance(transactions, pa.Table)
+
+    def _periods(
+        self,
+        datetimes,
+        freq,
+        datetime_format=None
+    ):
+        """Period ordinals of an Arrow array of datetimes, see ``_period_ordinals``."""
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if freq is None:
+            return pc.cast(datetimes, pa.int64())
+
+        if pa.types.is_string(datetimes.type) or pa.types.is_large_string(datetimes.type):
+            if datetime_format:
+                datetimes = pc.strptime(datetimes, format=datetime_format, unit="ns")
+            else:
+                datetimes = pc.cast(datetimes, pa.timestamp("ns"))
+        elif pa.types.is_timestamp(datetimes.type) and datetimes.type.tz is not None:
+            # the periods are those of the local wall time, like pandas' to_period
+            datetimes = pc.local_timestamp(datetimes)
+
+        if freq == "D":
+            days = pc.cast(datetimes, pa.date32())
+        elif freq == "W":
+            # weeks start on Monday, so the day ordinal of their start plus 3 is a multiple of 7
+            days = pc.cast(pc.floor_temporal(datetimes, unit="week", week_starts_monday=True), pa.date32())
+        elif freq == "M":
+            return pc.add(
+                pc.multiply(pc.subtract(pc.year(datetimes), 1970), 12), pc.subtract(pc.month(datetimes), 1)
+            )
+        else:
+            raise ValueError("The pyarrow backend supports the 'D', 'W' and 'M' freqs, not {!r}.".format(freq))
+
+        days = pc.cast(pc.cast(days, pa.int32()), pa.int64())
+        return days if freq == "D" else pc.add(pc.divide(pc.add(days, 3), 7), 1)
+
+    def customer_period_stats(
+        self,
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        observation_period_end=None,
+        freq="D",
+        variance=False
+    ):
+        """See ``_TransactionBackend.customer_period_stats``."""
+
+        if isinstance(observation_period_end, pd.Series):
+            raise ValueError("Per customer observation_period_end requires a pandas DataFrame or a PurchaseMatrix.")
+
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        periods = self._periods(transactions.column(datetime_col), freq, datetime_format)
+        if observation_period_end is None:
+            observation_period_end = pc.max(periods).as_py()
+        else:
+            observation_period_end = _period_end_ordinal(observation_period_end, freq, datetime_format)
+
+        columns = {"customer": transactions.column(customer_id_col), "period": periods}
+        if monetary_value_col:
+            columns["value"] = transactions.column(monetary_value_col)
+        table = pa.table(columns)
+        # missing periods compare to null and are dropped by the filter
+        observed = pc.less_equal(table.column("period"), observation_period_end)
+        table = table.filter(pc.and_(pc.is_valid(table.column("customer")), observed))
+
+        pairs = table.group_by(["customer", "period"]).aggregate([("value", "sum")] if monetary_value_col else [])
+        aggregations = [("period", "min"), ("period", "max"), ("period", "count")]
+        if monetary_value_col:
+            aggregations += [("value_sum", "sum")]
+        customers = pairs.group_by("customer").aggregate(aggregations)
+
+        if monetary_value_col:
+            # the value of the first period of each customer
+            first_values = pairs.select(["customer", "period", "value_sum"]).rename_columns(
+                ["customer", "period", "first_value"]
+            )
+            customers = customers.join(first_values, keys=["customer", "period_min"], right_keys=["customer", "period"])
+        if monetary_value_col and variance:
+            # Arrow's variance of the periods after each customer's first, customers
+            # without two such periods get a null from the left join
+            pairs = pairs.join(customers.select(["customer", "period_min"]), keys="customer")
+            repeats = pairs.filter(pc.greater(pairs.column("period"), pairs.column("period_min")))
+            repeat_variances = repeats.group_by("customer").aggregate(
+                [("value_sum", "variance", pc.VarianceOptions(ddof=1))]
+            )
+            customers = customers.join(repeat_variances, keys="customer")
+        customers = customers.sort_by("customer")
+
+        def column(name):
+            return customers.column(name).to_numpy()
+
+        stats = _stats_from_customer_aggregates(
+            column("customer"),
+            column("period_min"),
+            column("period_max"),
+            column("period_count"),
+            first_value=column("first_value") if monetary_value_col else None,
+            total=column("value_sum_sum") if monetary_value_col else None,
+            repeat_variance=column("value_sum_variance") if monetary_value_col and variance else None,
+        )
+        return stats, observation_period_end
+
+
+class _PolarsBackend(_TransactionBackend):
+    """
+    polars aggregation of a polars DataFrame or LazyFrame.
+
+    The whole aggregation is one lazy query, run by polars' multithreaded
+    engine, so only the per customer result is converted.
+    """
+
+    def accepts(
+        self,
+        transactions
+    ):
+        """polars DataFrames and LazyFrames, polars is not imported for other tables."""
+        pl = sys.modules.get("polars")
+        return pl is not None and isinstance(transactions, (pl.DataFrame, pl.LazyFrame))
+
+    def customer_period_stats(
+        self,
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        observation_period_end=None,
+        freq="D",
+        variance=False
+    ):
+        """See ``_TransactionBackend.customer_period_stats``."""
+
+        if isinstance(observation_period_end, pd.Series):
+            raise ValueError("Per customer observation_period_end requires a pandas DataFrame or a PurchaseMatrix.")
+
+        import polars as pl
+
+        transactions = transactions.lazy()
+        datetimes = pl.col(datetime_col)
+        if freq is None:
+            periods = datetimes.cast(pl.Int64)
+        else:
+            dtype = transactions.collect_schema()[datetime_col]
+            if dtype == pl.String:
+                datetimes = datetimes.str.to_datetime(format=datetime_format)
+            elif isinstance(dtype, pl.Datetime) and dtype.time_zone is not None:
+                # the periods are those of the local wall time, like pandas' to_period
+                datetimes = datetimes.dt.replace_time_zone(None)
+
+            days = datetimes.cast(pl.Date).cast(pl.Int64)
+            if freq == "D":
+                periods = days
+            elif freq == "W":
+                periods = (days + 3) // 7 + 1
+            elif freq == "M":
+                periods = (datetimes.dt.year().cast(pl.Int64) - 1970) * 12 + datetimes.dt.month().cast(pl.Int64) - 1
+            else:
+                raise ValueError("The polars backend supports the 'D', 'W' and 'M' freqs, not {!r}.".format(freq))
+
+        columns = [pl.col(customer_id_col).alias("customer"), periods.alias("period")]
+        if monetary_value_col:
+            columns.append(pl.col(monetary_value_col).alias("value"))
+        transactions = transactions.select(columns)
+
+        if observation_period_end is None:
+            observation_period_end = transactions.select(pl.col("period").max()).collect().item()
+        else:
+            observation_period_end = _period_end_ordinal(observation_period_end, freq, datetime_format)
+
+        observed = transactions.filter(pl.col("customer").is_not_null() & (pl.col("period") <= observation_period_end))
+        aggregations = [
+            pl.col("period").min().alias("first"),
+            pl.col("period").max().alias("last"),
+            pl.len().alias("count"),
+        ]
+        if monetary_value_col:
+            pairs = observed.group_by(["customer", "period"]).agg(pl.col("value").sum())
+            aggregations += [
+                pl.col("value").sort_by("period").first().alias("first_value"),
+                pl.col("value").sum().alias("total"),
+            ]
+            if variance:
+                # polars' variance of the periods after each customer's first
+                is_repeat = pl.col("period") != pl.col("period").min()
+                aggregations.append(pl.col("value").filter(is_repeat).var(ddof=1).alias("repeat_variance"))
+        else:
+            pairs = observed.unique(["customer", "period"])
+        customers = pairs.group_by("customer").agg(aggregations).sort("customer").collect()
+
+        stats = _stats_from_customer_aggregates(
+            customers["customer"].to_numpy(),
+            customers["first"].to_numpy(),
+            customers["last"].to_numpy(),
+            customers["count"].to_numpy(),
+            first_value=customers["first_value"].to_numpy() if monetary_value_col else None,
+            total=customers["total"].to_numpy() if monetary_value_col else None,
+            repeat_variance=customers["repeat_variance"].to_numpy() if monetary_value_col and variance else None,
+        )
+        return stats, observation_period_end
+
+
+_BACKENDS = [_ArrowBackend(), _PolarsBackend(), _PandasBackend()]
+
+
+def _transactions_backend(
+    transactions
+):
+    """
+    The first backend of ``_BACKENDS`` that accepts the transactions.
+    """
+
+    return next(backend for backend in _BACKENDS if backend.accepts(transactions))
+
+
+def summary_data_from_transaction_data_snapshots(
+    transactions,
+    customer_id_col,
+    datetime_col,
+    observation_period_ends,
+    monetary_value_col=None,
+    datetime_format=None,
+    freq="D",
+    freq_multiplier=1,
+    compact_dtypes=False,
+):
+    """
+    Return summary data at several observation period ends.
+
+    This gives the same snapshots as calling ``summary_data_from_transaction_data``
+    once per observation_period_end, but the transactions are converted to
+    periods and sorted only once. Every snapshot is then read off the same
+    sorted (customer, period) pairs with a binary search per customer.
+
+    Parameters
+    ----------
+    transactions: :obj: DataFrame
+        a Pandas DataFrame that contains the customer_id col and the datetime col.
+    customer_id_col: string
+        the column in transactions DataFrame that denotes the customer_id
+    datetime_col:  string
+        the column in transactions that denotes the datetime the purchase was made.
+    observation_period_ends: list
+        strings or datetimes that denote the final date of each snapshot.
+        Events after the date are truncated from that snapshot.
+    monetary_value_col: string, optional
+        the columns in the transactions that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    freq_multiplier: int, optional
+        Default 1, see ``summary_data_from_transaction_data``.
+    compact_dtypes: bool, optional
+        Default False. If True, the frequency columns are returned as int32 and
+        the recency and T columns as float32 instead of float64.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value] of every snapshot,
+        indexed by (observation_period_end, customer_id). A snapshot only has the
+        customers with a purchase up to its observation_period_end.
+    """
+
+    observation_period_ends = pd.DatetimeIndex(
+        pd.to_datetime(list(observation_period_ends), format=datetime_format), name="observation_period_end"
+    )
+
+    codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+    periods = _period_ordinals(transactions[datetime_col], freq, datetime_format)
+    values = transactions[monetary_value_col].values if monetary_value_col else None
+
+    codes, periods, values, _ = _distinct_customer_periods(codes, periods, values)
+    keys = _pair_keys(codes, periods)
+
+    boundaries = np.ones(codes.shape[0], dtype=bool)
+    boundaries[1:] = codes[1:] != codes[:-1]
+    customer_starts = np.flatnonzero(boundaries)
+    customer_codes = codes[customer_starts]
+
+    snapshots = []
+    for observation_period_end in _period_ordinals(observation_period_ends, freq):
+        # the pairs of a customer are sorted by period, so the pairs up to the end of this
+        # snapshot are those before the key of (customer, observation_period_end)
+        stops = np.searchsorted(keys, _pair_keys(customer_codes, observation_period_end), side="right")
+        observed = stops > customer_starts
+        starts, stops = customer_starts[observed], stops[observed]
+
+        stats = pd.DataFrame(
+            {"first": periods[starts], "last": periods[stops - 1], "count": stops - starts},
+            index=customers.take(codes[starts]),
+        )
+        stats.index.name = customer_id_col
+        if values is not None:
+            # the observed pairs of each customer are a prefix of their pairs, so once the later
+            # pairs are dropped the customers' sums start at the cumulative counts
+            stats["first_value"] = values[starts]
+            observed_values = values[periods <= observation_period_end]
+            offsets = np.cumsum(stats["count"].values) - stats["count"].values
+            stats["total"] = np.add.reduceat(observed_values, offsets) if starts.shape[0] else values[:0]
+
+        snapshots.append(
+            _summary_from_customer_period_stats(
+                stats, observation_period_end, freq, freq_multiplier, monetary_value=bool(monetary_value_col)
+            )
+        )
+
+    summary = pd.concat(snapshots, keys=observation_period_ends, names=[observation_period_ends.name, customer_id_col])
+    return _compact_summary_dtypes(summary) if compact_dtypes else summary
+
+
+def summary_data_from_transaction_data_parallel(
+    transactions,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    datetime_format=None,
+    observation_period_end=None,
+    freq="D",
+    freq_multiplier=1,
+    n_shards=None,
+    executor=None,
+):
+    """
+    Return summary data from transactions, built over customer shards in parallel.
+
+    The transactions are hash partitioned by customer id, so a customer's
+    transactions never cross shards, and ``summary_data_from_transaction_data``
+    is run on each shard in a separate process. The result is identical to the
+    serial function.
+
+    Parameters
+    ----------
+    transactions: :obj: DataFrame
+        a Pandas DataFrame that contains the customer_id col and the datetime col.
+    customer_id_col: string
+        the column in transactions DataFrame that denotes the customer_id
+    datetime_col:  string
+        the column in transactions that denotes the datetime the purchase was made.
+    monetary_value_col: string, optional
+        the columns in the transactions that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    observation_period_end: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    freq_multiplier: int, optional
+        Default 1, see ``summary_data_from_transaction_data``.
+    n_shards: int, optional
+        the number of customer shards. Defaults to the number of CPUs.
+    executor: :obj: concurrent.futures.Executor, optional
+        the executor to submit the shards to. Defaults to a ProcessPoolExecutor
+        with one worker per shard, which is shut down afterwards.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value]
+    """
+
+    # the default end of the observation period is global, not per shard
+    if observation_period_end is None:
+        observation_period_end = transactions[datetime_col].max()
+    observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
+
+    n_shards = n_shards or os.cpu_count() or 1
+
+    select_columns = [customer_id_col, datetime_col]
+    if monetary_value_col:
+        select_columns.append(monetary_value_col)
+
+    hashes = pd.util.hash_pandas_object(transactions[customer_id_col], index=False).values
+    shards = (hashes % n_shards).astype(np.int64)
+    order = np.argsort(shards, kind="mergesort")
+    bounds = np.append(0, np.cumsum(np.bincount(shards, minlength=n_shards)))
+    transactions = transactions[select_columns].iloc[order]
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=n_shards)
+
+    try:
+        futures = [
+            executor.submit(
+                summary_data_from_transaction_data,
+                transactions.iloc[start:end],
+                customer_id_col,
+                datetime_col,
+                monetary_value_col=monetary_value_col,
+                datetime_format=datetime_format,
+                observation_period_end=observation_period_end,
+                freq=freq,
+                freq_multiplier=freq_multiplier,
+            )
+            for start, end in zip(bounds[:-1], bounds[1:])
+            if end > start
+        ]
+        summaries = [future.result() for future in futures]
+    finally:
+        if own_executor:
+            executor.shutdown()
+
+    if not summaries:
+        return summary_data_from_transaction_data(
+            transactions,
+            customer_id_col,
+            datetime_col,
+            monetary_value_col=monetary_value_col,
+            datetime_format=datetime_format,
+            observation_period_end=observation_period_end,
+            freq=freq,
+            freq_multiplier=freq_multiplier,
+        )
+
+    return pd.concat(summaries).sort_index()
+
+
+def _read_parquet_transactions(
+    path,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    before=None,
+    until=None,
+):
+    """
+    Read the transaction columns of a (partitioned) Parquet dataset.
+
+    Only the customer id, datetime and monetary value columns are read, and
+    the date bounds are pushed into the scan so that files and row groups
+    whose statistics fall outside of them are skipped. The bounds are only
+    pushed down for timestamp and date typed columns.
+
+    Parameters
+    ----------
+    path: string or list
+        path to a Parquet file or a directory of (hive partitioned) Parquet files.
+    before: datetime, optional
+        keep only the transactions strictly before this datetime.
+    until: datetime, optional
+        keep only the transactions up to and including this datetime.
+
+    Returns
+    -------
+    :obj: DataFrame
+        the transaction columns.
+    """
+
+    try:
+        import pyarrow as pa
+        import pyarrow.dataset as ds
+    except ImportError:
+        raise ImportError("Reading transactions from Parquet requires pyarrow. Install it with `pip install pyarrow`.")
+
+    columns = [customer_id_col, datetime_col]
+    if monetary_value_col:
+        columns.append(monetary_value_col)
+
+    dataset = ds.dataset(path, format="parquet", partitioning="hive")
+    datetime_type = dataset.schema.field(datetime_col).type
+
+    row_filter = None
+    if pa.types.is_timestamp(datetime_type) or pa.types.is_date(datetime_type):
+        field = ds.field(datetime_col)
+        for bound, compare in [(before, field.__lt__), (until, field.__le__)]:
+            if bound is not None:
+                bound = pa.scalar(pd.Timestamp(bound).to_pydatetime()).cast(datetime_type)
+                row_filter = compare(bound) if row_filter is None else row_filter & compare(bound)
+
+    return dataset.to_table(columns=columns, filter=row_filter).to_pandas()
+
+
+def summary_data_from_parquet(
+    path,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    datetime_format=None,
+    observation_period_end=None,
+    freq="D",
+    freq_multiplier=1,
+    compact_dtypes=False,
+):
+    """
+    Return summary data from transactions stored as Parquet.
+
+    Like ``summary_data_from_transaction_data``, but the transactions are
+    read from a Parquet file or a partitioned Parquet dataset: only the
+    needed columns are read, and the end of the observation period is pushed
+    into the scan so that row groups after it are skipped. Requires pyarrow.
+
+    Parameters
+    ----------
+    path: string or list
+        path to a Parquet file or a directory of (hive partitioned) Parquet files.
+    customer_id_col: string
+        the column in the dataset that denotes the customer_id
+    datetime_col:  string
+        the column in the dataset that denotes the datetime the purchase was made.
+        Dates are only pushed into the scan when it is a timestamp or date column.
+    monetary_value_col: string, optional
+        the column in the dataset that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    datetime_format: string, optional
+        a string that represents the timestamp format, for string datetime columns.
+    observation_period_end: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    freq_multiplier: int, optional
+        Default 1, see ``summary_data_from_transaction_data``.
+    compact_dtypes: bool, optional
+        Default False, see ``summary_data_from_transaction_data``.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value]
+    """
+
+    before = None
+    if observation_period_end is not None:
+        observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
+        # transactions in the same period as the end of the observation period are kept
+        before = _period_start([_period_ordinals([observation_period_end], freq)[0] + 1], freq)[0]
+
+    transactions = _read_parquet_transactions(path, customer_id_col, datetime_col, monetary_value_col, before=before)
+
+    return summary_data_from_transaction_data(
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=monetary_value_col,
+        datetime_format=datetime_format,
+        observation_period_end=observation_period_end,
+        freq=freq,
+        freq_multiplier=freq_multiplier,
+        compact_dtypes=compact_dtypes,
+    )
+
+
+def calibration_and_holdout_data_from_parquet(
+    path,
+    customer_id_col,
+    datetime_col,
+    calibration_period_end,
+    observation_period_end=None,
+    freq="D",
+    datetime_format=None,
+    monetary_value_col=None,
+    compact_dtypes=False,
+):
+    """
+    Create a calibration and holdout summary from transactions stored as Parquet.
+
+    Like ``calibration_and_holdout_data``, but the transactions are read from
+    a Parquet file or a partitioned Parquet dataset: only the needed columns
+    are read, and the end of the holdout period is pushed into the scan so
+    that row groups after it are skipped. Requires pyarrow.
+
+    Parameters
+    ----------
+    path: string or list
+        path to a Parquet file or a directory of (hive partitioned) Parquet files.
+    customer_id_col: string
+        the column in the dataset that denotes the customer_id
+    datetime_col:  string
+        the column in the dataset that denotes the datetime the purchase was made.
+        Dates are only pushed into the scan when it is a timestamp or date column.
+    calibration_period_end: :obj: datetime
+        a period to limit the calibration to, inclusive.
+    observation_period_end: :obj: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
+    freq: string, optional
+        Default 'D' for days. Other examples: 'W' for weekly.
+    datetime_format: string, optional
+        a string that represents the timestamp format, for string datetime columns.
+    monetary_value_col: string, optional
+        the column in the dataset that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    compact_dtypes: bool, optional
+        Default False, see ``calibration_and_holdout_data``.
+
+    Returns
+    -------
+    :obj: DataFrame
+        A dataframe with columns frequency_cal, recency_cal, T_cal, frequency_holdout, duration_holdout
+        If monetary_value_col isn't None, the dataframe will also have the columns monetary_value_cal and
+        monetary_value_holdout.
+    """
+
+    until = None
+    if observation_period_end is not None:
+        until = observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
+
+    transactions = _read_parquet_transactions(path, customer_id_col, datetime_col, monetary_value_col, until=until)
+
+    return calibration_and_holdout_data(
+        transactions,
+        customer_id_col,
+        datetime_col,
+        calibration_period_end,
+        observation_period_end=observation_period_end,
+        freq=freq,
+        datetime_format=datetime_format,
+        monetary_value_col=monetary_value_col,
+        compact_dtypes=compact_dtypes,
+    )
+
+
+# SQLite expressions of the period ordinals of an ISO-8601 datetime column, the same integers
+# as ``_period_ordinals``: the day ordinal is the Julian day number minus the one of 1970-01-01,
+# and 2440585 = 7 * 348655 is the Julian day number of the Monday of the week with ordinal 1
+_SQLITE_PERIOD_TEMPLATES = {
+    "D": "(CAST(julianday(date({column})) + 0.5 AS INTEGER) - 2440588)",
+    "W": "(CAST(julianday(date({column})) + 0.5 AS INTEGER) / 7 - 348654)",
+    "M": "((CAST(strftime('%Y', {column}) AS INTEGER) - 1970) * 12 + CAST(strftime('%m', {column}) AS INTEGER) - 1)",
+}
+
+
+def _quote_sql_identifier(
+    name
+):
+    """Quote a column name for SQL."""
+    return '"{}"'.format(name.replace('"', '""'))
+
+
+def _period_end_ordinal(
+    period_end,
+    freq,
+    datetime_format=None
+):
+    """
+    The period ordinal of a datetime, or of a period id if freq is None.
+    """
+
+    if freq is not None:
+        period_end = pd.to_datetime(period_end, format=datetime_format)
+    return _period_ordinals([period_end], freq)[0]
+
+
+def summary_sql(
+    table,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    observation_period_end=None,
+    datetime_format=None,
+    freq="D",
+    integer_periods=False,
+    period_template=None,
+):
+    """
+    Return the SQL query that aggregates transactions to per customer period statistics.
+
+    The query buckets the transactions into periods and collapses them to
+    one row per (customer, period) like ``_find_first_transactions``, drops
+    the periods after the end of the observation period, and aggregates the
+    rest to one row per customer. ``summary_data_from_sql`` runs it and
+    turns the result into the summary.
+
+    Parameters
+    ----------
+    table: string
+        the table (or a parenthesized, aliased subquery) with the transactions,
+        inserted into the query as is.
+    customer_id_col: string
+        the column in the table that denotes the customer_id
+    datetime_col:  string
+        the column in the table that denotes the datetime the purchase was made.
+        With the built-in SQLite templates it must hold ISO-8601 strings, as
+        written by ``DataFrame.to_sql``.
+    monetary_value_col: string, optional
+        the column in the table that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    observation_period_end: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, all the transactions are kept.
+    datetime_format: string, optional
+        a string that represents the timestamp format of observation_period_end.
+    freq: string, optional
+        Default 'D' for days. The built-in SQLite templates cover 'D', 'W' and 'M'.
+    integer_periods: bool, optional
+        Default False. If True, datetime_col holds integer period ids, see
+        ``summary_data_from_transaction_data``.
+    period_template: string, optional
+        a SQL expression with a ``{column}`` placeholder that computes the
+        period ordinal (the same integer as ``pd.Period(d, freq).ordinal``)
+        of the datetime column, for other engines or frequencies.
+
+    Returns
+    -------
+    string
+        a query returning one row per customer with the columns customer_id,
+        first_period, last_period and period_count [, first_value, total]:
+        the first and last period ordinal, the number of distinct periods, the
+        value in the first period and the value summed over all the periods.
+    """
+
+    if integer_periods:
+        freq = None
+        period_template = period_template or "{column}"
+    elif period_template is None:
+        if freq not in _SQLITE_PERIOD_TEMPLATES:
+            raise ValueError(
+                "There is no SQLite period template for freq {!r}, pass a period_template.".format(freq)
+            )
+        period_template = _SQLITE_PERIOD_TEMPLATES[freq]
+
+    customer = _quote_sql_identifier(customer_id_col)
+    datetime = _quote_sql_identifier(datetime_col)
+    period = period_template.format(column=datetime)
+
+    end_filter = ""
+    if observation_period_end is not None:
+        observation_period_end = _period_end_ordinal(observation_period_end, freq, datetime_format)
+        end_filter = " AND {} <= {:d}".format(period, observation_period_end)
+
+    value, total, first_value, first_join = "", "", "", ""
+    if monetary_value_col:
+        value = ", SUM({}) AS value".format(_quote_sql_identifier(monetary_value_col))
+        total = ", SUM(value) AS total"
+        first_value = ", periods.value AS first_value, customers.total"
+        first_join = (
+            "\nJOIN periods ON periods.customer_id = customers.customer_id"
+            " AND periods.period = customers.first_period"
+        )
+
+    return """WITH periods AS (
+    SELECT {customer} AS customer_id, {period} AS period{value}
+    FROM {table}
+    WHERE {customer} IS NOT NULL AND {datetime} IS NOT NULL{end_filter}
+    GROUP BY {customer}, {period}
+),
+customers AS (
+    SELECT customer_id, MIN(period) AS first_period, MAX(period) AS last_period, COUNT(*) AS period_count{total}
+    FROM periods
+    GROUP BY customer_id
+)
+SELECT
+    customers.customer_id, customers.first_period, customers.last_period, customers.period_count{first_value}
+FROM customers{first_join}""".format(
+        customer=customer,
+        datetime=datetime,
+        period=period,
+        value=value,
+        table=table,
+        end_filter=end_filter,
+        total=total,
+        first_value=first_value,
+        first_join=first_join,
+    )
+
+
+def summary_data_from_sql(
+    connection,
+    table,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    observation_period_end=None,
+    datetime_format=None,
+    freq="D",
+    freq_multiplier=1,
+    integer_periods=False,
+    period_template=None,
+    compact_dtypes=False,
+):
+    """
+    Return summary data from transactions stored in a SQL database.
+
+    Like ``summary_data_from_transaction_data``, but the aggregation is
+    pushed into the database with the query of ``summary_sql``: it runs
+    through a DB-API 2.0 connection and only one row per customer comes back.
+    The built-in period templates are for SQLite, other engines need a
+    period_template.
+
+    Parameters
+    ----------
+    connection:
+        a DB-API 2.0 connection, e.g. ``sqlite3.connect(...)``.
+    table: string
+        the table (or a parenthesized, aliased subquery) with the transactions.
+    customer_id_col: string
+        the column in the table that denotes the customer_id
+    datetime_col:  string
+        the column in the table that denotes the datetime the purchase was made.
+    monetary_value_col: string, optional
+        the column in the table that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    observation_period_end: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the last period in the table.
+    datetime_format: string, optional
+        a string that represents the timestamp format of observation_period_end.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks or 'M' for months.
+    freq_multiplier: int, optional
+        Default 1, see ``summary_data_from_transaction_data``.
+    integer_periods: bool, optional
+        Default False, see ``summary_data_from_transaction_data``.
+    period_template: string, optional
+        see ``summary_sql``.
+    compact_dtypes: bool, optional
+        Default False, see ``summary_data_from_transaction_data``.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value]
+    """
+
+    query = summary_sql(
+        table,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=monetary_value_col,
+        observation_period_end=observation_period_end,
+        datetime_format=datetime_format,
+        freq=freq,
+        integer_periods=integer_periods,
+        period_template=period_template,
+    )
+
+    cursor = connection.cursor()
+    try:
+        cursor.execute(query)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    columns = ["customer_id", "first", "last", "count"]
+    if monetary_value_col:
+        columns += ["first_value", "total"]
+    stats = pd.DataFrame.from_records(rows, columns=columns, index="customer_id").sort_index()
+    stats.index.name = customer_id_col
+
+    if integer_periods:
+        freq = None
+    if observation_period_end is None:
+        observation_period_end = stats["last"].max()
+    else:
+        observation_period_end = _period_end_ordinal(observation_period_end, freq, datetime_format)
+
+    summary = _summary_from_customer_period_stats(
+        stats, observation_period_end, freq, freq_multiplier, monetary_value=bool(monetary_value_col)
+    )
+    return _compact_summary_dtypes(summary) if compact_dtypes else summary
+
+
+_NAT = np.iinfo(np.int64).min
+
+# frequencies whose periods are a plain NumPy datetime64 unit: the ordinal of a datetime
+# is the datetime cast to that unit, counted from the epoch like pandas' Period ordinals
+_NUMPY_PERIOD_UNITS = {"D": "D", "H": "h", "M": "M"}
+
+
+def _period_ordinals(
+    datetimes,
+    freq,
+    datetime_format=None
+):
+    """
+    Convert datetimes to integer period ordinals.
+
+    The ordinals are the same integers as ``pd.Period(d, freq).ordinal``, so
+    two datetimes fall into the same period iff their ordinals are equal, and
+    ordinals are ordered like the periods themselves. Missing datetimes map
+    to ``_NAT``.
+
+    For 'D', 'W', 'H' and 'M' the ordinals are computed with NumPy
+    arithmetic on the int64 nanoseconds, without building any Periods.
+    If freq is None the values are integer period ids already and are
+    returned as int64, with missing ids mapped to ``_NAT``.
+    """
+
+    if freq is None:
+        ids = pd.Series(datetimes)
+        if ids.dtype.kind in "iu" and not ids.hasnans:
+            return ids.to_numpy(dtype=np.int64)
+        ids = ids.to_numpy(dtype=float, na_value=np.nan)
+        return np.where(np.isnan(ids), _NAT, ids).astype(np.int64)
+
+    datetimes = pd.DatetimeIndex(pd.to_datetime(datetimes, format=datetime_format))
+
+    if datetimes.tz is not None or (freq not in _NUMPY_PERIOD_UNITS and freq != "W"):
+        return np.asarray(datetimes.to_period(freq).asi8, dtype=np.int64)
+
+    values = datetimes.values
+    if freq == "W":
+        # weeks end on Sunday, 1970-01-01 is a Thursday in the week with ordinal 1
+        ordinals = (values.astype("datetime64[D]").astype(np.int64) + 3) // 7 + 1
+    else:
+        ordinals = values.astype("datetime64[%s]" % _NUMPY_PERIOD_UNITS[freq]).astype(np.int64)
+
+    return np.where(np.isnat(values), _NAT, ordinals)
+
+
+def _period_start(
+    ordinals,
+    freq
+):
+    """
+    Return the start timestamps (as a DatetimeIndex) of integer period ordinals.
+    """
+
+    ordinals = np.asarray(ordinals, dtype=np.int64)
+
+    if freq == "W":
+        return pd.DatetimeIndex((7 * (ordinals - 1) - 3).astype("datetime64[D]").astype("datetime64[ns]"))
+    if freq in _NUMPY_PERIOD_UNITS:
+        return pd.DatetimeIndex(
+            ordinals.astype("datetime64[%s]" % _NUMPY_PERIOD_UNITS[freq]).astype("datetime64[ns]")
+        )
+    return pd.PeriodIndex(ordinal=ordinals, freq=freq).to_timestamp()
+
+
+def _period_index(
+    ordinals,
+    freq
+):
+    """
+    Return a PeriodIndex from integer period ordinals.
+    """
+
+    return pd.PeriodIndex(ordinal=np.asarray(ordinals, dtype=np.int64), freq=freq)
+
+
+def _distinct_customer_periods(
+    codes,
+    periods,
+    values=None
+):
+    """
+    Collapse transactions to one row per (customer, period).
+
+    Transactions with a missing customer (code -1) or a missing period are
+    dropped.
+
+    Parameters
+    ----------
+    codes: array_like
+        integer customer codes, one per transaction.
+    periods: array_like
+        integer period ordinals, one per transaction.
+    values: array_like, optional
+        monetary values, one per transaction. Values in the same
+        (customer, period) are summed together.
+
+    Returns
+    -------
+    tuple
+        (codes, periods, values, starts) of the distinct pairs sorted by customer
+        then period; ``starts`` is the position of the first transaction of each
+        pair in that sort order. ``values`` is None if no values were given.
+    """
+
+    codes = np.asarray(codes)
+    periods = np.asarray(periods)
+    valid = (codes != -1) & (periods != _NAT)
+    if not valid.all():
+        codes, periods = codes[valid], periods[valid]
+        values = None if values is None else np.asarray(values)[valid]
+
+    order = np.lexsort((periods, codes))
+    return _collapse_sorted_customer_periods(
+        codes[order], periods[order], None if values is None else np.asarray(values)[order]
+    )
+
+
+def _collapse_sorted_customer_periods(
+    codes,
+    periods,
+    values=None
+):
+    """
+    ``_distinct_customer_periods`` of transactions that are already sorted by customer then period.
+    """
+
+    boundaries = np.ones(codes.shape[0], dtype=bool)
+    boundaries[1:] = (codes[1:] != codes[:-1]) | (periods[1:] != periods[:-1])
+    starts = np.flatnonzero(boundaries)
+
+    if values is not None:
+        values = np.add.reduceat(values, starts) if starts.shape[0] else values
+
+    return codes[starts], periods[starts], values, starts
+
+
+def _customer_period_stats(
+    codes,
+    periods,
+    values=None,
+    variance=False
+):
+    """
+    Per customer period statistics from distinct (customer, period) pairs.
+
+    The pairs must be sorted by customer then period, as returned by
+    ``_distinct_customer_periods``.
+
+    Returns
+    -------
+    :obj: DataFrame
+        indexed by customer code, with columns first, last and count (the
+        first and last period ordinal and the number of distinct periods). If
+        values are given, also first_value (the value in the first period)
+        and total (the sum over all periods), and if variance is True the
+        repeat_variance column (the sample variance of the values of the
+        periods after the first, 0 with fewer than two such periods).
+    """
+
+    boundaries = np.ones(codes.shape[0], dtype=bool)
+    boundaries[1:] = codes[1:] != codes[:-1]
+    starts = np.flatnonzero(boundaries)
+    ends = np.append(starts[1:], codes.shape[0]) if starts.shape[0] else starts
+
+    stats = pd.DataFrame(
+        {"first": periods[starts], "last": periods[ends - 1], "count": ends - starts}, index=codes[starts]
+    )
+    if values is not None:
+        stats["first_value"] = values[starts]
+        stats["total"] = np.add.reduceat(values, starts) if starts.shape[0] else values[:0]
+
+    if values is not None and variance:
+        # deviations from the repeat mean, the first period of each customer is not a repeat
+        repeats = stats["count"].values - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            repeat_mean = np.where(repeats > 0, (stats["total"].values - stats["first_value"].values) / repeats, 0)
+        deviations = values - np.repeat(repeat_mean, ends - starts)
+        deviations[starts] = 0
+        squares = np.add.reduceat(deviations ** 2, starts) if starts.shape[0] else deviations[:0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stats["repeat_variance"] = np.where(repeats > 1, squares / (repeats - 1), 0)
+
+    return stats
+
+
+def _summary_from_customer_period_stats(
+    stats,
+    observation_period_end,
+    freq,
+    freq_multiplier=1,
+    monetary_value=False,
+    monetary_stats=False
+):
+    """
+    Turn per customer period statistics into a frequency/recency/T summary.
+
+    Parameters
+    ----------
+    stats: :obj: DataFrame
+        the output of ``_customer_period_stats``, indexed by customer.
+    observation_period_end: int or array_like
+        the period ordinal of the end of the observation period, or an array
+        of the ordinals of each row of stats.
+    freq: string or None
+        the frequency the ordinals were computed with, None for integer periods.
+    freq_multiplier: int, optional
+        see ``summary_data_from_transaction_data``.
+    monetary_value: bool, optional
+        add the mean value over the repeat periods as a monetary_value column.
+    monetary_stats: bool, optional
+        also add the monetary_value_variance, first_value and total_value
+        columns, stats must have the repeat_variance column.
+
+    Returns
+    -------
+    :obj: DataFrame
+        frequency, recency, T [, monetary_value] with the same index as stats.
+    """
+
+    summary = pd.DataFrame(index=stats.index)
+    summary["frequency"] = stats["count"].values - 1
+    if freq is None:
+        first = stats["first"].values
+        summary["recency"] = (stats["last"].values - first) / freq_multiplier
+        summary["T"] = (observation_period_end - first) / freq_multiplier
+    else:
+        first = _period_start(stats["first"].values, freq)
+        last = _period_start(stats["last"].values, freq)
+        end = _period_start(np.atleast_1d(observation_period_end), freq)
+        if not np.ndim(observation_period_end):
+            end = end[0]
+        summary["recency"] = np.asarray((last - first) / np.timedelta64(1, freq) / freq_multiplier)
+        summary["T"] = np.asarray((end - first) / np.timedelta64(1, freq) / freq_multiplier)
+
+    if monetary_value:
+        repeat_total = stats["total"].values - stats["first_value"].values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            summary["monetary_value"] = np.where(
+                summary["frequency"] > 0, repeat_total / summary["frequency"].values, 0
+            )
+
+    if monetary_stats:
+        summary["monetary_value_variance"] = stats["repeat_variance"].values
+        summary["first_value"] = stats["first_value"].values
+        summary["total_value"] = stats["total"].values
+
+    return summary.astype(float)
+
+
+def summary_data_from_transaction_chunks(
+    chunks,
+    customer_id_col,
+    datetime_col,
+    monetary_value_col=None,
+    datetime_format=None,
+    observation_period_end=None,
+    freq="D",
+    freq_multiplier=1,
+):
+    """
+    Return summary data from an iterator of transaction chunks.
+
+    This is a streaming version of ``summary_data_from_transaction_data`` for
+    transaction logs that do not fit in memory, e.g. the output of
+    ``pd.read_csv(..., chunksize=...)``. Only a compact per customer
+    accumulator (first period, last period, number of distinct periods and
+    the monetary totals) is kept between chunks, so the peak memory is set
+    by the number of customers plus the size of one chunk.
+
+    A customer's transactions may be in any order within a chunk, but across
+    chunks they must not go back to a period before the last period already
+    seen for that customer (a time ordered log satisfies this).
+
+    Parameters
+    ----------
+    chunks: iterable of :obj: DataFrame
+        Pandas DataFrames that contain the customer_id col and the datetime col.
+    customer_id_col: string
+        the column in the chunks that denotes the customer_id
+    datetime_col:  string
+        the column in the chunks that denotes the datetime the purchase was made.
+    monetary_value_col: string, optional
+        the column in the chunks that denotes the monetary value of the transaction.
+        Optional, only needed for customer lifetime value estimation models.
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't understand
+        the provided format.
+    observation_period_end: datetime, optional
+         a string or datetime to denote the final date of the study.
+         Events after this date are truncated. If not given, defaults to the max 'datetime_col',
+         and is required when the chunks hold no transactions.
+    freq: string, optional
+        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+    freq_multiplier: int, optional
+        Default 1, see ``summary_data_from_transaction_data``.
+
+    Returns
+    -------
+    :obj: DataFrame:
+        customer_id, frequency, recency, T [, monetary_value]
+    """
+
+    if observation_period_end is not None:
+        observation_period_end = _period_ordinals(
+            [pd.to_datetime(observation_period_end, format=datetime_format)], freq
+        )[0]
+
+    accumulator = None
+    max_period = None
+
+    for chunk in chunks:
+        periods = _period_ordinals(chunk[datetime_col], freq, datetime_format)
+        codes, customers = _factorize_customer_ids(chunk[customer_id_col])
+        values = chunk[monetary_value_col].values if monetary_value_col else None
+
+        if periods.shape[0]:
+            max_period = periods.max() if max_period is None else max(max_period, periods.max())
+
+        if observation_period_end is not None:
+            observed = periods <= observation_period_end
+            codes, periods = codes[observed], periods[observed]
+            if values is not None:
+                values = values[observed]
+
+        stats = _customer_period_stats(*_distinct_customer_periods(codes, periods, values)[:3])
+        stats.index = customers.take(stats.index.values)
+        accumulator = stats if accumulator is None else _append_customer_period_stats(accumulator, stats)
 
     if observation_period_end is None:
-        observation_period_end = transactions[datetime_col].max()
+        if max_period is None:
+            raise ValueError("No transactions were seen in the chunks, observation_period_end is required.")
+        observation_period_end = max_period
 
-    transaction_cols = [customer_id_col, datetime_col]
-    if monetary_value_col:
-        transaction_cols.append(monetary_value_col)
-    transactions = transactions[transaction_cols].copy()
+    if accumulator is None:
+        accumulator = _customer_period_stats(np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64))
+        if monetary_value_col:
+            accumulator["first_value"] = accumulator["total"] = np.empty(0)
 
-    transactions[datetime_col] = pd.to_datetime(transactions[datetime_col], format=datetime_format)
-    observation_period_end = pd.to_datetime(observation_period_end, format=datetime_format)
-    calibration_period_end = pd.to_datetime(calibration_period_end, format=datetime_format)
+    accumulator = accumulator.sort_index()
+    accumulator.index.name = customer_id_col
 
-    # create calibration dataset
-    calibration_transactions = transactions.loc[transactions[datetime_col] <= calibration_period_end]
-    calibration_summary_data = summary_data_from_transaction_data(
-        calibration_transactions,
-        customer_id_col,
-        datetime_col,
-        datetime_format=datetime_format,
-        observation_period_end=calibration_period_end,
-        freq=freq,
-        monetary_value_col=monetary_value_col,
+    return _summary_from_customer_period_stats(
+        accumulator, observation_period_end, freq, freq_multiplier, monetary_value=bool(monetary_value_col)
     )
-    calibration_summary_data.columns = [c + "_cal" for c in calibration_summary_data.columns]
 
-    # create holdout dataset
-    holdout_transactions = transactions.loc[
-        (observation_period_end >= transactions[datetime_col]) & (transactions[datetime_col] > calibration_period_end)
-    ]
 
-    if holdout_transactions.empty:
+def _append_customer_period_stats(
+    accumulator,
+    stats
+):
+    """
+    Append the period statistics of a later chunk to an accumulator.
+
+    Both are indexed by customer. A customer's periods in ``stats`` must not
+    come before their last period in ``accumulator``; if the first period of
+    the new chunk is the same as the last one already seen, that period is
+    only counted once.
+    """
+
+    seen = stats.index.isin(accumulator.index)
+    old = accumulator.loc[stats.index[seen]]
+    new = stats[seen]
+
+    if (new["first"].values < old["last"].values).any():
         raise ValueError(
-            "There is no data available. Check the `observation_period_end` and  `calibration_period_end` and confirm that values in `transactions` occur prior to those dates."
+            "Transactions are out of chronological order between chunks: a customer has a purchase in a "
+            "period before their last period of an earlier chunk."
         )
 
-    holdout_transactions[datetime_col] = holdout_transactions[datetime_col].map(to_period)
-    holdout_summary_data = (
-        holdout_transactions.groupby([customer_id_col, datetime_col], sort=False)
-        .agg(lambda r: 1)
-        .groupby(level=customer_id_col)
-        .agg(["count"])
-    )
-    holdout_summary_data.columns = ["frequency_holdout"]
-    if monetary_value_col:
-        holdout_summary_data["monetary_value_holdout"] = holdout_transactions.groupby(customer_id_col)[
-            monetary_value_col
-        ].mean()
+    continued = new["first"].values == old["last"].values
+    merged = old.copy()
+    merged["last"] = new["last"].values
+    merged["count"] = old["count"].values + new["count"].values - continued
+    if "total" in stats:
+        # the first period only grows if the earlier chunks never left it
+        same_first = continued & (old["first"].values == new["first"].values)
+        merged["first_value"] = old["first_value"].values + np.where(same_first, new["first_value"].values, 0)
+        merged["total"] = old["total"].values + new["total"].values
 
-    combined_data = calibration_summary_data.join(holdout_summary_data, how="left")
-    combined_data.fillna(0, inplace=True)
+    accumulator.loc[merged.index, merged.columns] = merged
+    return pd.concat([accumulator, stats[~seen]])
 
-    delta_time = (to_period(observation_period_end) - to_period(calibration_period_end)).n
-    combined_data["duration_holdout"] = delta_time
 
-    return combined_data
+_PERIOD_KEY_BITS = 32
+_PERIOD_KEY_OFFSET = 2 ** (_PERIOD_KEY_BITS - 1)
 
 
-def _find_first_transactions(
-    transactions,
-    customer_id_col,
-    datetime_col,
-    monetary_value_col=None,
-    datetime_format=None,
-    observation_period_end=None,
-    freq="D",
+def _pair_keys(
+    codes,
+    periods
 ):
     """
-    Return dataframe with first transactions.
+    Pack (customer code, period ordinal) pairs into sortable int64 keys.
 
-    This takes a DataFrame of transaction data of the form:
-        customer_id, datetime [, monetary_value]
-    and appends a column named 'repeated' to the transaction log which indicates which rows
-    are repeated transactions for that customer_id.
+    Sorting the keys sorts the pairs by customer then period.
+    """
+
+    return (np.asarray(codes, dtype=np.int64) << _PERIOD_KEY_BITS) + (
+        np.asarray(periods, dtype=np.int64) + _PERIOD_KEY_OFFSET
+    )
+
+
+def _unpack_pair_keys(
+    keys
+):
+    """
+    Inverse of ``_pair_keys``, returns (codes, periods).
+    """
+
+    return keys >> _PERIOD_KEY_BITS, (keys & (2 ** _PERIOD_KEY_BITS - 1)) - _PERIOD_KEY_OFFSET
+
+
+# the smallest number of buffered customer periods RFMState merges into its sorted arrays at once
+_RFM_STATE_MIN_BUFFER = 2 ** 16
+
+
+class RFMState(object):
+    """
+    Incrementally maintained transaction state for building RFM summaries.
+
+    The state keeps what ``_find_first_transactions`` computes: one entry per
+    distinct (customer, period) with the monetary value summed over that
+    period, stored as sorted integer arrays. New batches of transactions,
+    late or out of order ones included, are folded in with ``update`` and
+    states built over disjoint shards can be combined with ``merge``, so
+    only the new rows need to be read. Batches are buffered and merged into
+    the sorted arrays when the state is read, or once the buffer outgrows
+    them, so a stream of updates costs amortized O(log n) per row. ``summary``
+    then builds the same frame as ``summary_data_from_transaction_data``
+    for any ``observation_period_end``.
 
     Parameters
     ----------
-    transactions: :obj: DataFrame
-        a Pandas DataFrame that contains the customer_id col and the datetime col.
     customer_id_col: string
         the column in transactions DataFrame that denotes the customer_id
     datetime_col:  string
@@ -159,158 +2152,942 @@ def _find_first_transactions(
     monetary_value_col: string, optional
         the column in transactions that denotes the monetary value of the transaction.
         Optional, only needed for customer lifetime value estimation models.
-    observation_period_end: :obj: datetime
-        a string or datetime to denote the final date of the study.
-        Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
     datetime_format: string, optional
         a string that represents the timestamp format. Useful if Pandas can't understand
         the provided format.
     freq: string, optional
         Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
         http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+
+    Attributes
+    ----------
+    customers: :obj: Index
+        the customer ids seen so far.
     """
 
-    if observation_period_end is None:
-        observation_period_end = transactions[datetime_col].max()
+    def __init__(
+        self,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        freq="D"
+    ):
+        """
+        Initialization, set the columns and an empty state.
+        """
+
+        self.customer_id_col = customer_id_col
+        self.datetime_col = datetime_col
+        self.monetary_value_col = monetary_value_col
+        self.datetime_format = datetime_format
+        self.freq = freq
+
+        self.customers = pd.Index([])
+        self._keys = np.empty(0, dtype=np.int64)
+        self._values = np.empty(0) if monetary_value_col else None
+        self._pending_keys = []
+        self._pending_values = []
+        self._pending_size = 0
+
+    def __repr__(self):
+        """Representation of the state."""
+        self._consolidate()
+        return "<lifetimes.RFMState: {:d} customers, {:d} customer periods>".format(
+            len(self.customers), self._keys.shape[0]
+        )
 
-    if type(observation_period_end) == pd.Period:
-        observation_period_end = observation_period_end.to_timestamp()
+    def _encode(
+        self,
+        customer_ids
+    ):
+        """
+        Map customer ids to integer codes, registering unseen ids.
+        """
+
+        customer_ids = pd.Index(customer_ids)
+        codes = self.customers.get_indexer(customer_ids)
+        unseen = codes == -1
+        if unseen.any():
+            new_customers = customer_ids[unseen].unique()
+            if len(self.customers):
+                self.customers = self.customers.append(new_customers)
+            else:
+                self.customers = new_customers
+            codes[unseen] = self.customers.get_indexer(customer_ids[unseen])
+        return codes.astype(np.int64)
+
+    def _insert(
+        self,
+        keys,
+        values=None
+    ):
+        """
+        Buffer (customer, period) keys and their values for the sorted state.
+        """
+
+        self._pending_keys.append(keys)
+        if values is not None:
+            self._pending_values.append(values)
+        self._pending_size += keys.shape[0]
+        if self._pending_size > max(self._keys.shape[0], _RFM_STATE_MIN_BUFFER):
+            self._consolidate()
+
+    def _consolidate(
+        self
+    ):
+        """
+        Merge the buffered keys into the sorted state, summing the values of equal keys.
+
+        Only the buffered keys are sorted; they are then merged into the
+        already sorted state in one linear pass, so the history is not sorted again.
+        """
+
+        if not self._pending_keys:
+            return
+
+        keys, inverse = np.unique(np.concatenate(self._pending_keys), return_inverse=True)
+        values = None
+        if self._values is not None:
+            values = np.bincount(inverse, weights=np.concatenate(self._pending_values), minlength=keys.shape[0])
+
+        positions = np.searchsorted(self._keys, keys)
+        found = positions < self._keys.shape[0]
+        found[found] = self._keys[positions[found]] == keys[found]
+        if values is not None:
+            self._values[positions[found]] += values[found]
+
+        # the new keys land at their insertion point shifted by the new keys before them
+        new_positions = positions[~found] + np.arange(np.count_nonzero(~found))
+        is_new = np.zeros(self._keys.shape[0] + new_positions.shape[0], dtype=bool)
+        is_new[new_positions] = True
+        merged_keys = np.empty(is_new.shape[0], dtype=self._keys.dtype)
+        merged_keys[is_new] = keys[~found]
+        merged_keys[~is_new] = self._keys
+        if values is not None:
+            merged_values = np.empty(is_new.shape[0])
+            merged_values[is_new] = values[~found]
+            merged_values[~is_new] = self._values
+            self._values = merged_values
+        self._keys = merged_keys
+        self._pending_keys = []
+        self._pending_values = []
+        self._pending_size = 0
+
+    def update(
+        self,
+        transactions
+    ):
+        """
+        Add a batch of transactions to the state.
+
+        Transactions may belong to new or existing customers and may fall
+        before, between or after the periods already in the state.
+
+        Parameters
+        ----------
+        transactions: :obj: DataFrame
+            a Pandas DataFrame that contains the customer_id col and the datetime col.
+
+        Returns
+        -------
+        RFMState
+            self, updated in place
+        """
+
+        transactions = transactions[transactions[self.customer_id_col].notnull()]
+        periods = _period_ordinals(transactions[self.datetime_col], self.freq, self.datetime_format)
+        codes = self._encode(transactions[self.customer_id_col])
+        values = transactions[self.monetary_value_col].values if self.monetary_value_col else None
+
+        observed = periods != _NAT
+        codes, periods = codes[observed], periods[observed]
+        if values is not None:
+            values = values[observed]
+
+        self._insert(_pair_keys(codes, periods), values)
+        return self
+
+    def merge(
+        self,
+        other
+    ):
+        """
+        Fold another state, e.g. one built over a different shard, into this one.
+
+        Parameters
+        ----------
+        other: RFMState
+            a state with the same freq and monetary value column.
+
+        Returns
+        -------
+        RFMState
+            self, updated in place
+        """
+
+        if other.freq != self.freq or bool(other.monetary_value_col) != bool(self.monetary_value_col):
+            raise ValueError("Only states with the same freq and monetary value column can be merged.")
+
+        other._consolidate()
+        other_codes, periods = _unpack_pair_keys(other._keys)
+        codes = self._encode(other.customers)[other_codes]
+
+        self._insert(_pair_keys(codes, periods), other._values)
+        return self
+
+    def summary(
+        self,
+        observation_period_end=None,
+        freq_multiplier=1
+    ):
+        """
+        Return summary data for the transactions in the state.
+
+        Parameters
+        ----------
+        observation_period_end: datetime, optional
+             a string or datetime to denote the final date of the study.
+             Events after this date are truncated. If not given, defaults to the
+             last period in the state; required while the state is empty.
+        freq_multiplier: int, optional
+            Default 1, see ``summary_data_from_transaction_data``.
+
+        Returns
+        -------
+        :obj: DataFrame:
+            customer_id, frequency, recency, T [, monetary_value]
+        """
+
+        self._consolidate()
+        codes, periods = _unpack_pair_keys(self._keys)
+        values = self._values
+
+        if observation_period_end is None:
+            if not periods.shape[0]:
+                raise ValueError(
+                    "The state has no transactions yet, observation_period_end is required to summarize it."
+                )
+            observation_period_end = periods.max()
+        else:
+            observation_period_end = _period_ordinals(
+                [pd.to_datetime(observation_period_end, format=self.datetime_format)], self.freq
+            )[0]
+            observed = periods <= observation_period_end
+            codes, periods = codes[observed], periods[observed]
+            if values is not None:
+                values = values[observed]
+
+        stats = _customer_period_stats(codes, periods, values)
+        stats.index = self.customers.take(stats.index.values)
+        stats.index.name = self.customer_id_col
+
+        return _summary_from_customer_period_stats(
+            stats.sort_index(),
+            observation_period_end,
+            self.freq,
+            freq_multiplier,
+            monetary_value=values is not None,
+        )
 
-    select_columns = [customer_id_col, datetime_col]
 
-    if monetary_value_col:
-        select_columns.append(monetary_value_col)
+_RFM_STORE_HEADER = "header.json"
+_RFM_STORE_INDEX = "index"
 
-    transactions = transactions[select_columns].sort_values(select_columns).copy()
 
-    # make sure the date column uses datetime objects, and use Pandas' DateTimeIndex.to_period()
-    # to convert the column to a PeriodIndex which is useful for time-wise grouping and truncating
-    transactions[datetime_col] = pd.to_datetime(transactions[datetime_col], format=datetime_format)
-    transactions = transactions.set_index(datetime_col).to_period(freq).to_timestamp()
+class PurchaseMatrix(object):
+    """
+    Sparse customers by periods purchase matrix.
+
+    The matrix is a ``scipy.sparse.csr_matrix`` with one row per customer and
+    one column per period, holding the number of transactions of each
+    customer in each period, with the monetary value summed over the same
+    entries kept alongside in ``values``. It is built once from the
+    transactions with ``from_transactions``; ``summary_data_from_transaction_data``,
+    ``calibration_and_holdout_data``, ``calculate_alive_path`` and
+    ``expected_cumulative_transactions`` then accept it in place of the
+    transactions and work on its ``indptr`` and ``indices`` directly, so the
+    raw log is parsed and bucketed only once for any number of cutoffs.
+
+    Since only the periods of the transactions are kept, the calibration and
+    holdout periods of ``calibration_and_holdout_data`` are cut on whole
+    periods: the period of calibration_period_end belongs to the calibration.
 
-    transactions = transactions.loc[(transactions.index <= observation_period_end)].reset_index()
+    Parameters
+    ----------
+    matrix: :obj: csr_matrix
+        the number of transactions, customers by periods.
+    customers: :obj: Index
+        the customer id of each row.
+    start_period: int
+        the period ordinal of the first column.
+    customer_id_col, datetime_col: string
+        the columns the matrix was built from, the index of the summaries is
+        named after customer_id_col.
+    monetary_value_col: string, optional
+        the column the values were summed from, None without values.
+    values: array_like, optional
+        the monetary value of each stored entry of the matrix, in the order of
+        ``matrix.data``.
+    freq: string or None, optional
+        the frequency of the periods, None for integer period ids.
+
+    Attributes
+    ----------
+    matrix: :obj: csr_matrix
+        the number of transactions, customers by periods.
+    customers: :obj: Index
+        the customer id of each row.
+    start_period: int
+        the period ordinal of the first column.
+    """
 
-    period_groupby = transactions.groupby([datetime_col, customer_id_col], sort=False, as_index=False)
+    def __init__(
+        self,
+        matrix,
+        customers,
+        start_period,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        values=None,
+        freq="D"
+    ):
+        """
+        Initialization, wrap an existing matrix.
+        """
+
+        self.matrix = sparse.csr_matrix(matrix)
+        self.matrix.sort_indices()
+        self.customers = pd.Index(customers)
+        self.start_period = int(start_period)
+        self.customer_id_col = customer_id_col
+        self.datetime_col = datetime_col
+        self.monetary_value_col = monetary_value_col
+        self.values = None if values is None else np.asarray(values)
+        self.freq = freq
+
+    @classmethod
+    def from_transactions(
+        cls,
+        transactions,
+        customer_id_col,
+        datetime_col,
+        monetary_value_col=None,
+        datetime_format=None,
+        freq="D",
+        integer_periods=False,
+        count_col=None
+    ):
+        """
+        Build the purchase matrix of transactions.
+
+        Parameters
+        ----------
+        transactions: :obj: DataFrame
+            a Pandas DataFrame that contains the customer_id col and the datetime col.
+        customer_id_col: string
+            the column in transactions DataFrame that denotes the customer_id
+        datetime_col:  string
+            the column in transactions that denotes the datetime the purchase was made.
+        monetary_value_col: string, optional
+            the column in transactions that denotes the monetary value of the transaction.
+            Optional, only needed for customer lifetime value estimation models.
+        datetime_format: string, optional
+            a string that represents the timestamp format. Useful if Pandas can't understand
+            the provided format.
+        freq: string, optional
+            Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
+            http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
+        integer_periods: bool, optional
+            Default False. If True, datetime_col holds integer period ids, see
+            ``summary_data_from_transaction_data``.
+        count_col: string, optional
+            the column in transactions that denotes the number of transactions
+            behind each row, for pre-aggregated transactions.
+
+        Returns
+        -------
+        :obj: PurchaseMatrix
+        """
+
+        if integer_periods:
+            freq = None
+
+        codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+        periods = _period_ordinals(transactions[datetime_col], freq, datetime_format)
+        values = transactions[monetary_value_col].values if monetary_value_col else None
+        counts = transactions[count_col].values if count_col else np.ones(codes.shape[0], dtype=np.int64)
+        codes, periods, values, counts = _sort_customer_periods(codes, periods, values, counts)
+
+        codes, periods, values, starts = _collapse_sorted_customer_periods(codes, periods, values)
+        counts = np.add.reduceat(counts, starts) if starts.shape[0] else counts
+        start_period = periods.min() if periods.shape[0] else 0
+
+        indptr = np.append(0, np.cumsum(np.bincount(codes, minlength=len(customers))))
+        matrix = sparse.csr_matrix(
+            (counts, periods - start_period, indptr),
+            shape=(len(customers), periods.max() - start_period + 1 if periods.shape[0] else 0),
+        )
+        return cls(matrix, customers, start_period, customer_id_col, datetime_col, monetary_value_col, values, freq)
 
-    if monetary_value_col:
-        # when we have a monetary column, make sure to sum together any values in the same period
-        period_transactions = period_groupby.sum()
-    else:
-        # by calling head() on the groupby object, the datetime_col and customer_id_col columns
-        # will be reduced
-        period_transactions = period_groupby.head(1)
-
-    # initialize a new column where we will indicate which are the first transactions
-    period_transactions["first"] = False
-    # find all of the initial transactions and store as an index
-    first_transactions = period_transactions.groupby(customer_id_col, sort=True, as_index=False).head(1).index
-    # mark the initial transactions as True
-    period_transactions.loc[first_transactions, "first"] = True
-    select_columns.append("first")
-    # reset datetime_col to period
-    period_transactions[datetime_col] = pd.Index(period_transactions[datetime_col]).to_period(freq)
+    def __repr__(self):
+        """Representation of the matrix."""
+        return "<lifetimes.PurchaseMatrix: {:d} customers, {:d} periods, {:d} customer periods>".format(
+            self.matrix.shape[0], self.matrix.shape[1], self.matrix.nnz
+        )
 
-    return period_transactions[select_columns]
+    def __len__(self):
+        """Number of customers in the matrix."""
+        return self.matrix.shape[0]
+
+    @property
+    def end_period(self):
+        """The period ordinal of the last column."""
+        return self.start_period + self.matrix.shape[1] - 1
+
+    def _ordinal(
+        self,
+        period_end=None,
+        datetime_format=None
+    ):
+        """
+        The period ordinal of a datetime (a period id for integer periods), the last period if None.
+        """
+
+        if period_end is None:
+            return self.end_period
+        if self.freq is not None:
+            period_end = pd.to_datetime(period_end, format=datetime_format)
+        return _period_ordinals([period_end], self.freq)[0]
+
+    def _period_datetimes(
+        self,
+        ordinals
+    ):
+        """
+        The start of the periods of ordinals, the ordinals themselves for integer periods.
+        """
+
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        return ordinals if self.freq is None else _period_start(ordinals, self.freq)
+
+    def _customer_periods(
+        self,
+        last=None
+    ):
+        """
+        The distinct (customer, period) pairs up to the period ordinal last, sorted by customer then period.
+
+        last can also be an array with the last period ordinal of each row.
+
+        Returns
+        -------
+        tuple
+            (codes, periods, values, counts), codes are row numbers and values
+            is None without values.
+        """
+
+        matrix = self.matrix
+        codes = np.repeat(np.arange(matrix.shape[0]), np.diff(matrix.indptr))
+        periods = matrix.indices.astype(np.int64) + self.start_period
+        values, counts = self.values, matrix.data
+        if np.ndim(last) or (last is not None and last < self.end_period):
+            observed = periods <= (last[codes] if np.ndim(last) else last)
+            codes, periods, counts = codes[observed], periods[observed], counts[observed]
+            values = None if values is None else values[observed]
+        return codes, periods, values, counts
+
+
+class RFMStore(object):
+    """
+    A memory-mapped, on-disk columnar RFM summary.
 
+    A store is a directory with one raw ``.npy`` array per summary column,
+    one for the customer ids (fixed-width strings when they are not numeric)
+    and a small JSON header holding the freq and the end of the observation
+    period. The arrays are opened with ``np.memmap``, so opening a store reads
+    no data, and ``store["frequency"]`` etc. are plain ndarray views of the
+    mapped files. The ``index`` is built when first accessed. ``BetaGeoFitter.fit``,
+    ``ModifiedBetaGeoFitter.fit``, ``ParetoNBDFitter.fit`` and their prediction
+    methods accept a store in place of the frequency, recency and T arrays,
+    and ``GammaGammaFitter.fit`` in place of the frequency and monetary value.
 
-def summary_data_from_transaction_data(
-    transactions,
-    customer_id_col,
-    datetime_col,
-    monetary_value_col=None,
-    datetime_format=None,
-    observation_period_end=None,
-    freq="D",
-    freq_multiplier=1,
-):
+    Use ``save_rfm_store`` to create a store and ``load_rfm_store`` to open one.
+
+    Attributes
+    ----------
+    columns: list
+        the summary columns in the store.
+    index: :obj: Index
+        the customer ids.
+    freq: string
+        the freq the summary was built with, if it was recorded.
+    observation_period_end: :obj: Timestamp
+        the end of the observation period, if it was recorded.
     """
-    Return summary data from transactions.
 
-    This transforms a DataFrame of transaction data of the form:
-        customer_id, datetime [, monetary_value]
-    to a DataFrame of the form:
-        customer_id, frequency, recency, T [, monetary_value]
+    def __init__(
+        self,
+        path,
+        mmap_mode="r"
+    ):
+        """
+        Open the store at path.
+        """
+
+        with open(os.path.join(path, _RFM_STORE_HEADER)) as header_file:
+            header = json.load(header_file)
+
+        self.path = path
+        self.columns = header["columns"]
+        self.freq = header["freq"]
+        self.observation_period_end = (
+            pd.Timestamp(header["observation_period_end"]) if header["observation_period_end"] else None
+        )
+        self._arrays = {
+            column: np.load(os.path.join(path, column + ".npy"), mmap_mode=mmap_mode) for column in self.columns
+        }
+        self._index_values = np.load(os.path.join(path, _RFM_STORE_INDEX + ".npy"), mmap_mode=mmap_mode)
+        self._index_name = header["index_name"]
+        self._index = None
+
+    @property
+    def index(self):
+        """The customer ids, read from the mapped ids when first accessed."""
+        if self._index is None:
+            values = self._index_values
+            if values.dtype.kind == "U":
+                values = values.astype(object)
+            self._index = pd.Index(values, name=self._index_name)
+        return self._index
+
+    def __repr__(self):
+        """Representation of the store."""
+        return "<lifetimes.RFMStore: {:d} customers, columns {}>".format(len(self), ", ".join(self.columns))
+
+    def __len__(self):
+        """Number of customers in the store."""
+        return self._index_values.shape[0]
+
+    def __contains__(self, column):
+        """Whether the store has the column."""
+        return column in self._arrays
+
+    def __getitem__(self, column):
+        """Zero-copy ndarray view of a column."""
+        return self._arrays[column].view(np.ndarray)
+
+    def to_frame(self):
+        """
+        Load the store into a summary DataFrame.
+
+        Returns
+        -------
+        :obj: DataFrame
+            the summary, with the customer ids as index.
+        """
+
+        return pd.DataFrame({column: self[column] for column in self.columns}, index=self.index)
+
+
+def save_rfm_store(
+    summary,
+    path,
+    freq=None,
+    observation_period_end=None
+):
+    """
+    Save a summary as an ``RFMStore``.
 
     Parameters
     ----------
-    transactions: :obj: DataFrame
-        a Pandas DataFrame that contains the customer_id col and the datetime col.
-    customer_id_col: string
-        the column in transactions DataFrame that denotes the customer_id
-    datetime_col:  string
-        the column in transactions that denotes the datetime the purchase was made.
-    monetary_value_col: string, optional
-        the columns in the transactions that denotes the monetary value of the transaction.
-        Optional, only needed for customer lifetime value estimation models.
-    observation_period_end: datetime, optional
-         a string or datetime to denote the final date of the study.
-         Events after this date are truncated. If not given, defaults to the max 'datetime_col'.
-    datetime_format: string, optional
-        a string that represents the timestamp format. Useful if Pandas can't understand
-        the provided format.
+    summary: :obj: DataFrame
+        a summary with frequency, recency, T [, monetary_value, weights]
+        columns, e.g. from ``summary_data_from_transaction_data``, indexed by
+        customer id.
+    path: string
+        the directory to write the store to, created if needed.
     freq: string, optional
-        Default 'D' for days, 'W' for weeks, 'M' for months... etc. Full list here:
-        http://pandas.pydata.org/pandas-docs/stable/timeseries.html#dateoffset-objects
-    freq_multiplier: int, optional
-        Default 1, could be use to get exact recency and T, i.e. with freq='W'
-        row for user id_sample=1 will be recency=30 and T=39 while data in
-        CDNOW summary are different. Exact values could be obtained with
-        freq='D' and freq_multiplier=7 which will lead to recency=30.43
-        and T=38.86
+        the freq the summary was built with, recorded in the header.
+    observation_period_end: datetime, optional
+        the end of the observation period, recorded in the header.
 
     Returns
     -------
-    :obj: DataFrame:
-        customer_id, frequency, recency, T [, monetary_value]
+    RFMStore
+        the saved store, opened read-only.
     """
 
-    if observation_period_end is None:
-        observation_period_end = (
-            pd.to_datetime(transactions[datetime_col].max(), format=datetime_format).to_period(freq).to_timestamp()
-        )
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    for column in summary.columns:
+        values = summary[column].values
+        # whole frequencies and weights are stored as integers, so the fitters use them without a
+        # cast; others are kept as they are, for the fitters' input checks to see them
+        if (column == "frequency" or column == "weights") and np.all(values == np.round(values)):
+            values = values.astype(np.int64)
+        np.save(os.path.join(path, column + ".npy"), np.ascontiguousarray(values))
+
+    # numeric ids are saved as they are, others as fixed-width strings, so that
+    # both are memory-mapped and the header stays small
+    index = summary.index
+    if index.dtype.kind in "iuf":
+        index_values = np.ascontiguousarray(index.values)
     else:
-        observation_period_end = (
-            pd.to_datetime(observation_period_end, format=datetime_format).to_period(freq).to_timestamp()
-        )
+        index_values = index.astype(str).values.astype(str)
+    np.save(os.path.join(path, _RFM_STORE_INDEX + ".npy"), index_values)
+
+    header = {
+        "columns": list(summary.columns),
+        "freq": freq,
+        "observation_period_end": None
+        if observation_period_end is None
+        else str(pd.to_datetime(observation_period_end)),
+        "index_name": summary.index.name,
+    }
+    with open(os.path.join(path, _RFM_STORE_HEADER), "w") as header_file:
+        json.dump(header, header_file)
+
+    return RFMStore(path)
+
+
+def load_rfm_store(
+    path,
+    mmap_mode="r"
+):
+    """
+    Open an ``RFMStore`` saved with ``save_rfm_store``.
 
-    # label all of the repeated transactions
-    repeated_transactions = _find_first_transactions(
-        transactions, customer_id_col, datetime_col, monetary_value_col, datetime_format, observation_period_end, freq
-    )
-    # reset datetime_col to timestamp
-    repeated_transactions[datetime_col] = pd.Index(repeated_transactions[datetime_col]).to_timestamp()
+    Parameters
+    ----------
+    path: string
+        the directory of the store.
+    mmap_mode: string, optional
+        the ``np.memmap`` mode to open the columns with. Default 'r' (read-only).
+
+    Returns
+    -------
+    RFMStore
+    """
 
-    # count all orders by customer.
-    customers = repeated_transactions.groupby(customer_id_col, sort=False)[datetime_col].agg(["min", "max", "count"])
+    return RFMStore(path, mmap_mode=mmap_mode)
 
-    # subtract 1 from count, as we ignore their first order.
-    customers["frequency"] = customers["count"] - 1
 
-    customers["T"] = (observation_period_end - customers["min"]) / np.timedelta64(1, freq) / freq_multiplier
-    customers["recency"] = (customers["max"] - customers["min"]) / np.timedelta64(1, freq) / freq_multiplier
+class RFMData(object):
+    """
+    RFM arrays validated once and shared by the fitters and their predictions.
+
+    The fitters and their prediction methods accept an ``RFMData`` in place of
+    the frequency, recency and T arrays (frequency and monetary_value for
+    ``GammaGammaFitter``). The arrays are kept as contiguous NumPy arrays
+    without copies where their dtype already fits, the input checks run once
+    per kind of check, and the time scaling used while fitting is computed
+    once and cached. The fitters keep a reference to the ``RFMData``; the
+    DataFrame they expose as ``data`` is only built, once, when it is first
+    accessed. Fitting several models on the same ``RFMData`` therefore
+    neither copies nor validates the data again.
 
-    summary_columns = ["frequency", "recency", "T"]
+    Parameters
+    ----------
+    frequency: array_like
+        the frequency vector of customers' purchases (denoted x in literature).
+    recency: array_like, optional
+        the recency vector of customers' purchases (denoted t_x in literature).
+    T: array_like, optional
+        customers' age (time units since first purchase)
+    monetary_value: array_like, optional
+        the monetary value vector of customer's purchases (denoted m in literature).
+    weights: array_like, optional
+        number of customers with each row's values, defaults to 1.
+    index: array_like or RFMStore, optional
+        index of the customers, used for ``frame``, or a store to take the ids
+        of. Only converted to an ``Index`` when first accessed.
+    validate: bool, optional
+        Default True. Check the frequency, recency and T now, otherwise the
+        first fitter that uses them does.
+
+    Attributes
+    ----------
+    frequency, recency, T, monetary_value, weights: array
+        the data, recency, T and monetary_value are None if not given.
+    index: :obj: Index
+        the customer index.
+    validated: bool
+        whether the frequency, recency and T have passed the input checks.
+    """
 
-    if monetary_value_col:
-        # create an index of all the first purchases
-        first_purchases = repeated_transactions[repeated_transactions["first"]].index
-        # by setting the monetary_value cells of all the first purchases to NaN,
-        # those values will be excluded from the mean value calculation
-        repeated_transactions.loc[first_purchases, monetary_value_col] = np.nan
-        customers["monetary_value"] = (
-            repeated_transactions.groupby(customer_id_col)[monetary_value_col].mean().fillna(0)
-        )
-        summary_columns.append("monetary_value")
+    def __init__(
+        self,
+        frequency,
+        recency=None,
+        T=None,
+        monetary_value=None,
+        weights=None,
+        index=None,
+        validate=True,
+    ):
+        """
+        Initialization, convert the arrays and optionally validate them.
+        """
+
+        # frequencies are kept in their dtype (summaries hold them as floats), the
+        # fitters only need them to be integral, which the input checks ensure
+        self.frequency = np.ascontiguousarray(frequency)
+        self.recency = None if recency is None else np.ascontiguousarray(recency)
+        self.T = None if T is None else np.ascontiguousarray(T)
+        self.monetary_value = None if monetary_value is None else np.ascontiguousarray(monetary_value)
+        if weights is None:
+            weights = np.ones(self.frequency.shape[0], dtype=int)
+        self.weights = np.ascontiguousarray(weights)
+        self._index_values = index
+        self._index = None
+
+        self._checks = set()
+        self._scale = None
+        self._scaled_recency = None
+        self._scaled_T = None
+        self._frame = None
+
+        if validate:
+            self.validate()
+
+    @classmethod
+    def from_frame(
+        cls,
+        summary,
+        validate=True
+    ):
+        """
+        Build an ``RFMData`` from a summary DataFrame.
+
+        Parameters
+        ----------
+        summary: :obj: DataFrame
+            with a frequency column and any of the recency, T, monetary_value
+            and weights columns, indexed by customer.
+        validate: bool, optional
+            see ``RFMData``.
+
+        Returns
+        -------
+        RFMData
+        """
+
+        columns = {
+            column: summary[column].values
+            for column in ["recency", "T", "monetary_value", "weights"]
+            if column in summary.columns
+        }
+        return cls(summary["frequency"].values, index=summary.index, validate=validate, **columns)
+
+    def __repr__(self):
+        """Representation of the data."""
+        return "<lifetimes.RFMData: {:d} rows{}>".format(len(self), ", validated" if self.validated else "")
+
+    def __len__(self):
+        """Number of rows."""
+        return self.frequency.shape[0]
+
+    @property
+    def index(self):
+        """The customer index, built when first accessed."""
+        if self._index is None:
+            if self._index_values is None:
+                self._index = pd.RangeIndex(self.frequency.shape[0])
+            elif isinstance(self._index_values, RFMStore):
+                self._index = self._index_values.index
+            else:
+                self._index = pd.Index(self._index_values)
+        return self._index
+
+    @property
+    def validated(self):
+        """Whether the frequency, recency and T have passed the input checks."""
+        return "rfm" in self._checks
+
+    def validate(
+        self,
+        monetary_value=False
+    ):
+        """
+        Run the input checks, unless they already passed.
+
+        Parameters
+        ----------
+        monetary_value: bool, optional
+            Default False, check the frequency, recency and T. If True, check the
+            frequency and monetary_value instead, as ``GammaGammaFitter`` does.
+
+        Returns
+        -------
+        RFMData
+            self
+        """
+
+        check = "monetary_value" if monetary_value else "rfm"
+        if check not in self._checks:
+            if monetary_value:
+                _check_inputs(self.frequency, monetary_value=self.monetary_value)
+            else:
+                _check_inputs(self.frequency, self.recency, self.T)
+            self._checks.add(check)
+        return self
+
+    @property
+    def scale(self):
+        """The scalar the fitters multiply recency and T by, so that the maximum T is 1."""
+        if self._scale is None:
+            self._scale = _scale_time(self.T)
+        return self._scale
+
+    @property
+    def scaled_recency(self):
+        """recency times ``scale``, cached."""
+        if self._scaled_recency is None:
+            self._scaled_recency = self.recency * self.scale
+        return self._scaled_recency
+
+    @property
+    def scaled_T(self):
+        """T times ``scale``, cached."""
+        if self._scaled_T is None:
+            self._scaled_T = self.T * self.scale
+        return self._scaled_T
+
+    @property
+    def frame(self):
+        """
+        The data as a DataFrame, built once and shared by the fitters as their ``data``.
+        """
+
+        if self._frame is None:
+            columns = [
+                ("frequency", self.frequency.astype(int)),
+                ("recency", self.recency),
+                ("T", self.T),
+                ("monetary_value", self.monetary_value),
+                ("weights", self.weights),
+            ]
+            self._frame = pd.DataFrame(
+                {column: values for column, values in columns if values is not None}, index=self.index
+            )
+        return self._frame
+
+
+def _as_rfm_data(
+    frequency,
+    recency=None,
+    T=None,
+    weights=None,
+    index=None,
+    monetary_value=None
+):
+    """
+    Return the fit arguments as an ``RFMData``, built from arrays or an ``RFMStore`` if needed.
+
+    Arguments that are given explicitly take precedence over the columns of a store.
+    """
+
+    if isinstance(frequency, RFMData):
+        return frequency
+
+    if isinstance(frequency, RFMStore):
+        store = frequency
+        if weights is None and "weights" in store:
+            weights = store["weights"]
+        if monetary_value is None and "monetary_value" in store:
+            monetary_value = store["monetary_value"]
+        frequency = store["frequency"]
+        recency = store["recency"] if recency is None and "recency" in store else recency
+        T = store["T"] if T is None and "T" in store else T
+        index = store if index is None else index
+
+    return RFMData(frequency, recency, T, monetary_value, weights, index, validate=False)
+
+
+def _unpack_rfm_data(
+    frequency,
+    recency=None,
+    T=None
+):
+    """
+    Return (frequency, recency, T), read from frequency if it is an ``RFMData`` or ``RFMStore``.
+    """
+
+    if isinstance(frequency, RFMData):
+        return frequency.frequency, frequency.recency, frequency.T
+    if isinstance(frequency, RFMStore):
+        return frequency["frequency"], frequency["recency"], frequency["T"]
+    return frequency, recency, T
+
+
+def compress_rfm(
+    summary,
+    columns=None,
+    resolution=None
+):
+    """
+    Collapse customers with the same summary into weighted patterns.
+
+    Many customers share the same (frequency, recency, T), more so once recency
+    and T are rounded to the time unit of the model. The fitters take a weights
+    argument for such pattern counts, so fitting on the patterns gives the same
+    likelihood as fitting on every customer, at a cost that grows with the
+    number of patterns instead.
+
+    Parameters
+    ----------
+    summary: :obj: DataFrame
+        a summary with frequency, recency, T columns, e.g. from
+        ``summary_data_from_transaction_data``. If it already has a weights
+        column, the weights of the collapsed rows are added up.
+    columns: list, optional
+        the columns that make a pattern. Default ["frequency", "recency", "T"].
+    resolution: float or dict, optional
+        round the columns to a multiple of this before collapsing: a float
+        applies to every column but frequency, a dict maps columns to their
+        resolution. Default None (no rounding).
+
+    Returns
+    -------
+    tuple
+        (patterns, inverse): patterns is a DataFrame with the pattern columns
+        and a weights column, one row per distinct pattern; inverse gives the
+        row of patterns of each customer of summary, so per pattern results
+        can be scattered back to the customers with ``results[inverse]``.
+    """
+
+    if columns is None:
+        columns = ["frequency", "recency", "T"]
+    if resolution is not None and not isinstance(resolution, dict):
+        resolution = {column: resolution for column in columns if column != "frequency"}
+
+    values = np.column_stack([summary[column].values for column in columns]).astype(float)
+    for i, column in enumerate(columns):
+        if resolution and resolution.get(column):
+            values[:, i] = np.round(values[:, i] / resolution[column]) * resolution[column]
 
-    return customers[summary_columns].astype(float)
+    patterns, inverse = np.unique(values, axis=0, return_inverse=True)
+    inverse = inverse.ravel()
+
+    patterns = pd.DataFrame(patterns, columns=columns).astype(summary[columns].dtypes.to_dict())
+    if "weights" in summary:
+        patterns["weights"] = np.bincount(inverse, weights=summary["weights"].values).astype(summary["weights"].dtype)
+    else:
+        patterns["weights"] = np.bincount(inverse)
+
+    return patterns, inverse
 
 
 def calculate_alive_path(
-    model, 
+    model,
     transactions, 
     datetime_col, 
     t, 
-    freq="D"
+    freq="D",
+    customer_id=None
 ):
     """
     Calculate alive path for plotting alive history of user.
@@ -321,14 +3098,19 @@ def calculate_alive_path(
     ----------
     model:
         A fitted lifetimes model
-    transactions: DataFrame
-        a Pandas DataFrame containing the transactions history of the customer_id
+    transactions: DataFrame or :obj: PurchaseMatrix
+        a Pandas DataFrame containing the transactions history of the customer_id,
+        or a PurchaseMatrix of any number of customers. For a PurchaseMatrix,
+        datetime_col and freq are the ones the matrix was built with.
     datetime_col: string
         the column in the transactions that denotes the datetime the purchase was made
     t: array_like
         the number of time units since the birth for which we want to draw the p_alive
     freq: string
         Default 'D' for days. Other examples= 'W' for weekly
+    customer_id: optional
+        the customer whose path to calculate when transactions is a
+        PurchaseMatrix, can be left out if it has a single customer.
 
     Returns
     -------
@@ -336,6 +3118,14 @@ def calculate_alive_path(
         A pandas Series containing the p_alive as a function of T (age of the customer)
     """
 
+    if isinstance(transactions, PurchaseMatrix):
+        if customer_id is None and len(transactions) != 1:
+            raise ValueError("customer_id is required for a PurchaseMatrix of more than one customer.")
+        row = 0 if customer_id is None else transactions.customers.get_loc(customer_id)
+        matrix = transactions.matrix
+        columns = matrix.indices[matrix.indptr[row] : matrix.indptr[row + 1]]
+        return _alive_path_from_periods(model, columns, t)
+
     customer_history = transactions[[datetime_col]].copy()
     customer_history[datetime_col] = pd.to_datetime(customer_history[datetime_col])
     customer_history = customer_history.set_index(datetime_col)
@@ -364,6 +3154,120 @@ def calculate_alive_path(
     )
 
 
+def calculate_alive_paths(
+    model,
+    transactions,
+    datetime_col,
+    customer_id_col,
+    t,
+    freq="D",
+    datetime_format=None,
+    integer_periods=False,
+    long_format=False,
+):
+    """
+    Calculate the alive paths of all the customers of a transaction log.
+
+    The batch version of ``calculate_alive_path``: the purchases of every
+    customer are laid out on a customers by periods grid starting at their
+    first purchase, the frequency and recency trajectories are cumulative
+    sums and maxima along it, and ``conditional_probability_alive()`` is
+    evaluated once on the flattened grid.
+
+    Parameters
+    ----------
+    model:
+        A fitted lifetimes model
+    transactions: :obj: DataFrame or :obj: PurchaseMatrix
+        a Pandas DataFrame containing the transactions of the customers, or a
+        PurchaseMatrix built from one. For a PurchaseMatrix, the column names
+        and freq are the ones the matrix was built with.
+    datetime_col: string
+        the column in transactions that denotes the datetime the purchase was made.
+    customer_id_col: string
+        the column in transactions that denotes the customer_id
+    t: int
+        the number of time units since the birth of each customer for which
+        we want to draw the p_alive
+    freq: string, optional
+        Default 'D' for days. Other examples= 'W' for weekly
+    datetime_format: string, optional
+        a string that represents the timestamp format. Useful if Pandas can't
+        understand the provided format.
+    integer_periods: bool, optional
+        Default False. If True, datetime_col holds integer period ids, see
+        ``summary_data_from_transaction_data``.
+    long_format: bool, optional
+        Default False. If True, return a long DataFrame with a p_alive column
+        indexed by customer id and T instead.
+
+    Returns
+    -------
+    :obj: DataFrame
+        the p_alive of each customer (rows) as a function of T, their age,
+        from 0 to t (columns).
+    """
+
+    if isinstance(transactions, PurchaseMatrix):
+        customer_id_col, customers = transactions.customer_id_col, transactions.customers
+        codes, periods = transactions._customer_periods()[:2]
+    else:
+        codes, customers = _factorize_customer_ids(transactions[customer_id_col])
+        periods = _period_ordinals(transactions[datetime_col], None if integer_periods else freq, datetime_format)
+        codes, periods = _distinct_customer_periods(codes, periods)[:2]
+
+    # the age of each purchase period, relative to the first purchase period of its customer
+    customer_codes, customer_starts = np.unique(codes, return_index=True)
+    rows = np.repeat(np.arange(customer_codes.shape[0]), np.diff(np.append(customer_starts, codes.shape[0])))
+    ages = periods - periods[customer_starts][rows]
+    observed = ages <= t
+
+    T = np.arange(t + 1)
+    purchases = np.zeros((customer_codes.shape[0], t + 1), dtype=bool)
+    purchases[rows[observed], ages[observed]] = True
+    # the first purchase is ignored, the recency is the age at the last purchase so far
+    frequency = np.cumsum(purchases, axis=1) - 1
+    recency = np.maximum.accumulate(np.where(purchases, T, 0), axis=1)
+
+    p_alive = model.conditional_probability_alive(
+        frequency.ravel().astype(float),
+        recency.ravel().astype(float),
+        np.tile(T, customer_codes.shape[0]).astype(float),
+    )
+    paths = pd.DataFrame(
+        np.asarray(p_alive).reshape(purchases.shape),
+        index=pd.Index(customers.take(customer_codes), name=customer_id_col),
+        columns=pd.Index(T, name="T"),
+    )
+
+    if long_format:
+        return paths.stack().to_frame("p_alive")
+    return paths
+
+
+def _alive_path_from_periods(
+    model,
+    periods,
+    t
+):
+    """
+    ``calculate_alive_path`` of a customer from the sorted, distinct ordinals of their purchase periods.
+    """
+
+    offsets = np.asarray(periods, dtype=np.int64) - periods[0]
+    T = np.arange(max(t + 1, offsets[-1] + 1))
+
+    purchases = np.zeros(T.shape[0], dtype=bool)
+    purchases[offsets] = True
+    # the first purchase is ignored, the recency is the age at the last purchase so far
+    frequency = np.cumsum(purchases) - 1
+    recency = np.maximum.accumulate(np.where(purchases, T, 0))
+
+    return pd.Series(
+        model.conditional_probability_alive(frequency.astype(float), recency.astype(float), T.astype(float))
+    )
+
+
 def _scale_time(
     age
 ):
@@ -490,6 +3394,7 @@ def expected_cumulative_transactions(
     freq="D",
     set_index_date=False,
     freq_multiplier=1,
+    integer_periods=False,
 ):
     """
     Get expected and actual repeated cumulative transactions.
@@ -501,8 +3406,10 @@ def expected_cumulative_transactions(
     ----------
     model:
         A fitted lifetimes model
-    transactions: :obj: DataFrame
-        a Pandas DataFrame containing the transactions history of the customer_id
+    transactions: :obj: DataFrame or :obj: PurchaseMatrix
+        a Pandas DataFrame containing the transactions history of the customer_id,
+        or a PurchaseMatrix built from one. For a PurchaseMatrix, the column
+        names and freq are the ones the matrix was built with.
     datetime_col: string
         the column in transactions that denotes the datetime the purchase was made.
     customer_id_col: string
@@ -522,54 +3429,56 @@ def expected_cumulative_transactions(
         Default 1, could be use to get exact cumulative transactions predicted
         by model, i.e. model trained with freq='W', passed freq to
         expected_cumulative_transactions is freq='D', and freq_multiplier=7.
+    integer_periods: bool, optional
+        Default False. If True, datetime_col holds integer period ids (e.g. day
+        numbers) instead of datetimes, and the transactions may be
+        pre-aggregated to one row per customer and period. freq and
+        datetime_format are then ignored, and with set_index_date the index
+        holds the period ids.
 
     Returns
     -------
     :obj: DataFrame
         A dataframe with columns actual, predicted
     """
-    
-    start_date = pd.to_datetime(transactions[datetime_col], format=datetime_format).min()
-    start_period = start_date.to_period(freq)
-    observation_period_end = start_period + t
 
-    repeated_and_first_transactions = _find_first_transactions(
-        transactions,
-        customer_id_col,
-        datetime_col,
-        datetime_format=datetime_format,
-        observation_period_end=observation_period_end,
-        freq=freq,
+    # the periods are counted on integer ordinals, start_period + i is the i-th period of the study
+    if isinstance(transactions, PurchaseMatrix):
+        freq = transactions.freq
+        codes, periods = transactions._customer_periods()[:2]
+        start_period = periods.min()
+        observed = periods <= start_period + t
+        codes, periods = codes[observed], periods[observed]
+    else:
+        if integer_periods:
+            freq = None
+        codes, _ = _factorize_customer_ids(transactions[customer_id_col])
+        periods = _period_ordinals(transactions[datetime_col], freq, datetime_format)
+        start_period = periods[periods != _NAT].min()
+        observed = periods <= start_period + t
+        codes, periods, _, _ = _distinct_customer_periods(codes[observed], periods[observed])
+
+    first_trans_mask = np.ones(codes.shape[0], dtype=bool)
+    first_trans_mask[1:] = codes[1:] != codes[:-1]
+
+    # the expected repeat transactions at period i sum over the cohorts of first purchases in the
+    # periods k < i, each cohort size times the expected purchases at age i - k: a convolution of
+    # the cohort sizes with the model's curve, which is only evaluated once for all of the ages
+    first_trans_size = np.bincount(periods[first_trans_mask] - start_period, minlength=t + 1)
+    expected_trans_agg = np.append(
+        0, model.expected_number_of_purchases_up_to_time(np.arange(1, t + 1) / freq_multiplier)
     )
+    pred_cum_transactions = signal.convolve(first_trans_size, expected_trans_agg)[
+        freq_multiplier : t + 1 : freq_multiplier
+    ]
 
-    first_trans_mask = repeated_and_first_transactions["first"]
-    repeated_transactions = repeated_and_first_transactions[~first_trans_mask]
-    first_transactions = repeated_and_first_transactions[first_trans_mask]
-
-    date_range = pd.date_range(start_date, periods=t + 1, freq=freq)
-    date_periods = date_range.to_period(freq)
-
-    pred_cum_transactions = []
-    first_trans_size = first_transactions.groupby(datetime_col).size()
-    for i, period in enumerate(date_periods):
-        if i % freq_multiplier == 0 and i > 0:
-            times = np.array([d.n for d in period - first_trans_size.index])
-            times = times[times > 0].astype(float) / freq_multiplier
-            expected_trans_agg = model.expected_number_of_purchases_up_to_time(times)
-
-            mask = first_trans_size.index < period
-            expected_trans = sum(expected_trans_agg * first_trans_size[mask])
-            pred_cum_transactions.append(expected_trans)
-
-    act_trans = repeated_transactions.groupby(datetime_col).size()
-    act_tracking_transactions = act_trans.reindex(date_periods, fill_value=0)
-
-    act_cum_transactions = []
-    for j in range(1, t // freq_multiplier + 1):
-        sum_trans = sum(act_tracking_transactions.iloc[: j * freq_multiplier])
-        act_cum_transactions.append(sum_trans)
+    # the actual transactions up to period i exclude those in period i
+    act_tracking_transactions = np.bincount(periods[~first_trans_mask] - start_period, minlength=t + 1)
+    act_cum_transactions = np.cumsum(act_tracking_transactions)[freq_multiplier - 1 : t : freq_multiplier]
 
     if set_index_date:
+        date_periods = start_period + np.arange(t + 1)
+        date_periods = pd.Index(date_periods) if freq is None else _period_index(date_periods, freq)
         index = date_periods[freq_multiplier - 1 : -1 : freq_multiplier]
     else:
         index = range(0, t // freq_multiplier)
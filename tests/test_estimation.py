@@ -43,6 +43,87 @@ class TestBaseFitter:
         base_fitter.params_ = pd.Series(dict(x=12.3, y=42))
         npt.assert_array_almost_equal([12.3, 42], base_fitter._unload_params("x", "y"))
 
+    def test_solver_methods(self):
+        from lifetimes.fitters import _solver_methods
+
+        assert _solver_methods(None) == [None]
+        assert _solver_methods("newton") == ["Newton-CG"]
+        assert _solver_methods("auto") == ["BFGS", "trust-exact", "Nelder-Mead"]
+        assert _solver_methods("auto", has_hessian=False) == ["BFGS", "Nelder-Mead"]
+        assert _solver_methods("auto", bounded=True) == ["L-BFGS-B", "Nelder-Mead"]
+        with pytest.raises(ValueError):
+            _solver_methods("sgd")
+        with pytest.raises(ValueError):
+            _solver_methods("trust-exact", has_hessian=False)
+        with pytest.raises(ValueError):
+            _solver_methods("bfgs", bounded=True)
+
+    def test_warm_start_params(self):
+        base_fitter = lt.BaseFitter()
+        base_fitter._scale = 10.0
+        params, hess_inv0 = base_fitter._warm_start_params(dict(x=1.0, y=2.0), None, ["y", "x"], scaled=["x"])
+        npt.assert_array_equal(params, [2.0, 10.0])
+        assert hess_inv0 is None
+
+        base_fitter.params_ = pd.Series(dict(x=1.0, y=2.0))
+        base_fitter._hessian_ = np.array([[2.0, 1.0], [1.0, 2.0]])
+        params, hess_inv0 = base_fitter._warm_start_params(base_fitter, None, ["x", "y"])
+        npt.assert_array_equal(params, [1.0, 2.0])
+        npt.assert_allclose(hess_inv0, np.linalg.inv(base_fitter._hessian_))
+
+        with pytest.raises(ValueError):
+            base_fitter._warm_start_params(base_fitter, [0.0, 0.0], ["x", "y"])
+        with pytest.raises(ValueError):
+            base_fitter._warm_start_params([1.0, 2.0, 3.0], None, ["x", "y"])
+
+    def test_log_rising_factorial_matches_gammaln(self):
+        from autograd import grad
+        from scipy.special import gammaln, digamma
+        from lifetimes.fitters import _log_rising_factorial, _frequency_weights
+
+        freq = np.array([0, 3, 1, 0, 250, 3])
+        npt.assert_allclose(_log_rising_factorial(0.7, freq), gammaln(0.7 + freq) - gammaln(0.7), rtol=1e-12)
+        npt.assert_allclose(
+            grad(lambda a: _log_rising_factorial(a, freq).sum())(0.7), (digamma(0.7 + freq) - digamma(0.7)).sum()
+        )
+        # non integer frequencies fall back to gammaln
+        npt.assert_allclose(_log_rising_factorial(0.7, freq + 0.5), gammaln(1.2 + freq) - gammaln(0.7))
+
+        values, weights = _frequency_weights(freq, np.arange(6.0))
+        npt.assert_array_equal(values, np.arange(251))
+        assert weights[0] == 3 and weights[1] == 2 and weights[3] == 6 and weights[250] == 4 and weights.sum() == 15
+
+    def test_frequency_table_is_the_likelihoods_lookup_of_the_frequencies(self):
+        from lifetimes.fitters import _FrequencyTable, _minibatch_adam
+
+        freq = np.array([0.0, 3, 1, 0, 25, 3])
+        rec, T, weights = freq + 1, np.full(6, 30.0), np.arange(1.0, 7)
+        table = _FrequencyTable(freq, weights)
+        npt.assert_array_equal(table.gather(table.values), freq)
+        assert table.weights.sum() == weights.sum()
+        assert _FrequencyTable(freq + 0.5, weights).inverse is None
+
+        log_params = np.log([0.5, 2.0, 0.7, 1.5])
+        for fitter in [lt.BetaGeoFitter, lt.ModifiedBetaGeoFitter]:
+            args = (freq, rec, T, weights, 0.1)
+            assert fitter._negative_log_likelihood(log_params, *args, table) == fitter._negative_log_likelihood(
+                log_params, *args
+            )
+            value, gradient = fitter._negative_log_likelihood_and_derivatives(log_params, *args, table)
+            npt.assert_allclose(value, fitter._negative_log_likelihood(log_params, *args))
+            npt.assert_allclose(gradient, fitter._negative_log_likelihood_and_derivatives(log_params, *args)[1])
+        params = np.exp(log_params)
+        assert lt.ParetoNBDFitter._negative_log_likelihood(
+            params, freq, rec, T, weights, 0.1, table
+        ) == lt.ParetoNBDFitter._negative_log_likelihood(params, freq, rec, T, weights, 0.1)
+
+        # the table describes the full data, the minibatches build their own
+        def objective(x, freq, weights, freq_table):
+            assert freq_table is None
+            return (x ** 2).sum(), 2 * x
+
+        _minibatch_adam(objective, np.ones(2), (freq, weights, table), batch_size=2, epochs=1)
+
     def test_save_load_model(self):
         base_fitter = lt.BaseFitter()
         base_fitter.save_model(PATH_SAVE_MODEL)
@@ -243,6 +324,15 @@ class TestGammaGammaFitter:
         )
         npt.assert_equal(ggf_clv.values, utils_clv.values)
 
+    def test_stochastic_solver_matches_full_batch_fit(self, cdnow_customers_with_monetary_value):
+        returning = cdnow_customers_with_monetary_value[cdnow_customers_with_monetary_value["frequency"] > 0]
+        ggf = lt.GammaGammaFitter().fit(returning["frequency"], returning["monetary_value"])
+        ggf_stochastic = lt.GammaGammaFitter().fit(
+            returning["frequency"], returning["monetary_value"], solver="stochastic", batch_size=200, seed=0
+        )
+        npt.assert_allclose(ggf_stochastic.params_, ggf.params_, rtol=1e-4)
+        npt.assert_allclose(ggf_stochastic._hessian_, ggf._hessian_, rtol=1e-4)
+
     def test_fit_with_index(self, cdnow_customers_with_monetary_value):
         returning_cdnow_customers_with_monetary_value = cdnow_customers_with_monetary_value[
             cdnow_customers_with_monetary_value["frequency"] > 0
@@ -433,6 +523,51 @@ class TestParetoNBDFitter:
             for x in range(Z.shape[1]):
                 assert Z[t_x][x] == ptf.conditional_probability_alive(x, t_x, max_t)
 
+    def test_fit_with_gradient_solvers(self, cdnow_customers):
+        np.random.seed(0)
+        ptf = lt.ParetoNBDFitter().fit(cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
+        for solver in ["bfgs", "lbfgsb", "auto"]:
+            ptf_solver = lt.ParetoNBDFitter().fit(
+                cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"], solver=solver
+            )
+            npt.assert_allclose(ptf_solver.params_, ptf.params_, rtol=1e-3)
+        with pytest.raises(ValueError):
+            lt.ParetoNBDFitter().fit(
+                cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"], solver="trust-exact"
+            )
+
+    def test_explicit_lbfgsb_fit_method_keeps_tol_and_no_bounds(self, monkeypatch, cdnow_customers):
+        from lifetimes.fitters import pareto_nbd_fitter
+
+        calls = []
+        minimize = pareto_nbd_fitter.minimize
+
+        def spy(*args, **kwargs):
+            calls.append((kwargs["tol"], kwargs["bounds"]))
+            return minimize(*args, **kwargs)
+
+        monkeypatch.setattr(pareto_nbd_fitter, "minimize", spy)
+        data = (cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
+        lt.ParetoNBDFitter().fit(*data, fit_method="L-BFGS-B", tol=1e-5, initial_params=[0.5, 1.0, 0.5, 1.0])
+        assert calls == [(1e-5, None)]
+
+        del calls[:]
+        lt.ParetoNBDFitter().fit(*data, solver="lbfgsb", tol=1e-5, initial_params=[0.5, 1.0, 0.5, 1.0])
+        assert calls[0][0] is None and calls[0][1] is not None
+
+    def test_stochastic_solver_matches_full_batch_fit(self, cdnow_customers):
+        np.random.seed(0)
+        ptf = lt.ParetoNBDFitter().fit(cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
+        ptf_stochastic = lt.ParetoNBDFitter().fit(
+            cdnow_customers["frequency"],
+            cdnow_customers["recency"],
+            cdnow_customers["T"],
+            solver="stochastic",
+            batch_size=500,
+            seed=0,
+        )
+        npt.assert_allclose(ptf_stochastic.params_, ptf.params_, rtol=1e-3)
+
     def test_fit_with_index(self, cdnow_customers):
         ptf = lt.ParetoNBDFitter()
         index = range(len(cdnow_customers), 0, -1)
@@ -521,6 +656,22 @@ class TestBetaGeoFitter:
             + bgf._negative_log_likelihood(params, x[1], np.array([t_x[1]]), np.array([t[1]]), weights[1], 0)
         ) / 2 == bgf._negative_log_likelihood(params, x, t_x, t, weights, 0)
 
+    def test_analytic_derivatives_match_autograd(self, cdnow_customers):
+        from autograd import value_and_grad, hessian
+
+        fitter = lt.BetaGeoFitter
+        weights = np.random.RandomState(0).randint(1, 4, cdnow_customers.shape[0]).astype(float)
+        frequency, recency, T = cdnow_customers[["frequency", "recency", "T"]].values.T
+        data = (frequency, recency / 10.0, T / 10.0, weights)
+        for log_params in [np.array([-1.4, -0.8, -0.2, 0.9]), np.array([0.3, 0.2, -1.0, 0.5])]:
+            for penalizer_coef in [0.0, 0.1]:
+                args = (log_params,) + data + (penalizer_coef,)
+                value, gradient = value_and_grad(fitter._negative_log_likelihood)(*args)
+                value_, gradient_, hessian_ = fitter._negative_log_likelihood_and_derivatives(*args, hessian=True)
+                npt.assert_allclose(value_, value, rtol=1e-10)
+                npt.assert_allclose(gradient_, gradient, atol=1e-10)
+                npt.assert_allclose(hessian_, hessian(fitter._negative_log_likelihood)(*args), atol=1e-10)
+
     def test_params_out_is_close_to_Hardie_paper(self, cdnow_customers):
         bfg = lt.BetaGeoFitter()
         bfg.fit(cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
@@ -720,6 +871,51 @@ class TestBetaGeoFitter:
         # remove saved model
         os.remove(PATH_SAVE_BGNBD_MODEL)
 
+    def test_solvers_find_the_same_optimum(self, cdnow_customers):
+        bgf = lt.BetaGeoFitter().fit(cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
+        for solver in ["bfgs", "lbfgsb", "trust-exact", "newton", "nelder-mead", "auto"]:
+            bgf_solver = lt.BetaGeoFitter().fit(
+                cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"], solver=solver
+            )
+            npt.assert_allclose(bgf_solver.params_, bgf.params_, rtol=1e-3)
+            npt.assert_allclose(bgf_solver._hessian_, bgf._hessian_, rtol=1e-2)
+
+    def test_warm_start_refits_in_a_few_iterations(self, cdnow_customers, monkeypatch):
+        import lifetimes.fitters
+
+        iterations = []
+        minimize = lifetimes.fitters.minimize
+
+        def recording_minimize(*args, **kwargs):
+            output = minimize(*args, **kwargs)
+            iterations.append(output.nit)
+            return output
+
+        monkeypatch.setattr(lifetimes.fitters, "minimize", recording_minimize)
+        bgf = lt.BetaGeoFitter().fit(cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"])
+        refit = cdnow_customers.iloc[:-20]
+        bgf_cold = lt.BetaGeoFitter().fit(refit["frequency"], refit["recency"], refit["T"])
+        bgf_warm = lt.BetaGeoFitter().fit(refit["frequency"], refit["recency"], refit["T"], warm_start=bgf)
+        npt.assert_allclose(bgf_warm.params_, bgf_cold.params_, rtol=1e-4)
+        assert iterations[2] <= 5 < iterations[1]
+
+        bgf_params = lt.BetaGeoFitter().fit(refit["frequency"], refit["recency"], refit["T"], warm_start=bgf.params_)
+        npt.assert_allclose(bgf_params.params_, bgf_cold.params_, rtol=1e-4)
+
+    def test_stochastic_solver_matches_full_batch_fit(self, cdnow_customers):
+        frequency, recency, T = cdnow_customers["frequency"], cdnow_customers["recency"], cdnow_customers["T"]
+        bgf = lt.BetaGeoFitter().fit(frequency, recency, T)
+        bgf_stochastic = lt.BetaGeoFitter().fit(frequency, recency, T, solver="stochastic", batch_size=500, seed=0)
+        npt.assert_allclose(bgf_stochastic.params_, bgf.params_, rtol=1e-4)
+        npt.assert_allclose(bgf_stochastic._hessian_, bgf._hessian_, rtol=1e-4)
+
+        # without refining, the minibatch iterates are reproducible with a seed
+        fits = [
+            lt.BetaGeoFitter().fit(frequency, recency, T, solver="stochastic", batch_size=500, seed=1, refine=False)
+            for _ in range(2)
+        ]
+        npt.assert_array_equal(fits[0].params_, fits[1].params_)
+
     def test_fit_with_index(self, cdnow_customers):
         bgf = lt.BetaGeoFitter(penalizer_coef=0.0)
         index = range(len(cdnow_customers), 0, -1)
@@ -779,6 +975,22 @@ class TestModifiedBetaGammaFitter:
             )
         ) / 2 == mbgf._negative_log_likelihood(params, x, t_x, t, weights, 0)
 
+    def test_analytic_derivatives_match_autograd(self, cdnow_customers):
+        from autograd import value_and_grad, hessian
+
+        fitter = lt.ModifiedBetaGeoFitter
+        weights = np.random.RandomState(0).randint(1, 4, cdnow_customers.shape[0]).astype(float)
+        frequency, recency, T = cdnow_customers[["frequency", "recency", "T"]].values.T
+        data = (frequency, recency / 10.0, T / 10.0, weights)
+        for log_params in [np.array([-1.4, -0.8, -0.2, 0.9]), np.array([0.3, 0.2, -1.0, 0.5])]:
+            for penalizer_coef in [0.0, 0.1]:
+                args = (log_params,) + data + (penalizer_coef,)
+                value, gradient = value_and_grad(fitter._negative_log_likelihood)(*args)
+                value_, gradient_, hessian_ = fitter._negative_log_likelihood_and_derivatives(*args, hessian=True)
+                npt.assert_allclose(value_, value, rtol=1e-10)
+                npt.assert_allclose(gradient_, gradient, atol=1e-10)
+                npt.assert_allclose(hessian_, hessian(fitter._negative_log_likelihood)(*args), atol=1e-10)
+
     def test_params_out_is_close_to_BTYDplus(self, cdnow_customers):
         """ See https://github.com/mplatzer/BTYDplus """
         mbfg = lt.ModifiedBetaGeoFitter()
@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 """Test lifetimes utils."""
+import os
+import json
+import sqlite3
+import warnings
+
 import pytest
 import pandas as pd
 import numpy as np
 from pandas.util.testing import assert_frame_equal
 from numpy.testing import assert_almost_equal, assert_allclose
 
-from lifetimes import utils, BetaGeoFitter, ParetoNBDFitter
-from lifetimes.datasets import load_dataset
+from lifetimes import utils, BetaGeoFitter, ParetoNBDFitter, ModifiedBetaGeoFitter, GammaGammaFitter
+from lifetimes.datasets import load_dataset, load_cdnow_summary_data_with_monetary_value
 
 
 @pytest.fixture()
@@ -236,6 +241,35 @@ def test_find_first_transactions_with_monetary_values_with_specific_non_daily_fr
     assert_frame_equal(actual, expected)
 
 
+@pytest.mark.parametrize("freq", ["D", "W", "H", "M"])
+def test_period_ordinals_are_identical_to_pandas_periods(freq):
+    datetimes = pd.Series(
+        pd.to_datetime(["1969-12-28 23:59", "1970-01-01", "1970-01-04 12:00", "2015-02-01 08:30", "2015-02-02", None])
+    )
+    actual = utils._period_ordinals(datetimes, freq)
+    expected = pd.PeriodIndex(datetimes, freq=freq).asi8
+    assert_almost_equal(actual, expected)
+
+    starts = utils._period_start(actual[:-1], freq)
+    assert (starts == pd.PeriodIndex(datetimes[:-1], freq=freq).to_timestamp()).all()
+
+
+def test_find_first_transactions_with_hourly_frequency():
+    d = [[1, "2015-01-01 10:05"], [1, "2015-01-01 10:55"], [1, "2015-01-01 11:00"], [2, "2015-01-01 09:00"]]
+    transactions = pd.DataFrame(d, columns=["id", "date"])
+    actual = utils._find_first_transactions(transactions, "id", "date", freq="H")
+    expected = pd.DataFrame(
+        [
+            [1, pd.Period("2015-01-01 10:00", "H"), True],
+            [1, pd.Period("2015-01-01 11:00", "H"), False],
+            [2, pd.Period("2015-01-01 09:00", "H"), True],
+        ],
+        columns=["id", "date", "first"],
+        index=[0, 2, 3],
+    )
+    assert_frame_equal(actual, expected)
+
+
 def test_summary_data_from_transaction_data_returns_correct_results(transaction_level_data):
     today = "2015-02-07"
     actual = utils.summary_data_from_transaction_data(
@@ -260,6 +294,23 @@ def test_summary_data_from_transaction_data_works_with_string_customer_ids(trans
     utils.summary_data_from_transaction_data(df, "id", "date")
 
 
+def test_factorize_customer_ids_is_warning_free_for_object_ids():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", FutureWarning)
+        codes, customers = utils._factorize_customer_ids(pd.Series(["Y", "X", None, "Y"]))
+        _, object_customers = utils._factorize_customer_ids(pd.Series([3, 1, 3], dtype=object))
+    assert_almost_equal(codes, [1, 0, -1, 1])
+    assert list(customers) == ["X", "Y"]
+    assert object_customers.dtype == object and list(object_customers) == [1, 3]
+
+
+def test_factorize_customer_ids_keeps_numeric_id_arrays_typed():
+    for ids in [np.array([7, 5, 7]), np.array([7.0, 5.0, 7.0]), [7, 5, 7]]:
+        codes, customers = utils._factorize_customer_ids(ids)
+        assert_almost_equal(codes, [1, 0, 1])
+        assert customers.dtype == np.asarray(ids).dtype
+
+
 def test_summary_data_from_transaction_data_works_with_int_customer_ids_and_doesnt_coerce_to_float(
     transaction_level_data
 ):
@@ -331,6 +382,25 @@ def test_summary_date_from_transaction_with_monetary_values(large_transaction_le
     assert_frame_equal(actual, expected)
 
 
+def test_summary_data_from_transaction_data_with_monetary_stats(large_transaction_level_data_with_monetary_value):
+    today = "2015-02-07"
+    expected = utils.summary_data_from_transaction_data(
+        large_transaction_level_data_with_monetary_value, "id", "date", "monetary_value", observation_period_end=today
+    )
+    actual = utils.summary_data_from_transaction_data(
+        large_transaction_level_data_with_monetary_value,
+        "id",
+        "date",
+        "monetary_value",
+        observation_period_end=today,
+        monetary_stats=True,
+    )
+    assert_frame_equal(actual[expected.columns], expected)
+    assert list(actual["monetary_value_variance"]) == [0, 0, 8, 0, 24.5, 0]
+    assert list(actual["first_value"]) == [1, 2, 3, 6, 3, 5]
+    assert list(actual["total_value"]) == [3, 2, 9, 12, 12, 5]
+
+
 def test_summary_data_from_transaction_data_will_choose_the_correct_first_order_to_drop_in_monetary_transactions():
     # this is the correct behaviour. See https://github.com/CamDavidsonPilon/lifetimes/issues/85
     # and test_summary_statistics_are_indentical_to_hardies_paper_confirming_correct_aggregations
@@ -469,12 +539,720 @@ def test_calibration_and_holdout_data_with_monetary_value(large_transaction_leve
     assert (actual["monetary_value_holdout"] == [2, 0, 0, 3, 0]).all()
 
 
+def test_calibration_and_holdout_data_counts_holdout_periods_and_averages_holdout_transactions():
+    d = [
+        [1, "2015-01-01 10:00", 1],
+        [1, "2015-01-05 08:00", 2],  # after the calibration end, in its last day
+        [1, "2015-01-06 09:00", 3],
+        [1, "2015-01-06 18:00", 7],
+        [2, "2015-01-02 10:00", 4],
+    ]
+    transactions = pd.DataFrame(d, columns=["id", "date", "monetary_value"])
+    actual = utils.calibration_and_holdout_data(
+        transactions, "id", "date", "2015-01-05 07:00", monetary_value_col="monetary_value"
+    )
+    assert list(actual["frequency_cal"]) == [0, 0]
+    assert list(actual["frequency_holdout"]) == [2, 0]
+    assert list(actual["monetary_value_holdout"]) == [4, 0]
+    assert list(actual["duration_holdout"]) == [1, 1]
+
+
+def _daily_aggregates(transactions):
+    # the pre-aggregated form of a transaction log: day numbers, counts and daily totals
+    transactions = transactions.assign(day=(pd.to_datetime(transactions["date"]) - pd.Timestamp(0)).dt.days)
+    return transactions.groupby(["id", "day"], as_index=False).agg(
+        count=("monetary_value", "size"), monetary_value=("monetary_value", "sum")
+    )
+
+
+def test_summary_data_from_transaction_data_with_integer_periods(large_transaction_level_data_with_monetary_value):
+    expected = utils.summary_data_from_transaction_data(
+        large_transaction_level_data_with_monetary_value,
+        "id",
+        "date",
+        monetary_value_col="monetary_value",
+        observation_period_end="2015-02-07",
+        freq_multiplier=7,
+    )
+    actual = utils.summary_data_from_transaction_data(
+        _daily_aggregates(large_transaction_level_data_with_monetary_value),
+        "id",
+        "day",
+        monetary_value_col="monetary_value",
+        observation_period_end=(pd.Timestamp("2015-02-07") - pd.Timestamp(0)).days,
+        freq_multiplier=7,
+        integer_periods=True,
+    )
+    assert_frame_equal(actual, expected)
+
+
+def test_calibration_and_holdout_data_with_integer_periods_and_counts(large_transaction_level_data_with_monetary_value):
+    transactions = large_transaction_level_data_with_monetary_value.copy()
+    transactions.loc[len(transactions)] = [1, "2015-02-06", 4]
+    expected = utils.calibration_and_holdout_data(
+        transactions, "id", "date", "2015-02-01", "2015-02-07", monetary_value_col="monetary_value"
+    )
+    actual = utils.calibration_and_holdout_data(
+        _daily_aggregates(transactions),
+        "id",
+        "day",
+        (pd.Timestamp("2015-02-01") - pd.Timestamp(0)).days,
+        (pd.Timestamp("2015-02-07") - pd.Timestamp(0)).days,
+        monetary_value_col="monetary_value",
+        integer_periods=True,
+        count_col="count",
+    )
+    assert_frame_equal(actual, expected, check_dtype=False)
+    assert actual.loc[1, "monetary_value_holdout"] == 3
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "M"])
+def test_calibration_and_holdout_splits_are_identical_to_calibration_and_holdout_data(freq):
+    transactions = load_dataset("CDNOW_sample.txt", header=None, sep=r"\s+")
+    transactions.columns = ["id_total", "id_sample", "date", "num_cd_purc", "total_value"]
+    splits = utils.calibration_and_holdout_splits(
+        transactions,
+        "id_sample",
+        "date",
+        ["19970301", "19970131"],
+        [1, 4],
+        freq=freq,
+        datetime_format="%Y%m%d",
+        monetary_value_col="total_value",
+    )
+
+    n_splits = 0
+    for calibration_period_end, observation_period_end, actual in splits:
+        expected = utils.calibration_and_holdout_data(
+            transactions,
+            "id_sample",
+            "date",
+            calibration_period_end,
+            observation_period_end,
+            freq=freq,
+            datetime_format="%Y%m%d",
+            monetary_value_col="total_value",
+        )
+        assert_frame_equal(actual, expected)
+        n_splits += 1
+    assert n_splits == 4
+
+
+def test_calibration_and_holdout_splits_observation_period_ends(large_transaction_level_data):
+    transactions = large_transaction_level_data
+    splits = utils.calibration_and_holdout_splits(transactions, "id", "date", ["2015-01-31"], 1, freq="M")
+    assert [split[:2] for split in splits] == [(pd.Timestamp("2015-01-31"), pd.Timestamp("2015-02-28"))]
+
+    splits = utils.calibration_and_holdout_splits(transactions, "id", "date", ["2015-01-14"], [1, 2], freq="W")
+    assert [split[1] for split in splits] == [pd.Timestamp("2015-01-21"), pd.Timestamp("2015-01-28")]
+
+
+def test_summary_data_from_transaction_data_with_compact_dtypes(large_transaction_level_data):
+    today = "2015-02-07"
+    expected = utils.summary_data_from_transaction_data(
+        large_transaction_level_data, "id", "date", observation_period_end=today
+    )
+    actual = utils.summary_data_from_transaction_data(
+        large_transaction_level_data, "id", "date", observation_period_end=today, compact_dtypes=True
+    )
+    assert actual["frequency"].dtype == np.int32
+    assert actual["recency"].dtype == np.float32
+    assert actual["T"].dtype == np.float32
+    assert_frame_equal(actual, expected, check_dtype=False)
+
+
+def test_calibration_and_holdout_data_with_string_customer_ids_and_compact_dtypes(large_transaction_level_data):
+    today = "2015-02-07"
+    calibration_end = "2015-02-01"
+    expected = utils.calibration_and_holdout_data(
+        large_transaction_level_data, "id", "date", calibration_end, observation_period_end=today
+    )
+    large_transaction_level_data["id"] = large_transaction_level_data["id"].map("customer-{}".format)
+    actual = utils.calibration_and_holdout_data(
+        large_transaction_level_data, "id", "date", calibration_end, observation_period_end=today, compact_dtypes=True
+    )
+    assert list(actual.index) == ["customer-{}".format(i) for i in expected.index]
+    assert actual["frequency_cal"].dtype == np.int32
+    assert actual["frequency_holdout"].dtype == np.int32
+    assert actual["T_cal"].dtype == np.float32
+    assert_almost_equal(actual.values, expected.values)
+
+
 def test_summary_data_from_transaction_data_squashes_period_purchases_to_one_purchase():
     transactions = pd.DataFrame([[1, "2015-01-01"], [1, "2015-01-01"]], columns=["id", "t"])
     actual = utils.summary_data_from_transaction_data(transactions, "id", "t", freq="W")
     assert actual.loc[1]["frequency"] == 1.0 - 1.0
 
 
+@pytest.mark.parametrize("freq", ["D", "W", "M"])
+def test_summary_data_from_transaction_chunks_is_identical_to_summary_data_from_transaction_data(freq):
+    transactions = load_dataset("CDNOW_sample.txt", header=None, sep=r"\s+")
+    transactions.columns = ["id_total", "id_sample", "date", "num_cd_purc", "total_value"]
+    transactions = transactions.sort_values("date")
+    chunks = (transactions.iloc[i : i + 1000] for i in range(0, transactions.shape[0], 1000))
+
+    actual = utils.summary_data_from_transaction_chunks(
+        chunks,
+        "id_sample",
+        "date",
+        "total_value",
+        datetime_format="%Y%m%d",
+        observation_period_end="19970930",
+        freq=freq,
+    )
+    expected = utils.summary_data_from_transaction_data(
+        transactions,
+        "id_sample",
+        "date",
+        "total_value",
+        datetime_format="%Y%m%d",
+        observation_period_end="19970930",
+        freq=freq,
+    )
+    assert_frame_equal(actual, expected)
+
+
+def test_summary_data_from_transaction_chunks_merges_periods_split_across_chunks(
+    large_transaction_level_data_with_monetary_value
+):
+    today = "20150207"
+    transactions = large_transaction_level_data_with_monetary_value.sort_values("date")
+    chunks = [transactions.iloc[:5], transactions.iloc[5:9], transactions.iloc[9:]]
+
+    actual = utils.summary_data_from_transaction_chunks(
+        chunks, "id", "date", "monetary_value", observation_period_end=today, freq="W"
+    )
+    expected = utils.summary_data_from_transaction_data(
+        transactions, "id", "date", "monetary_value", observation_period_end=today, freq="W"
+    )
+    assert_frame_equal(actual, expected)
+
+
+def test_summary_data_from_transaction_chunks_raises_on_out_of_order_chunks(large_transaction_level_data):
+    chunks = [large_transaction_level_data.iloc[[0, 1]], large_transaction_level_data.iloc[[0]]]
+    with pytest.raises(ValueError, match="out of chronological order"):
+        utils.summary_data_from_transaction_chunks(chunks, "id", "date")
+
+
+def test_summary_data_from_transaction_chunks_without_transactions():
+    summary = utils.summary_data_from_transaction_chunks(
+        iter([]), "id", "date", "monetary_value", observation_period_end="2015-02-07"
+    )
+    assert summary.empty
+    assert list(summary.columns) == ["frequency", "recency", "T", "monetary_value"]
+
+    with pytest.raises(ValueError, match="observation_period_end is required"):
+        utils.summary_data_from_transaction_chunks(iter([]), "id", "date")
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "M"])
+def test_summary_data_from_transaction_data_snapshots_are_identical_to_summary_data_from_transaction_data(freq):
+    transactions = load_dataset("CDNOW_sample.txt", header=None, sep=r"\s+")
+    transactions.columns = ["id_total", "id_sample", "date", "num_cd_purc", "total_value"]
+    observation_period_ends = ["19970301", "19970105", "19980630"]
+
+    actual = utils.summary_data_from_transaction_data_snapshots(
+        transactions, "id_sample", "date", observation_period_ends, "total_value", datetime_format="%Y%m%d", freq=freq
+    )
+    assert actual.index.names == ["observation_period_end", "id_sample"]
+    for observation_period_end in observation_period_ends:
+        expected = utils.summary_data_from_transaction_data(
+            transactions,
+            "id_sample",
+            "date",
+            "total_value",
+            datetime_format="%Y%m%d",
+            observation_period_end=observation_period_end,
+            freq=freq,
+        )
+        assert_frame_equal(actual.loc[pd.Timestamp(observation_period_end)], expected)
+
+
+def test_summary_data_from_transaction_data_with_per_customer_observation_period_ends(
+    large_transaction_level_data_with_monetary_value
+):
+    transactions = large_transaction_level_data_with_monetary_value
+    observation_period_ends = pd.Series(
+        pd.to_datetime(["2015-02-01", "2015-01-20", "2015-01-02", "2015-02-08", "2014-12-31"]), index=[1, 2, 3, 4, 5]
+    )
+
+    actual = utils.summary_data_from_transaction_data(
+        transactions, "id", "date", "monetary_value", observation_period_end=observation_period_ends
+    )
+    expected = pd.concat(
+        [
+            utils.summary_data_from_transaction_data(
+                transactions[transactions["id"] == customer_id],
+                "id",
+                "date",
+                "monetary_value",
+                observation_period_end=observation_period_end,
+            )
+            for customer_id, observation_period_end in observation_period_ends.items()
+        ]
+    )
+    # customer 5 has no transactions before their end, and customer 6 has no end
+    assert list(actual.index) == [1, 2, 3, 4]
+    assert_frame_equal(actual, expected)
+
+    with pytest.raises(ValueError):
+        utils.summary_data_from_transaction_data(
+            transactions, "id", "date", observation_period_end=pd.Series(["2015-02-01", "2015-02-02"], index=[1, 1])
+        )
+
+
+def test_summary_data_from_transaction_data_parallel_is_identical_to_serial(cdnow_transactions):
+    expected = utils.summary_data_from_transaction_data(
+        cdnow_transactions, "id_sample", "date", datetime_format="%Y%m%d", freq="W"
+    )
+    actual = utils.summary_data_from_transaction_data_parallel(
+        cdnow_transactions, "id_sample", "date", datetime_format="%Y%m%d", freq="W", n_shards=2
+    )
+    assert_frame_equal(actual, expected)
+
+
+def test_summary_data_from_transaction_data_parallel_accepts_an_executor(
+    large_transaction_level_data_with_monetary_value
+):
+    from concurrent.futures import ThreadPoolExecutor
+
+    today = "2015-02-07"
+    expected = utils.summary_data_from_transaction_data(
+        large_transaction_level_data_with_monetary_value, "id", "date", "monetary_value", observation_period_end=today
+    )
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        actual = utils.summary_data_from_transaction_data_parallel(
+            large_transaction_level_data_with_monetary_value,
+            "id",
+            "date",
+            "monetary_value",
+            observation_period_end=today,
+            n_shards=4,
+            executor=executor,
+        )
+    assert_frame_equal(actual, expected)
+
+
+def test_summary_data_from_parquet_is_identical_to_summary_data_from_transaction_data(
+    tmpdir, large_transaction_level_data_with_monetary_value
+):
+    pytest.importorskip("pyarrow")
+    transactions = large_transaction_level_data_with_monetary_value
+    transactions["date"] = pd.to_datetime(transactions["date"])
+    path = str(tmpdir.join("transactions.parquet"))
+    transactions.to_parquet(path, row_group_size=4)
+
+    for today, freq in [("2015-02-04", "D"), ("2015-02-04", "W"), (None, "D")]:
+        expected = utils.summary_data_from_transaction_data(
+            transactions, "id", "date", "monetary_value", observation_period_end=today, freq=freq
+        )
+        actual = utils.summary_data_from_parquet(
+            path, "id", "date", "monetary_value", observation_period_end=today, freq=freq
+        )
+        assert_frame_equal(actual, expected)
+
+
+def test_calibration_and_holdout_data_from_parquet_reads_a_partitioned_dataset(tmpdir, large_transaction_level_data):
+    pytest.importorskip("pyarrow")
+    transactions = large_transaction_level_data
+    transactions["date"] = pd.to_datetime(transactions["date"])
+    transactions["month"] = transactions["date"].dt.month
+    path = str(tmpdir.join("transactions"))
+    transactions.to_parquet(path, partition_cols=["month"])
+
+    expected = utils.calibration_and_holdout_data(
+        transactions, "id", "date", "2015-02-01", observation_period_end="2015-02-04"
+    )
+    actual = utils.calibration_and_holdout_data_from_parquet(
+        path, "id", "date", "2015-02-01", observation_period_end="2015-02-04"
+    )
+    assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("backend", ["pyarrow", "polars"])
+@pytest.mark.parametrize("freq", ["D", "W", "M"])
+def test_summary_data_from_native_tables_is_identical_to_summary_data_from_transaction_data(freq, backend):
+    module = pytest.importorskip(backend)
+    transactions = load_dataset("CDNOW_sample.txt", header=None, sep=r"\s+")
+    transactions.columns = ["id_total", "id_sample", "date", "num_cd_purc", "total_value"]
+    transactions["date"] = pd.to_datetime(transactions["date"], format="%Y%m%d")
+    table = module.Table.from_pandas(transactions) if backend == "pyarrow" else module.from_pandas(transactions)
+
+    for observation_period_end in ["1997-09-30", None]:
+        expected = utils.summary_data_from_transaction_data(
+            transactions,
+            "id_sample",
+            "date",
+            "total_value",
+            observation_period_end=observation_period_end,
+            freq=freq,
+            monetary_stats=True,
+        )
+        actual = utils.summary_data_from_transaction_data(
+            table,
+            "id_sample",
+            "date",
+            "total_value",
+            observation_period_end=observation_period_end,
+            freq=freq,
+            monetary_stats=True,
+        )
+        assert_frame_equal(actual, expected, check_exact=False)
+
+
+@pytest.mark.parametrize("backend", ["pyarrow", "polars"])
+def test_monetary_value_variance_from_native_tables_does_not_cancel(backend, large_transaction_level_data):
+    module = pytest.importorskip(backend)
+    # values around 1e9 with a spread of a few units: the sums of squares lose every digit
+    transactions = large_transaction_level_data.assign(
+        value=1e9 + np.arange(large_transaction_level_data.shape[0]) % 5
+    )
+    table = module.Table.from_pandas(transactions) if backend == "pyarrow" else module.from_pandas(transactions)
+
+    expected = utils.summary_data_from_transaction_data(transactions, "id", "date", "value", monetary_stats=True)
+    actual = utils.summary_data_from_transaction_data(table, "id", "date", "value", monetary_stats=True)
+    assert (actual["monetary_value_variance"] >= 0).all()
+    assert_allclose(actual["monetary_value_variance"], expected["monetary_value_variance"], atol=1e-6)
+
+
+@pytest.mark.parametrize("backend", ["pyarrow", "polars"])
+def test_summary_data_from_native_tables_with_string_datetimes(backend, large_transaction_level_data):
+    module = pytest.importorskip(backend)
+    transactions = large_transaction_level_data
+    table = module.Table.from_pandas(transactions) if backend == "pyarrow" else module.from_pandas(transactions)
+
+    expected = utils.summary_data_from_transaction_data(transactions, "id", "date", datetime_format="%Y-%m-%d")
+    actual = utils.summary_data_from_transaction_data(table, "id", "date", datetime_format="%Y-%m-%d")
+    assert_frame_equal(actual, expected)
+
+
+@pytest.mark.parametrize("freq", ["D", "W", "M"])
+def test_summary_data_from_sql_is_identical_to_summary_data_from_transaction_data(freq):
+    transactions = load_dataset("CDNOW_sample.txt", header=None, sep=r"\s+")
+    transactions.columns = ["id_total", "id_sample", "date", "num_cd_purc", "total_value"]
+    transactions["date"] = pd.to_datetime(transactions["date"], format="%Y%m%d")
+    connection = sqlite3.connect(":memory:")
+    transactions.to_sql("transactions", connection, index=False)
+
+    for observation_period_end in ["1997-09-30", None]:
+        expected = utils.summary_data_from_transaction_data(
+            transactions,
+            "id_sample",
+            "date",
+            "total_value",
+            observation_period_end=observation_period_end,
+            freq=freq,
+            freq_multiplier=7,
+        )
+        actual = utils.summary_data_from_sql(
+            connection,
+            "transactions",
+            "id_sample",
+            "date",
+            "total_value",
+            observation_period_end=observation_period_end,
+            freq=freq,
+            freq_multiplier=7,
+        )
+        assert_frame_equal(actual, expected)
+
+
+def test_summary_data_from_sql_with_integer_periods(large_transaction_level_data):
+    transactions = large_transaction_level_data.assign(
+        day=(pd.to_datetime(large_transaction_level_data["date"]) - pd.Timestamp(0)).dt.days
+    )
+    connection = sqlite3.connect(":memory:")
+    transactions.to_sql("transactions", connection, index=False)
+
+    expected = utils.summary_data_from_transaction_data(transactions, "id", "day", integer_periods=True)
+    actual = utils.summary_data_from_sql(connection, "transactions", "id", "day", integer_periods=True)
+    assert_frame_equal(actual, expected)
+
+
+def test_summary_sql_requires_a_period_template_for_other_freqs():
+    with pytest.raises(ValueError):
+        utils.summary_sql("transactions", "id", "date", freq="Q")
+    query = utils.summary_sql("transactions", "id", "date", freq="Q", period_template="quarter({column})")
+    assert 'quarter("date")' in query
+
+
+def test_rfm_state_updates_with_late_transactions(large_transaction_level_data_with_monetary_value):
+    today = "2015-02-07"
+    transactions = large_transaction_level_data_with_monetary_value
+    state = utils.RFMState("id", "date", "monetary_value")
+    # the later half arrives first, customer 3's first purchase is late
+    state.update(transactions.iloc[4:]).update(transactions.iloc[:4])
+
+    expected = utils.summary_data_from_transaction_data(
+        transactions, "id", "date", "monetary_value", observation_period_end=today
+    )
+    assert_frame_equal(state.summary(observation_period_end=today), expected)
+
+
+def test_rfm_state_row_by_row_updates_are_identical_to_a_single_update(
+    monkeypatch, large_transaction_level_data_with_monetary_value
+):
+    monkeypatch.setattr(utils, "_RFM_STATE_MIN_BUFFER", 2)
+    transactions = large_transaction_level_data_with_monetary_value
+    state = utils.RFMState("id", "date", "monetary_value")
+    for i in reversed(range(transactions.shape[0])):
+        state.update(transactions.iloc[i : i + 1])
+
+    expected = utils.RFMState("id", "date", "monetary_value").update(transactions)
+    assert_frame_equal(state.summary(), expected.summary())
+
+
+def test_rfm_state_merges_batches_without_sorting_the_history_again(
+    monkeypatch, large_transaction_level_data_with_monetary_value
+):
+    transactions = large_transaction_level_data_with_monetary_value
+    state = utils.RFMState("id", "date", "monetary_value")
+    batches = [transactions.iloc[i : i + 3] for i in range(0, transactions.shape[0], 3)]
+    state.update(batches[0]).summary()
+
+    sorted_sizes = []
+    unique = np.unique
+
+    def spy(keys, *args, **kwargs):
+        sorted_sizes.append(np.size(keys))
+        return unique(keys, *args, **kwargs)
+
+    monkeypatch.setattr(np, "unique", spy)
+    for batch in batches[1:]:
+        state.update(batch).summary()
+    # only the buffered batch of at most 3 keys is sorted, not the history
+    assert sorted_sizes and max(sorted_sizes) <= 3 < state._keys.shape[0]
+    monkeypatch.undo()
+
+    expected = utils.RFMState("id", "date", "monetary_value").update(transactions)
+    assert_frame_equal(state.summary(), expected.summary())
+
+
+def test_rfm_state_summary_of_an_empty_state():
+    state = utils.RFMState("id", "date", "monetary_value")
+    summary = state.summary(observation_period_end="2015-02-07")
+    assert summary.empty
+    assert list(summary.columns) == ["frequency", "recency", "T", "monetary_value"]
+
+    with pytest.raises(ValueError, match="observation_period_end"):
+        state.summary()
+
+
+def test_rfm_state_summary_can_be_truncated(large_transaction_level_data):
+    state = utils.RFMState("id", "date", freq="W").update(large_transaction_level_data)
+
+    for today in ["2015-01-17", "2015-02-07"]:
+        expected = utils.summary_data_from_transaction_data(
+            large_transaction_level_data, "id", "date", observation_period_end=today, freq="W"
+        )
+        assert_frame_equal(state.summary(observation_period_end=today), expected)
+
+
+def test_rfm_state_merge_of_shards_is_identical_to_a_single_state(cdnow_transactions):
+    is_even = cdnow_transactions["id_sample"] % 2 == 0
+    state = utils.RFMState("id_sample", "date", datetime_format="%Y%m%d").update(cdnow_transactions[is_even])
+    other = utils.RFMState("id_sample", "date", datetime_format="%Y%m%d").update(cdnow_transactions[~is_even])
+
+    expected = utils.summary_data_from_transaction_data(
+        cdnow_transactions, "id_sample", "date", datetime_format="%Y%m%d"
+    )
+    assert_frame_equal(state.merge(other).summary(), expected)
+
+
+def test_rfm_state_merge_requires_the_same_freq(large_transaction_level_data):
+    state = utils.RFMState("id", "date", freq="D").update(large_transaction_level_data)
+    other = utils.RFMState("id", "date", freq="W").update(large_transaction_level_data)
+    with pytest.raises(ValueError):
+        state.merge(other)
+
+
+@pytest.mark.parametrize("freq", ["D", "W"])
+def test_purchase_matrix_summaries_are_identical_to_summary_data_from_transaction_data(
+    freq, large_transaction_level_data_with_monetary_value
+):
+    transactions = large_transaction_level_data_with_monetary_value
+    matrix = utils.PurchaseMatrix.from_transactions(transactions, "id", "date", "monetary_value", freq=freq)
+    assert len(matrix) == transactions["id"].nunique()
+    assert matrix.matrix.sum() == len(transactions)
+
+    for observation_period_end in ["2015-01-18", "2015-02-08", None]:
+        expected = utils.summary_data_from_transaction_data(
+            transactions, "id", "date", "monetary_value", observation_period_end=observation_period_end, freq=freq
+        )
+        actual = utils.summary_data_from_transaction_data(
+            matrix, "id", "date", observation_period_end=observation_period_end
+        )
+        assert_frame_equal(actual, expected)
+
+
+def test_purchase_matrix_calibration_and_holdout_data_is_cut_on_whole_periods(
+    large_transaction_level_data_with_monetary_value
+):
+    transactions = large_transaction_level_data_with_monetary_value
+    matrix = utils.PurchaseMatrix.from_transactions(transactions, "id", "date", "monetary_value", freq="W")
+
+    expected = utils.calibration_and_holdout_data(
+        transactions, "id", "date", "2015-02-01", "2015-02-08", freq="W", monetary_value_col="monetary_value"
+    )
+    assert_frame_equal(utils.calibration_and_holdout_data(matrix, "id", "date", "2015-02-01", "2015-02-08"), expected)
+    # 2015-01-29 is in the week ending 2015-02-01, which stays in the calibration
+    assert_frame_equal(utils.calibration_and_holdout_data(matrix, "id", "date", "2015-01-29"), expected)
+
+
+def test_purchase_matrix_alive_path_and_cumulative_transactions(cdnow_transactions, fitted_bg):
+    matrix = utils.PurchaseMatrix.from_transactions(cdnow_transactions, "id_sample", "date", datetime_format="%Y%m%d")
+
+    expected = utils.expected_cumulative_transactions(
+        fitted_bg, cdnow_transactions, "date", "id_sample", 70, datetime_format="%Y%m%d", freq_multiplier=7
+    )
+    actual = utils.expected_cumulative_transactions(fitted_bg, matrix, "date", "id_sample", 70, freq_multiplier=7)
+    assert_frame_equal(actual, expected)
+
+    customer_transactions = cdnow_transactions[cdnow_transactions["id_sample"] == 7]
+    customer_transactions = customer_transactions.assign(
+        date=pd.to_datetime(customer_transactions["date"], format="%Y%m%d")
+    )
+    expected = utils.calculate_alive_path(fitted_bg, customer_transactions, "date", 205)
+    actual = utils.calculate_alive_path(fitted_bg, matrix, "date", 205, customer_id=7)
+    assert_allclose(actual.values, np.concatenate(expected.values))
+
+    with pytest.raises(ValueError):
+        utils.calculate_alive_path(fitted_bg, matrix, "date", 205)
+
+
+def test_rfm_store_round_trips_a_summary(tmpdir, large_transaction_level_data_with_monetary_value):
+    transactions = large_transaction_level_data_with_monetary_value
+    for ids in [transactions["id"], "c" + transactions["id"].astype(str)]:
+        summary = utils.summary_data_from_transaction_data(
+            transactions.assign(id=ids), "id", "date", "monetary_value", observation_period_end="2015-02-07"
+        )
+        path = str(tmpdir.join("store_%s" % ids.dtype))
+        store = utils.save_rfm_store(summary, path, freq="D", observation_period_end="2015-02-07")
+
+        assert len(store) == summary.shape[0]
+        assert "recency" in store and "weights" not in store
+        assert store.freq == "D"
+        assert isinstance(store["frequency"], np.ndarray)
+        assert isinstance(utils.load_rfm_store(path)._arrays["T"], np.memmap)
+        assert isinstance(utils.load_rfm_store(path)._index_values, np.memmap)
+        with open(os.path.join(path, "header.json")) as f:
+            assert "index" not in json.load(f)
+        assert_frame_equal(utils.load_rfm_store(path).to_frame(), summary, check_dtype=False)
+
+
+def test_rfm_store_keeps_non_integral_frequencies_and_weights(tmpdir, example_summary_data):
+    summary = example_summary_data.assign(weights=np.linspace(0.5, 2.5, example_summary_data.shape[0]))
+    store = utils.save_rfm_store(summary, str(tmpdir.join("weighted")))
+    assert store["frequency"].dtype == np.int64
+    assert_allclose(store["weights"], summary["weights"])
+    expected = BetaGeoFitter().fit(summary["frequency"], summary["recency"], summary["T"], summary["weights"])
+    assert_allclose(BetaGeoFitter().fit(store).params_, expected.params_, rtol=1e-5)
+
+    fractional = summary.assign(frequency=summary["frequency"] + 0.5)
+    store = utils.save_rfm_store(fractional, str(tmpdir.join("fractional")))
+    assert_allclose(store["frequency"], summary["frequency"] + 0.5)
+    with pytest.raises(ValueError):
+        BetaGeoFitter().fit(store)
+
+
+def test_fitters_accept_an_rfm_store(tmpdir, example_summary_data, fitted_bg):
+    store = utils.save_rfm_store(example_summary_data, str(tmpdir.join("store")))
+
+    bg = BetaGeoFitter().fit(store)
+    assert_allclose(bg.params_, fitted_bg.params_, rtol=1e-5)
+    assert_allclose(
+        bg.conditional_probability_alive(store),
+        bg.conditional_probability_alive(
+            example_summary_data["frequency"], example_summary_data["recency"], example_summary_data["T"]
+        ),
+    )
+
+    bg_data = bg.__dict__["data"]
+    assert isinstance(bg_data, utils.RFMData) and bg_data._frame is None
+    assert_frame_equal(bg.data, store.to_frame().assign(weights=1.0), check_dtype=False)
+
+    initial_params = [0.5, 1.0, 0.5, 1.0]
+    pnbd = ParetoNBDFitter().fit(store, initial_params=initial_params)
+    expected = ParetoNBDFitter().fit(
+        example_summary_data["frequency"],
+        example_summary_data["recency"],
+        example_summary_data["T"],
+        initial_params=initial_params,
+    )
+    assert_allclose(pnbd.params_, expected.params_, rtol=1e-3)
+    assert_allclose(
+        pnbd.conditional_expected_number_of_purchases_up_to_time(10, store),
+        expected.conditional_expected_number_of_purchases_up_to_time(
+            10, example_summary_data["frequency"], example_summary_data["recency"], example_summary_data["T"]
+        ),
+        rtol=1e-3,
+    )
+
+
+def test_rfm_data_is_validated_once_and_shared_by_fitters(example_summary_data, fitted_bg):
+    data = utils.RFMData.from_frame(example_summary_data)
+    assert data.validated
+    assert np.shares_memory(data.recency, example_summary_data["recency"].values)
+
+    bg = BetaGeoFitter().fit(data)
+    mbg = ModifiedBetaGeoFitter().fit(data)
+    assert bg.data is mbg.data
+    assert list(bg.data.index) == list(example_summary_data.index)
+    assert data.scaled_T is data.scaled_T
+    assert_allclose(bg.params_, fitted_bg.params_, rtol=1e-4)
+    assert_allclose(
+        bg.conditional_probability_alive(data),
+        bg.conditional_probability_alive(
+            example_summary_data["frequency"], example_summary_data["recency"], example_summary_data["T"]
+        ),
+    )
+    assert_allclose(
+        mbg.predict(5, data),
+        mbg.predict(5, example_summary_data["frequency"], example_summary_data["recency"], example_summary_data["T"]),
+    )
+
+
+def test_rfm_data_validates_lazily():
+    data = utils.RFMData([1, 0], [2, 1], [3, 3], validate=False)
+    assert not data.validated
+    with pytest.raises(ValueError):
+        BetaGeoFitter().fit(data)
+
+
+def test_gamma_gamma_fitter_accepts_rfm_data():
+    summary = load_cdnow_summary_data_with_monetary_value()
+    returning_customers = summary[summary["frequency"] > 0]
+    data = utils.RFMData.from_frame(returning_customers)
+
+    expected = GammaGammaFitter().fit(returning_customers["frequency"], returning_customers["monetary_value"])
+    ggf = GammaGammaFitter().fit(data)
+    assert_allclose(ggf.params_, expected.params_)
+    assert_allclose(ggf.conditional_expected_average_profit(data), expected.conditional_expected_average_profit())
+
+
+def test_compress_rfm_patterns_give_the_same_fit(example_summary_data, fitted_bg):
+    patterns, inverse = utils.compress_rfm(example_summary_data)
+    assert patterns.shape[0] < example_summary_data.shape[0]
+    assert patterns["weights"].sum() == example_summary_data.shape[0]
+    assert_almost_equal(patterns[["frequency", "recency", "T"]].values[inverse], example_summary_data.values)
+
+    bg = BetaGeoFitter().fit(patterns["frequency"], patterns["recency"], patterns["T"], weights=patterns["weights"])
+    assert_allclose(bg.params_, fitted_bg.params_, rtol=1e-4)
+
+
+def test_compress_rfm_with_resolution_and_weights():
+    summary = pd.DataFrame(
+        {"frequency": [0, 0, 1, 1], "recency": [0, 0, 2.2, 1.9], "T": [5.1, 4.9, 6.0, 6.0], "weights": [1, 2, 3, 4]}
+    )
+    patterns, inverse = utils.compress_rfm(summary, resolution=1.0)
+    assert list(patterns["weights"]) == [3, 7]
+    assert list(patterns["recency"]) == [0, 2]
+    assert list(inverse) == [0, 0, 1, 1]
+
+    patterns, inverse = utils.compress_rfm(summary, resolution={"T": 1.0})
+    assert list(patterns["weights"]) == [3, 4, 3]
+
+
 def test_calculate_alive_path(example_transaction_data, example_summary_data, fitted_bg):
     user_data = example_transaction_data[example_transaction_data["id"] == 33]
     frequency, recency, T = example_summary_data.loc[33]
@@ -483,6 +1261,22 @@ def test_calculate_alive_path(example_transaction_data, example_summary_data, fi
     assert alive_path[T] == fitted_bg.conditional_probability_alive(frequency, recency, T)
 
 
+def test_calculate_alive_paths_is_identical_to_calculate_alive_path(
+    example_transaction_data, example_summary_data, fitted_bg
+):
+    paths = utils.calculate_alive_paths(fitted_bg, example_transaction_data, "date", "id", 205)
+    assert paths.shape == (example_transaction_data["id"].nunique(), 206)
+
+    for customer_id in [33, 1, 100]:
+        user_data = example_transaction_data[example_transaction_data["id"] == customer_id]
+        alive_path = utils.calculate_alive_path(fitted_bg, user_data, "date", 205)
+        assert_allclose(paths.loc[customer_id].values, np.hstack(alive_path.values)[:206])
+
+    frequency, recency, T = example_summary_data.loc[33]
+    long_paths = utils.calculate_alive_paths(fitted_bg, example_transaction_data, "date", "id", 205, long_format=True)
+    assert_allclose(long_paths.loc[(33, T), "p_alive"], fitted_bg.conditional_probability_alive(frequency, recency, T))
+
+
 def test_check_inputs():
     frequency = np.array([0, 1, 2])
     recency = np.array([0, 1, 10])
@@ -703,3 +1497,16 @@ def test_expected_cumulative_transactions_date_index(cdnow_transactions):
     assert all(dates == date_index)
     assert_allclose(actual, actual_trans)
     assert_allclose(predicted, expected_trans, atol=1e-2)
+
+
+def test_expected_cumulative_transactions_with_integer_periods(cdnow_transactions, fitted_bg):
+    transactions = cdnow_transactions.assign(
+        day=(pd.to_datetime(cdnow_transactions["date"], format="%Y%m%d") - pd.Timestamp(0)).dt.days
+    )
+    expected = utils.expected_cumulative_transactions(
+        fitted_bg, transactions, "date", "id_sample", 70, datetime_format="%Y%m%d", freq_multiplier=7
+    )
+    actual = utils.expected_cumulative_transactions(
+        fitted_bg, transactions, "day", "id_sample", 70, freq_multiplier=7, integer_periods=True
+    )
+    assert_frame_equal(actual, expected)